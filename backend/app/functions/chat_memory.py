@@ -0,0 +1,162 @@
+import os
+from datetime import datetime
+from langchain_core.prompts import PromptTemplate
+from pymongo.errors import DuplicateKeyError
+from app.functions.llm_gateway import achat
+from app.functions.llm_fixtures import ReplayMiss
+from app.functions.metrics import incr
+from app.functions.prompt_budget import count_tokens, record_prompt
+
+# Conversation memory for follow-up questions. Each chat keeps one small document in the
+# chat_memory collection instead of the SQL prompt reading the whole chats history: the last
+# CHAT_MEMORY_TURNS turns (question, SQL, result shape) verbatim, and a rolling summary of
+# every older turn. When a turn falls out of the window it is folded into the summary with one
+# LLM call over (previous summary + evicted turns), so the work per turn and the history given
+# to the model stay the same size however long the conversation gets.
+#
+# Turns are clipped to TURN_QUESTION_CHARS / TURN_SQL_CHARS and the summary to
+# CHAT_SUMMARY_MAX_CHARS. Writes are conditional on the document's version, so two
+# concurrent requests on one chat never overwrite each other's turn with a stale copy.
+CHAT_MEMORY_TURNS = int(os.getenv("CHAT_MEMORY_TURNS", "3"))
+CHAT_SUMMARY_MAX_CHARS = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "1200"))
+TURN_QUESTION_CHARS = 300
+TURN_SQL_CHARS = 600
+# Attempts of a conditional write before the turn is given up
+WRITE_ATTEMPTS = 3
+
+SUMMARY_PROVIDER = "openai"
+SUMMARY_MODEL = "gpt-4o-mini"
+
+summary_template = """
+You maintain a running summary of a conversation between a user and an assistant that answers
+questions about a database with SQL. Merge the new turns into the current summary.
+
+Keep what later questions may refer to: the entities, tables, filters, time ranges, groupings
+and definitions the user established, and what each answer showed. Drop greetings and anything
+superseded. Write plain sentences, at most 120 words.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+
+Updated summary:
+"""
+
+summary_prompt = PromptTemplate.from_template(summary_template)
+
+_indexed = False
+
+
+def _clip(text, limit):
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def empty_memory(chat_id: str) -> dict:
+    return {"chat_id": chat_id, "summary": "", "turns": [], "summarized_turns": 0, "version": 0}
+
+
+def make_turn(question: str, sql: str, result: dict) -> dict:
+    """A bounded record of one answered question."""
+    result = result or {}
+    return {
+        "question": _clip(question, TURN_QUESTION_CHARS),
+        "sql": _clip(sql, TURN_SQL_CHARS),
+        "rows": len(result.get("data", [])),
+        "columns": [_clip(col, 60) for col in result.get("columns", [])][:20],
+    }
+
+
+def _turn_line(turn):
+    shape = f"{turn['rows']} rows"
+    if turn["columns"]:
+        shape += f": {', '.join(turn['columns'])}"
+    return f"User asked: {turn['question']} -> SQL: {turn['sql']} ({shape})"
+
+
+def history_lines(memory: dict) -> list:
+    """
+    History for the SQL prompt, oldest first: the summary, then one line per recent turn.
+
+    The prompt budget drops lines from the front, so the summary goes before the turns.
+    """
+    lines = []
+    if memory.get("summary"):
+        lines.append(f"Earlier in this conversation: {memory['summary']}")
+    lines.extend(_turn_line(turn) for turn in memory.get("turns", []))
+    return lines
+
+
+async def load_memory(collection, chat_id: str) -> dict:
+    """Memory document of a chat (an empty one for a new chat)."""
+    global _indexed
+    if not _indexed:
+        # One document per chat, also when two requests create it at once
+        await collection.create_index("chat_id", unique=True)
+        _indexed = True
+    memory = await collection.find_one({"chat_id": chat_id}, {"_id": 0})
+    return memory or empty_memory(chat_id)
+
+
+async def summarize_turns(summary: str, turns: list) -> str:
+    """
+    Fold turns into a summary with one LLM call.
+
+    Falls back to appending the questions when the call fails; either way the result is
+    clipped to CHAT_SUMMARY_MAX_CHARS.
+    """
+    prompt = summary_prompt.format(
+        summary=summary or "(none)",
+        turns="\n".join(_turn_line(turn) for turn in turns)
+    )
+    record_prompt("summary", count_tokens(prompt))
+    try:
+        summary = await achat(prompt, provider=SUMMARY_PROVIDER, model=SUMMARY_MODEL, temperature=0)
+    except ReplayMiss:
+        raise
+    except Exception as e:
+        print(f"Error summarizing conversation: {e}")
+        incr("chat_memory.summary_errors")
+        summary = " ".join([summary] + [f"The user asked: {turn['question']}" for turn in turns])
+    return _clip(summary, CHAT_SUMMARY_MAX_CHARS)
+
+
+async def remember_turn(collection, chat_id: str, turn: dict) -> dict:
+    """
+    Add an answered turn to a chat's memory, summarizing the turns that leave the window.
+
+    Returns:
+        dict: The updated memory document.
+    """
+    for _ in range(WRITE_ATTEMPTS):
+        memory = await load_memory(collection, chat_id)
+        turns = memory["turns"] + [turn]
+        evicted = turns[:max(len(turns) - CHAT_MEMORY_TURNS, 0)]
+        turns = turns[len(evicted):]
+        summary = memory["summary"]
+        if evicted:
+            summary = await summarize_turns(summary, evicted)
+            incr("chat_memory.summaries")
+        updated = dict(
+            memory,
+            summary=summary,
+            turns=turns,
+            summarized_turns=memory["summarized_turns"] + len(evicted),
+            version=memory["version"] + 1,
+            updated_at=datetime.utcnow(),
+        )
+        # Only replaces the version that was read; a concurrent writer makes this a no-op
+        try:
+            result = await collection.replace_one(
+                {"chat_id": chat_id, "version": memory["version"]}, updated, upsert=memory["version"] == 0
+            )
+        except DuplicateKeyError:
+            result = None
+        if result is not None and (result.matched_count or result.upserted_id is not None):
+            incr("chat_memory.turns")
+            return updated
+        incr("chat_memory.conflicts")
+    print(f"Could not update conversation memory of chat {chat_id}: concurrent updates")
+    return memory
@@ -0,0 +1,187 @@
+import os
+from app.functions.ingest import quote_identifier
+
+# Column statistics of a table: null fraction, distinct count, min/max and the most frequent
+# values, all computed with SQLite's built-in aggregates so profiling never calls back into
+# Python per row. Row counts, nulls and min/max come from one scan of the whole table; distinct
+# counts and frequent values come from one grouped query per column. They are exact on tables up
+# to EXACT_DISTINCT_ROWS rows; on larger tables they are computed on about PROFILE_SAMPLE_ROWS
+# rows picked by rowid stride (every step-th rowid, looked up rather than scanned) and scaled up,
+# the distinct count with the Duj1 estimator, so their cost stays bounded however big the upload
+# is. A stride covers the whole table, where a prefix would only see the first dates, ids or
+# batch-loaded categories of ordered data. WITHOUT ROWID tables fall back to a prefix.
+EXACT_DISTINCT_ROWS = int(os.getenv("PROFILE_EXACT_DISTINCT_ROWS", "100000"))
+PROFILE_SAMPLE_ROWS = int(os.getenv("PROFILE_SAMPLE_ROWS", "20000"))
+TOP_VALUES = 10
+# Longest text value reported as a min/max/top value
+MAX_VALUE_LENGTH = 100
+# SQLite caps the number of result columns; very wide tables are profiled in slices
+MAX_AGGREGATES_PER_SCAN = 500
+
+
+def _clip(value):
+    if isinstance(value, str) and len(value) > MAX_VALUE_LENGTH:
+        return value[:MAX_VALUE_LENGTH]
+    if isinstance(value, bytes):
+        return None
+    return value
+
+
+def _affinity(declared_type):
+    # SQLite's column affinity rules
+    declared = (declared_type or "").upper()
+    if "INT" in declared:
+        return "INTEGER"
+    if any(t in declared for t in ("CHAR", "CLOB", "TEXT")):
+        return "TEXT"
+    if not declared or "BLOB" in declared:
+        return "BLOB"
+    if any(t in declared for t in ("REAL", "FLOA", "DOUB")):
+        return "REAL"
+    return "NUMERIC"
+
+
+def _approx_rows(conn, quoted):
+    """Return (approximate row count, whether the table has rowids)."""
+    try:
+        return conn.execute(f"SELECT MAX(rowid) FROM {quoted}").fetchone()[0] or 0, True
+    except Exception:
+        # WITHOUT ROWID tables
+        return conn.execute(f"SELECT COUNT(*) FROM {quoted}").fetchone()[0], False
+
+
+def _sample_source(quoted, approx_rows, has_rowid):
+    if not has_rowid:
+        return f"(SELECT * FROM {quoted} LIMIT {PROFILE_SAMPLE_ROWS})"
+    step = -(-approx_rows // PROFILE_SAMPLE_ROWS)
+    return (
+        f"(SELECT * FROM {quoted} WHERE rowid IN (WITH RECURSIVE stride(r) AS (SELECT {step} "
+        f"UNION ALL SELECT r + {step} FROM stride WHERE r + {step} <= {approx_rows}) SELECT r FROM stride))"
+    )
+
+
+def _frequencies(conn, source, name):
+    """
+    Count a column's values in one grouped query.
+
+    Returns:
+        tuple: (distinct values, values seen once, non-null values, [[value, count]] of the
+        TOP_VALUES most frequent)
+    """
+    rows = conn.execute(
+        f"SELECT value, n, COUNT(*) OVER (), SUM(n = 1) OVER (), SUM(n) OVER () "
+        f"FROM (SELECT {name} AS value, COUNT(*) AS n FROM {source} WHERE {name} IS NOT NULL GROUP BY {name}) "
+        f"ORDER BY n DESC, value LIMIT {TOP_VALUES}"
+    ).fetchall()
+    if not rows:
+        return 0, 0, 0, []
+    _, _, distinct, singletons, non_null = rows[0]
+    return distinct, singletons, non_null, [[_clip(value), n] for value, n, *_ in rows]
+
+
+def _duj1(sample_distinct, singletons, sample_non_null, non_null):
+    """
+    Estimate a column's distinct count from how often each value occurs in the sample.
+
+    Uses the Haas-Stokes Duj1 estimator (as PostgreSQL's ANALYZE does): n*d / (n - f1 + f1*n/N),
+    with d distinct and f1 once-seen values among n sampled ones, and N non-null values in total.
+    """
+    if not sample_non_null:
+        return 0
+    estimate = sample_non_null * sample_distinct / (
+        sample_non_null - singletons + singletons * sample_non_null / non_null
+    )
+    return min(max(round(estimate), sample_distinct), non_null)
+
+
+def profile_table(conn, table: str, columns):
+    """
+    Profile every column of a table with built-in SQLite aggregates.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database.
+        table (str): Table name.
+        columns (list): Catalog column dicts ({"name", "type", ...}).
+
+    Returns:
+        tuple: (row count, {column: stats})
+    """
+    quoted = quote_identifier(table)
+    approx_rows, has_rowid = _approx_rows(conn, quoted)
+    exact = approx_rows <= EXACT_DISTINCT_ROWS
+
+    plans = []
+    for col in columns:
+        name = quote_identifier(col["name"])
+        affinity = _affinity(col["type"])
+        aggregates = [("non_null", f"COUNT({name})")]
+        if affinity != "BLOB":
+            aggregates += [("min", f"MIN({name})"), ("max", f"MAX({name})")]
+        plans.append((col["name"], affinity, aggregates))
+
+    # Very wide tables are sliced so each SELECT stays under MAX_AGGREGATES_PER_SCAN expressions
+    batches, batch, size = [], [], 0
+    for plan in plans:
+        if batch and size + len(plan[2]) > MAX_AGGREGATES_PER_SCAN:
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(plan)
+        size += len(plan[2])
+    batches.append(batch)
+
+    row_count = 0
+    results = {}
+    for batch in batches:
+        select = ", ".join(["COUNT(*)"] + [sql for _, _, aggregates in batch for _, sql in aggregates])
+        values = iter(conn.execute(f"SELECT {select} FROM {quoted}").fetchone())
+        row_count = next(values)
+        for name, affinity, aggregates in batch:
+            results[name] = {kind: next(values) for kind, _ in aggregates}
+
+    source = quoted if exact else _sample_source(quoted, approx_rows, has_rowid)
+    profile = {}
+    for name, affinity, _ in plans:
+        result = results[name]
+        non_null = result["non_null"]
+        sample_distinct, singletons, sample_non_null, top = (
+            _frequencies(conn, source, quote_identifier(name)) if non_null else (0, 0, 0, [])
+        )
+        if exact:
+            distinct = sample_distinct
+        else:
+            distinct = _duj1(sample_distinct, singletons, sample_non_null, non_null)
+            scale = non_null / sample_non_null if sample_non_null else 0
+            top = [[value, round(count * scale)] for value, count in top]
+        # Continuous values rarely repeat, and a column of unique values has no frequent ones
+        if affinity in ("REAL", "BLOB") or sample_distinct == sample_non_null:
+            top = []
+        profile[name] = {
+            "affinity": affinity,
+            "nulls": row_count - non_null,
+            "null_fraction": round((row_count - non_null) / row_count, 4) if row_count else 0.0,
+            "distinct": distinct,
+            "distinct_estimated": not exact,
+            "min": _clip(result.get("min")),
+            "max": _clip(result.get("max")),
+            "top": top,
+        }
+    return row_count, profile
+
+
+def _short(value):
+    return f"{value:.6g}" if isinstance(value, float) else str(value)[:30]
+
+
+def describe_profile(profile: dict, top_n: int = 3) -> list:
+    """One compact line per column for prompts, e.g. "city: 2% null, 41 distinct, top 'Berlin' (120)"."""
+    lines = []
+    for name, stats in profile.items():
+        parts = [f"{stats['null_fraction']:.0%} null"]
+        parts.append(f"{'~' if stats['distinct_estimated'] else ''}{stats['distinct']} distinct")
+        if stats["affinity"] in ("INTEGER", "REAL", "NUMERIC") and stats["min"] is not None:
+            parts.append(f"range {_short(stats['min'])} .. {_short(stats['max'])}")
+        if stats["top"]:
+            values = ", ".join(f"{_short(value)!r} ({count})" for value, count in stats["top"][:top_n])
+            parts.append(f"top {values}")
+        lines.append(f"{name}: {', '.join(parts)}")
+    return lines
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import uuid
+from datetime import datetime
+from pymongo import MongoClient
+from dotenv import load_dotenv
+from app.functions.sample_store import sample_path_for
+from app.functions.schema_catalog import catalog_path_for, invalidate_catalog
+from app.functions.value_index import value_index_path_for
+load_dotenv()
+
+# Content-addressed store for uploaded datasets. Every upload is hashed while it is
+# staged and its built SQLite database lives at input/<sha256>.db; the reflected
+# schema is kept in the "datasets" collection so a repeat upload skips the rebuild.
+# The key covers whatever shapes the database: the bytes, plus the file name where it
+# becomes a table name (see upload_hash and combined_hash).
+MONGO_URI = os.getenv("MONGO_URI")
+mongo_client = MongoClient(MONGO_URI)
+db = mongo_client["try1"]
+datasets_collection = db["datasets"]
+
+INPUT_FOLDER = "input"
+HASH_CHUNK_SIZE = 1024 * 1024
+# Single-file formats whose table is named after the file
+NAMED_TABLE_EXTENSIONS = (".csv", ".parquet")
+
+
+def stage_upload(file, folder: str, filename: str = None):
+    """
+    Stream an uploaded file to disk, computing its SHA-256 on the way.
+
+    Args:
+        file: Uploaded file (werkzeug FileStorage or binary file-like object).
+        folder (str): Directory to write the staged copy to.
+        filename (str): Original name, when the file object does not carry one.
+
+    Returns:
+        tuple: (staged path, content hash, size in bytes)
+    """
+    stream = getattr(file, "stream", file)
+    filename = filename or getattr(file, "filename", "") or ""
+    staged_path = os.path.join(folder, f"{uuid.uuid4()}{os.path.splitext(filename)[1]}")
+    digest = hashlib.sha256()
+    size = 0
+    with open(staged_path, "wb") as f_out:
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            f_out.write(chunk)
+            size += len(chunk)
+    return staged_path, digest.hexdigest(), size
+
+
+def upload_hash(filename: str, content_hash: str) -> str:
+    """
+    Dataset key of a single-file upload.
+
+    CSV and Parquet tables take the file's name, so the name is part of the key
+    (sales.csv and q3.csv with the same bytes are different datasets); for the other
+    formats only the lowercased extension is.
+    """
+    stem, ext = os.path.splitext(os.path.basename(filename))
+    ext = ext.lower()
+    name = stem + ext if ext in NAMED_TABLE_EXTENSIONS else ext
+    return hashlib.sha256(f"{name}\0{content_hash}".encode("utf-8")).hexdigest()
+
+
+def combined_hash(files) -> str:
+    """Content hash of a multi-file upload: the sorted (name, hash) pairs of its files."""
+    digest = hashlib.sha256()
+    for name, content_hash in sorted((f["filename"], f["content_hash"]) for f in files):
+        digest.update(f"{name}\0{content_hash}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def dataset_path(content_hash: str) -> str:
+    return os.path.join(INPUT_FOLDER, f"{content_hash}.db")
+
+
+def publish_file(part_path: str, file_path: str) -> bool:
+    """
+    Move a freshly built database to its content-addressed path, unless it is already there.
+
+    Two identical uploads processed at once both build the same database; the first one
+    published is kept and the other copy is discarded. The part file is always removed.
+
+    Returns:
+        bool: True if this copy was published.
+    """
+    try:
+        # A hard link fails atomically when the target exists, unlike os.replace
+        os.link(part_path, file_path)
+        published = True
+    except FileExistsError:
+        published = False
+    os.remove(part_path)
+    return published
+
+
+def find_dataset(content_hash: str):
+    """
+    Return the stored dataset document for a content hash, or None.
+
+    Documents whose database file has disappeared from disk are dropped.
+    """
+    dataset = datasets_collection.find_one({"_id": content_hash})
+    if dataset and not os.path.exists(dataset["file_path"]):
+        datasets_collection.delete_one({"_id": content_hash})
+        return None
+    return dataset
+
+
+def save_dataset(content_hash: str, file_path: str, schema: dict) -> bool:
+    """
+    Record a dataset, unless a concurrent upload of the same content recorded it first.
+
+    Returns:
+        bool: True if this call created the document.
+    """
+    result = datasets_collection.update_one(
+        {"_id": content_hash},
+        {"$setOnInsert": {
+            "file_path": file_path,
+            "schema": schema,
+            "created_at": datetime.utcnow()
+        }},
+        upsert=True
+    )
+    return result.upserted_id is not None
+
+
+def release_dataset(content_hash: str) -> bool:
+    """
+    Delete a dataset's database file once no project references it.
+
+    Returns:
+        bool: True if the dataset was deleted.
+    """
+    if not content_hash:
+        return False
+    if db.projects.count_documents({"content_hash": content_hash}, limit=1):
+        return False
+
+    dataset = datasets_collection.find_one({"_id": content_hash})
+    file_path = dataset["file_path"] if dataset else dataset_path(content_hash)
+    invalidate_catalog(file_path)
+    for path in (file_path, sample_path_for(file_path), catalog_path_for(file_path), value_index_path_for(file_path)):
+        if os.path.exists(path):
+            os.remove(path)
+    datasets_collection.delete_one({"_id": content_hash})
+    print(f"Released dataset {content_hash}")
+    return True
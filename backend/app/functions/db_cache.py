@@ -0,0 +1,106 @@
+import os
+import threading
+from collections import OrderedDict
+from sqlalchemy import create_engine
+from langchain_community.utilities import SQLDatabase
+from app.functions.schema_catalog import get_catalog, format_table_info
+from app.functions.sql_validation import connect_readonly
+
+# Process-wide cache of opened project databases. The prompt needs the schema text and
+# a few sample rows per table; they are rendered once per database file from its schema
+# catalog and reused by later /query calls along with the SQLDatabase.
+# Entries are keyed by path and checked against the file's mtime and size, so a
+# rewritten file is picked up on its next use. Connections are read-only: a dataset file may
+# be shared by several projects (see dataset_store), and generated SQL must not change it.
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "32"))
+PROMPT_SAMPLE_ROWS = 5
+
+_cache = OrderedDict()
+_build_locks = {}
+_lock = threading.Lock()
+
+
+def _file_key(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _dispose(entry):
+    try:
+        entry["db"]._engine.dispose()
+    except Exception as e:
+        print(f"Error closing cached database {entry['path']}: {e}")
+
+
+def _build_entry(path, key):
+    catalog = get_catalog(path)
+    # Tables are only reflected by SQLDatabase on demand; the catalog already has the schema
+    # The file URL only selects SQLAlchemy's file-database pool; connections come from connect_readonly()
+    engine = create_engine(f"sqlite:///{path}", creator=lambda: connect_readonly(path))
+    db = SQLDatabase(engine, lazy_table_reflection=True)
+    tables = list(catalog["tables"])
+    return {
+        "path": path,
+        "key": key,
+        "db": db,
+        "catalog": catalog,
+        "tables": tables,
+        # Rendered per table; a prompt joins the ones picked for its question. Sample rows are
+        # rendered separately by the prompt budgeter, so they are left out here.
+        "table_infos": {tbl: format_table_info(catalog, [tbl], sample_rows=0) for tbl in tables},
+        "table_schemas": {tbl: format_table_info(catalog, [tbl], sample_rows=0, stats=False) for tbl in tables},
+        "sample_data": {tbl: catalog["tables"][tbl]["samples"][:PROMPT_SAMPLE_ROWS] for tbl in tables},
+    }
+
+
+def get_database(db_path: str) -> dict:
+    """
+    Return the cached SQLDatabase and prompt context for a SQLite file, building it on a miss.
+
+    Concurrent misses for the same file wait for a single build.
+
+    Returns:
+        dict: {"db", "catalog", "tables", "table_infos", "table_schemas", "sample_data", "path", "key"}
+    """
+    path = os.path.abspath(db_path)
+    key = _file_key(path)
+    with _lock:
+        entry = _cache.get(path)
+        if entry is not None and entry["key"] == key:
+            _cache.move_to_end(path)
+            return entry
+        build_lock = _build_locks.setdefault(path, threading.Lock())
+
+    with build_lock:
+        with _lock:
+            entry = _cache.get(path)
+            if entry is not None and entry["key"] == key:
+                _cache.move_to_end(path)
+                return entry
+        entry = _build_entry(path, key)
+        evicted = []
+        with _lock:
+            stale = _cache.pop(path, None)
+            if stale is not None:
+                evicted.append(stale)
+            _cache[path] = entry
+            while len(_cache) > DB_CACHE_SIZE:
+                evicted_path, evicted_entry = _cache.popitem(last=False)
+                _build_locks.pop(evicted_path, None)
+                evicted.append(evicted_entry)
+    for old in evicted:
+        _dispose(old)
+    return entry
+
+
+def invalidate_database(db_path: str = None) -> None:
+    """Drop one database (or every database, if no path is given) from the cache."""
+    with _lock:
+        if db_path is None:
+            evicted = list(_cache.values())
+            _cache.clear()
+        else:
+            entry = _cache.pop(os.path.abspath(db_path), None)
+            evicted = [entry] if entry is not None else []
+    for entry in evicted:
+        _dispose(entry)
@@ -0,0 +1,23 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded thread pools for the blocking work of the async /query path, so the event loop
+# only awaits: SQLite access (queries, catalog, caches) and exec() of generated chart code.
+# Generated chart code uses pyplot's global state, so renders run one at a time by default.
+SQL_WORKERS = int(os.getenv("QUERY_SQL_WORKERS", "8"))
+RENDER_WORKERS = int(os.getenv("QUERY_RENDER_WORKERS", "1"))
+
+sql_executor = ThreadPoolExecutor(max_workers=SQL_WORKERS, thread_name_prefix="query-sql")
+render_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="query-render")
+
+
+async def run_sql(fn, *args, **kwargs):
+    """Run a blocking database call on the SQL pool."""
+    return await asyncio.get_running_loop().run_in_executor(sql_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_render(fn, *args, **kwargs):
+    """Run a blocking rendering call on the render pool."""
+    return await asyncio.get_running_loop().run_in_executor(render_executor, functools.partial(fn, *args, **kwargs))
@@ -1,10 +1,23 @@
+import asyncio
+import os
+import re
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import Runnable
-from langchain_openai import ChatOpenAI  # or another LLM provider
-from langchain_core.output_parsers import StrOutputParser
+from app.functions.prompt_budget import render_result, count_tokens, record_prompt
+from app.functions.llm_gateway import chat, achat, astream
+from app.functions.llm_fixtures import ReplayMiss
 
-# Define your LLM
-llm = ChatOpenAI(temperature=0.4, model="gpt-4o-mini")  # replace with your model or use Ollama
+# Model settings for explanations and narration (calls go through the LLM gateway)
+EXPLAIN_PROVIDER = "openai"
+EXPLAIN_MODEL = "gpt-4o-mini"
+EXPLAIN_TEMPERATURE = 0.4
+
+# How the agent steps of a /query are narrated:
+#   batch      - one LLM call summarizing every step (default)
+#   concurrent - one LLM call per step, all in flight at once
+#   template   - fixed sentences built from the steps, no LLM call
+NARRATION_MODE = os.getenv("NARRATION_MODE", "batch")
+# Steps are narrated from a digest of at most this many characters, never from the full step
+STEP_DIGEST_CHARS = 600
 
 # Prompt template for generating NL explanation
 explaination_template = """
@@ -22,9 +35,6 @@ Your Explanation:
 
 explaination_prompt = PromptTemplate.from_template(explaination_template)
 
-# Chain
-explanation_chain: Runnable = explaination_prompt | llm
-
 thinking_template = """
 You are summarizing internal AI reasoning steps during a data analysis task.
 Given a step with its context, generate a one-line summary of what step was just done.
@@ -36,15 +46,158 @@ Respond with a single, clear, past-tense sentence summarizing the step.
 
 thinking_prompt = PromptTemplate.from_template(thinking_template)
 
-# Chain
-thinking_chain: Runnable = thinking_prompt | llm
+batch_thinking_template = """
+You are summarizing internal AI reasoning steps during a data analysis task.
+For each numbered step below, write a one-line, past-tense sentence summarizing what was done.
+
+Steps:
+{steps}
+
+Respond with exactly {count} lines, one per step, each starting with the step number and a period (e.g. "1. ...").
+"""
+
+batch_thinking_prompt = PromptTemplate.from_template(batch_thinking_template)
+
+
+def _llm_settings():
+    return {"provider": EXPLAIN_PROVIDER, "model": EXPLAIN_MODEL, "temperature": EXPLAIN_TEMPERATURE}
+
+
+def _clip(value, limit):
+    value = " ".join(str(value).split())
+    return value if len(value) <= limit else value[:limit] + "..."
+
+
+def step_digest(step: dict) -> str:
+    """
+    Bounded description of an async_query step: its kind, SQL, error and result shape.
+
+    Result rows, table definitions and sample data are left out.
+    """
+    parts = [f"step: {step.get('step')}"]
+    if step.get("message"):
+        parts.append(f"message: {_clip(step['message'], 200)}")
+    if step.get("prompt_tables") is not None:
+        parts.append(f"tables used: {_clip(', '.join(step['prompt_tables']), 200)}")
+    elif step.get("tables") is not None:
+        parts.append(f"tables: {_clip(', '.join(step['tables']), 200)}")
+    if step.get("sql_query"):
+        parts.append(f"sql: {_clip(step['sql_query'], 300)}")
+    if step.get("cached"):
+        parts.append("sql reused from cache")
+    if step.get("candidates", 1) > 1:
+        parts.append(f"picked from {step['candidates']} candidates")
+    if step.get("error"):
+        parts.append(f"error: {_clip(step['error'], 200)}")
+    if isinstance(step.get("result"), dict) and "data" in step["result"]:
+        columns = step["result"].get("columns", [])
+        parts.append(f"result: {len(step['result']['data'])} rows, columns {_clip(', '.join(map(str, columns)), 150)}")
+    if step.get("warnings"):
+        parts.append(f"warnings: {_clip('; '.join(step['warnings']), 200)}")
+    if step.get("retries"):
+        parts.append(f"retry number: {step['retries']}")
+    return _clip("; ".join(parts), STEP_DIGEST_CHARS)
+
+
+def template_narration(step: dict) -> str:
+    """Deterministic one-line narration of a step."""
+    kind = step.get("step")
+    if kind == "load_database":
+        tables = step.get("prompt_tables") or step.get("tables") or []
+        return f"Loaded the database schema and selected {len(tables)} relevant table(s)."
+    if kind == "generate_query":
+        if step.get("cached"):
+            return "Reused a previously validated SQL query for this question."
+        return "Generated a SQL query for the question."
+    if kind == "validate_query":
+        if not step.get("ok"):
+            return f"Checked the SQL query before running it and found a problem: {_clip(step.get('error'), 120)}"
+        return "Checked the SQL query against the schema and its query plan."
+    if kind == "execute_query":
+        if step.get("error"):
+            return f"Ran the SQL query, which failed: {_clip(step['error'], 120)}"
+        rows = len((step.get("result") or {}).get("data", []))
+        return f"Ran the SQL query and got {rows} row(s)."
+    if kind == "retry":
+        return f"Retried after the SQL error (attempt {step.get('retries')})."
+    return f"Completed the {kind} step."
+
+
+def _parse_numbered_lines(text, count):
+    lines = {}
+    for line in text.splitlines():
+        match = re.match(r"\s*(\d+)[.)]\s*(.+)", line)
+        if match and 1 <= int(match.group(1)) <= count:
+            lines.setdefault(int(match.group(1)), match.group(2).strip())
+    return lines
+
+def _explanation_input(query, result):
+    # Compact rows, capped by RESULT_PROMPT_ROWS and RESULT_TOKEN_BUDGET, instead of str(result)
+    prompt = explaination_prompt.format(query=query, result_json=render_result(result))
+    record_prompt("explanation", count_tokens(prompt))
+    return prompt
 
 # Function to generate explanation
 def generate_nl_explanation(query: str, result: dict) -> str:
-    result_json = str(result)
-    response = explanation_chain.invoke({"query": query, "result_json": result_json})
-    return response.content
+    return chat(_explanation_input(query, result), **_llm_settings())
+
+async def agenerate_nl_explanation(query: str, result: dict) -> str:
+    return await achat(_explanation_input(query, result), **_llm_settings())
+
+async def astream_nl_explanation(query: str, result: dict):
+    """Yield the explanation of a result as the model produces it."""
+    async for delta in astream(_explanation_input(query, result), **_llm_settings()):
+        yield delta
+
+def thinking_explanation(step) -> str:
+    if isinstance(step, dict):
+        step = step_digest(step)
+    return chat(thinking_prompt.format(step=step), **_llm_settings())
+
+async def narrate_steps(steps: list, mode: str = None) -> list:
+    """
+    One-line narration per step, in NARRATION_MODE (or the given mode).
+
+    Steps the LLM fails to narrate fall back to template_narration().
+
+    Returns:
+        list: One sentence per step, in order.
+    """
+    mode = mode or NARRATION_MODE
+    fallback = [template_narration(step) for step in steps]
+    if mode == "template" or not steps:
+        return fallback
+
+    digests = [step_digest(step) for step in steps]
+    if mode == "concurrent":
+        for digest in digests:
+            record_prompt("narration", count_tokens(thinking_template) + count_tokens(digest))
+        responses = await asyncio.gather(
+            *(achat(thinking_prompt.format(step=digest), **_llm_settings()) for digest in digests),
+            return_exceptions=True
+        )
+        narration = []
+        for response, default in zip(responses, fallback):
+            if isinstance(response, ReplayMiss):
+                raise response
+            if isinstance(response, Exception):
+                print(f"Error narrating step: {response}")
+                narration.append(default)
+            else:
+                narration.append(response.strip())
+        return narration
 
-def thinking_explanation(step: str) -> str:
-    response = thinking_chain.invoke({"step": step})
-    return response.content
\ No newline at end of file
+    numbered = "\n".join(f"{i}. {digest}" for i, digest in enumerate(digests, 1))
+    record_prompt("narration", count_tokens(batch_thinking_template) + count_tokens(numbered))
+    try:
+        response = await achat(
+            batch_thinking_prompt.format(steps=numbered, count=len(digests)),
+            **_llm_settings()
+        )
+    except ReplayMiss:
+        raise
+    except Exception as e:
+        print(f"Error narrating steps: {e}")
+        return fallback
+    lines = _parse_numbered_lines(response, len(steps))
+    return [lines.get(i, default) for i, default in enumerate(fallback, 1)]
\ No newline at end of file
@@ -1,15 +1,14 @@
 import os
-import openai
 import json
 import pandas as pd
 from dotenv import load_dotenv
-from openai import OpenAI
 from pydantic import BaseModel
 from typing import List
+from app.functions.llm_gateway import parse
+from app.functions.llm_fixtures import ReplayMiss
 
 # Load environment variables
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 class SubPromptResponse(BaseModel):
     sub_prompts: List[str]
@@ -46,18 +45,20 @@ Database Schema:
     try:
         print(f"🌀 Generating structured sub-prompts for: '{user_prompt}'...")
 
-        response = client.beta.chat.completions.parse(
+        response = parse(
+            [{ "role": "user", "content": instructions }],
+            SubPromptResponse,
             model=model_name,
-            messages=[{ "role": "user", "content": instructions }],
-            response_format=SubPromptResponse,
             temperature=0.3
         )
-        
-        result = response.choices[0].message.parsed.sub_prompts
+
+        result = response.sub_prompts
 
         print("✅ Structured sub-prompts:", result)
         return result
 
+    except ReplayMiss:
+        raise
     except Exception as e:
         print(f"🚨 Error during structured prompt generation: {e}")
         return []
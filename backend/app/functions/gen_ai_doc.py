@@ -1,8 +1,8 @@
-import google.generativeai as genai
 import pandas as pd
 import os
 import re
 from dotenv import load_dotenv
+from app.functions.llm_gateway import chat
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.platypus import (
@@ -14,7 +14,6 @@ from datetime import datetime
 
 # Load Gemini API key
 load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
 # ==== PDF STYLES ====
 styles = getSampleStyleSheet()
@@ -56,9 +55,7 @@ def generate_report(df: pd.DataFrame, output_path: str, query: str, graphs: list
     Return a clean plain-text report only, no markdown or special formatting.
     """
 
-    model = genai.GenerativeModel("gemini-1.5-flash")
-    response = model.generate_content(prompt)
-    report_text = response.text.strip()
+    report_text = chat(prompt, provider="gemini", model="gemini-1.5-flash").strip()
 
     print("Grpahs here : ", graphs)
 
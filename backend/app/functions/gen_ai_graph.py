@@ -1,12 +1,11 @@
-import google.generativeai as genai
 import pandas as pd
 import os
 import re
 from dotenv import load_dotenv
+from app.functions.llm_gateway import chat
 
 # Load environment variables
 load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
 def generate_visualization(df: pd.DataFrame, output_path, model_name="gemini-1.5-flash", max_retries=3) -> None:
     """
@@ -57,13 +56,11 @@ def generate_visualization(df: pd.DataFrame, output_path, model_name="gemini-1.5
 
     """
 
-    model_instance = genai.GenerativeModel(model_name)
-
     for attempt in range(1, max_retries + 1):
         try:
             print(f"\n🌀 Attempt {attempt}: Generating visualization prompt...")
-            response = model_instance.generate_content(base_prompt)
-            code_match = re.search(r"```python\n(.*?)```", response.text, re.DOTALL)
+            response = chat(base_prompt, provider="gemini", model=model_name)
+            code_match = re.search(r"```python\n(.*?)```", response, re.DOTALL)
 
             if not code_match:
                 print("❌ No valid Python code block found in model response.")
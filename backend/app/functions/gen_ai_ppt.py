@@ -1,7 +1,7 @@
-import google.generativeai as genai
 import pandas as pd
 import os
 from dotenv import load_dotenv
+from app.functions.llm_gateway import chat
 from pptx import Presentation
 from pptx.util import Pt, Inches
 from pptx.dml.color import RGBColor
@@ -9,7 +9,6 @@ from datetime import datetime
 
 # Load environment variables
 load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
 # Function to generate slide text using Gemini
 def generate_slide_text_from_data(df: pd.DataFrame, query_goal: str) -> str:
@@ -35,9 +34,7 @@ Slide: <Slide Title>
 - Include slides like Introduction, Key Insights, Visual Summary, and Conclusion.
 - Output must be plain text only as described.
 """
-    model = genai.GenerativeModel("gemini-1.5-flash")
-    response = model.generate_content(prompt)
-    return response.text.strip()
+    return chat(prompt, provider="gemini", model="gemini-1.5-flash").strip()
 
 
 # Function to convert slide text into a styled presentation
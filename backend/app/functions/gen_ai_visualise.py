@@ -1,12 +1,12 @@
-import google.generativeai as genai
 import pandas as pd
 import os
 import re
 from dotenv import load_dotenv
+from app.functions.llm_gateway import chat
+from app.functions.llm_fixtures import ReplayMiss
 
 # Load environment variables
 load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
 def visualise(df: pd.DataFrame, output_path, model_name="gemini-2.0-flash", max_retries=5) -> None:
     """
@@ -57,13 +57,11 @@ def visualise(df: pd.DataFrame, output_path, model_name="gemini-2.0-flash", max_
 
     """
 
-    model_instance = genai.GenerativeModel(model_name)
-
     for attempt in range(1, max_retries + 1):
         try:
             print(f"\n🌀 Attempt {attempt}: Generating visualization prompt...")
-            response = model_instance.generate_content(base_prompt)
-            code_match = re.search(r"```python\n(.*?)```", response.text, re.DOTALL)
+            response = chat(base_prompt, provider="gemini", model=model_name)
+            code_match = re.search(r"```python\n(.*?)```", response, re.DOTALL)
 
             if not code_match:
                 print("❌ No valid Python code block found in model response.")
@@ -75,6 +73,8 @@ def visualise(df: pd.DataFrame, output_path, model_name="gemini-2.0-flash", max_
             print("✅ Visualization generated successfully.")
             return output_path # Exit loop if execution succeeds
 
+        except ReplayMiss:
+            raise
         except Exception as e:
             print(f"🚨 Error during execution: {e}")
             error_feedback = f"\n\n⚠️ The previous code caused the following error:\n{e}\n\nFix it and regenerate the full corrected code.Saving graph to image is important with {output_path}"
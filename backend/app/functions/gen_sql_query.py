@@ -3,12 +3,10 @@ import re
 import sqlite3  # or use your actual DB connector
 from dotenv import load_dotenv
 from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_core.output_parsers import StrOutputParser
+from app.functions.llm_gateway import chat
 
 # Load environment variables
 load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
 
 def generate_sql_query(nl_query: str, db_schema: str, db_connection, model_name="gpt-4o-mini", max_retries=10) -> str:
     """
@@ -25,8 +23,6 @@ def generate_sql_query(nl_query: str, db_schema: str, db_connection, model_name=
         str: Valid SQL query or None.
     """
     print("db Schama : ",db_schema)
-    llm = ChatOpenAI(model=model_name, temperature=0.2, api_key=openai_api_key)
-    parser = StrOutputParser()
 
     for attempt in range(1, max_retries + 1):
         print(f"\n🌀 Attempt {attempt}: Generating SQL query...")
@@ -68,8 +64,7 @@ def generate_sql_query(nl_query: str, db_schema: str, db_connection, model_name=
                 error_context=error_context
             )
             # print("Prompt:", prompt)
-            response = llm.invoke(prompt)
-            output = parser.invoke(response)
+            output = chat(prompt, model=model_name, temperature=0.2)
 
             # Extract SQL
             sql_match = re.search(r"```query\n(.*?)```", output, re.DOTALL)
@@ -1,11 +1,17 @@
 import asyncio
-from typing import List, Dict, Optional
+import os
+from typing import List, Dict, Optional, AsyncIterator
 from sqlalchemy import text
-from langchain_openai import ChatOpenAI
-from langchain.chains import create_sql_query_chain
-from langchain_community.utilities import SQLDatabase
 from langchain_core.prompts import FewShotPromptTemplate, PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+from app.functions.db_cache import get_database
+from app.functions.table_retrieval import select_tables
+from app.functions.value_index import find_value_hints, format_value_hints
+from app.functions.query_cache import get_cached_sql, put_cached_sql, drop_cached_sql, is_follow_up
+from app.functions.executors import run_sql
+from app.functions.sql_validation import validate_sql
+from app.functions.prompt_budget import build_sql_prompt_context
+from app.functions.llm_gateway import achat
+from app.functions.metrics import timed
 
 # Define the initial prompt and examples (same as your original)
 examples = [
@@ -27,13 +33,14 @@ example_prompt = PromptTemplate(
 PROMPT = FewShotPromptTemplate(
     examples=examples,
     example_prompt=example_prompt,
-    input_variables=['input', 'table_info', 'sample_data', 'top_k', 'history'],
+    input_variables=['input', 'table_info', 'sample_data', 'value_hints', 'top_k', 'history'],
     prefix=(
         "You are an AI assistant that generates valid SQLite queries given a multi-table database. "
         "Use the conversation history for context. Only output the SQL query.\n\n"
         "Conversation History:\n{history}\n\n"
         "Database schema (all tables):\n{table_info}\n\n"
-        "Sample rows from each table:\n{sample_data}\n"
+        "Sample rows from each table:\n{sample_data}\n\n"
+        "Values from the question as stored in the database (use them exactly in filters):\n{value_hints}\n"
     ),
     suffix=(
         "Top K rows: {top_k}\n"
@@ -42,24 +49,90 @@ PROMPT = FewShotPromptTemplate(
     )
 )
 
-# Create a shared LLM instance; you can adjust the model settings as needed
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
-# llm = ChatGoogleGenerativeAI(
-#     model="gemini-2.0-flash",    temperature=0
-# )
+# LLM settings for SQL generation; calls go through the shared LLM gateway
+SQL_PROVIDER = "openai"  # or "gemini"
+SQL_MODEL = "gpt-4o-mini"
+SQL_TEMPERATURE = 0.2
+SQL_STOP = ["\nSQLResult:"]
+
+# The prompt create_sql_query_chain would build, without its table_info step, which
+# re-reflected every table on each call; the cached schema is passed instead.
+SQL_PROMPT = PROMPT.partial(top_k="5")
+
+
+async def generate_sql(inp: Dict, temperature: float = SQL_TEMPERATURE) -> str:
+    return await achat(SQL_PROMPT.format(**inp), provider=SQL_PROVIDER, model=SQL_MODEL,
+                       temperature=temperature, stop=SQL_STOP)
+
+# Speculative generation: with SQL_CANDIDATES > 1, that many queries are requested at once at
+# different temperatures, each is validated as soon as it arrives, and the first valid one
+# is used; the other requests are cancelled. 1 keeps a single generation per attempt.
+SQL_CANDIDATES = int(os.getenv("SQL_CANDIDATES", "1"))
+CANDIDATE_TEMPERATURES = [0.2, 0.5, 0.8, 1.0]
+
+
+def _clean_sql(sql_query: str) -> str:
+    sql_query = sql_query.strip()
+    # Cleanup possible markdown formatting
+    if sql_query.startswith("```"):
+        sql_query = sql_query.strip("```").replace("sql", "").strip()
+    return sql_query
+
+
+async def generate_candidates(inp: Dict, db_url: str, catalog: Dict, n: int = SQL_CANDIDATES):
+    """
+    Generate n SQL candidates concurrently and return the first one that validates.
+
+    Returns:
+        tuple: (sql, validation, candidates tried). When no candidate validates, the
+        first one generated is returned with its validation.
+    """
+    async def candidate(i):
+        temperature = CANDIDATE_TEMPERATURES[i % len(CANDIDATE_TEMPERATURES)]
+        sql_query = _clean_sql(await generate_sql(inp, temperature))
+        return sql_query, await run_sql(validate_sql, db_url, catalog, sql_query)
+
+    tasks = [asyncio.create_task(candidate(i)) for i in range(n)]
+    first = None
+    tried = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                sql_query, validation = await next_done
+            except Exception as e:
+                print(f"SQL candidate failed: {e}")
+                continue
+            tried += 1
+            if validation["ok"]:
+                return sql_query, validation, tried
+            if first is None:
+                first = (sql_query, validation)
+    finally:
+        for task in tasks:
+            task.cancel()
+    if first is None:
+        raise RuntimeError("Every SQL candidate request failed.")
+    return first[0], first[1], tried
+
+
+def _run_query(db, sql_query: str) -> Dict:
+    cursor = db.run(text(sql_query), fetch="cursor")
+    rows = [dict(r) for r in cursor.mappings()]
+    columns = list(rows[0].keys()) if rows else []
+    return {"columns": columns, "data": rows}
 
 
 # Define the state type as a Python dictionary.
-def init_state(question: str) -> Dict:
+def init_state(question: str, history: Optional[List[str]] = None) -> Dict:
     return {
         'question': question,
-        'history': [],
+        'history': list(history or []),
         'sql_query': "",
         'result': None,
         'retries': 0
     }
 
-async def async_query(query: str, db_type: str, db_url: str) -> List[Dict]:
+async def async_query(query: str, db_type: str, db_url: str, history: Optional[List[str]] = None) -> List[Dict]:
     """
     Asynchronously process a SQL query generation and execution with retries.
     
@@ -67,107 +140,170 @@ async def async_query(query: str, db_type: str, db_url: str) -> List[Dict]:
       - query (str): The natural language query.
       - db_type (str): The type of database. (Currently only "sqlite" is handled.)
       - db_url (str): The URI/path for connecting to the database.
+      - history (list): Conversation history lines for follow-up questions, oldest
+        first (see chat_memory.history_lines).
     
     Returns:
       A list of steps (as dictionaries) representing what occurred on each step,
       including any retries and the final result.
     """
-    steps: List[Dict] = []
+    return [step async for step in iter_query_steps(query, db_type, db_url, history)]
+
+async def iter_query_steps(query: str, db_type: str, db_url: str,
+                           history: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+    """
+    The steps of async_query(), yielded as soon as each one completes.
 
+    Used by the streaming /query endpoint to send the SQL and rows before the
+    explanation and chart exist.
+    """
     # Step 1: Connect to the database. You can extend this branch based on db_type if needed.
-    if db_type.lower() == "sqlite":
-        db = SQLDatabase.from_uri(f"sqlite:///{db_url}")
-    else:
+    # Each stage is timed as stage.<step>.seconds in /metrics (never across a yield)
+    if db_type.lower() != "sqlite":
         raise ValueError("Only 'sqlite' database type is currently supported.")
+    with timed("stage.load_database.seconds"):
+        # Schema and sample rows are computed once per database file and cached
+        cached = await run_sql(get_database, db_url)
+
+        # Literals in the question resolved to stored values, e.g. 'Acme Corp' -> customers.name = 'ACME Corporation'
+        value_hints = await run_sql(find_value_hints, db_url, query)
+        value_hints_str = format_value_hints(value_hints)
+
+    db = cached["db"]
+    tables = cached["tables"]
 
-    # Get schema and sample data
-    table_info_str = db.get_table_info()
-    sample_data = {}
-    tables = db.get_usable_table_names()
-    for tbl in tables:
-        try:
-            cursor = db.run(f"SELECT * FROM {tbl} LIMIT 5;", fetch="cursor")
-            rows = cursor.mappings()
-            sample_data[tbl] = [dict(r) for r in rows]
-        except Exception:
-            sample_data[tbl] = []
-
-    steps.append({
+    def prompt_context(text):
+        # Only the tables relevant to the text (and their FK neighbours) go into the prompt,
+        # plus any table holding a value the question mentions
+        prompt_tables = select_tables(cached["catalog"], text)
+        hint_tables = {hint["table"] for hint in value_hints} - set(prompt_tables)
+        if hint_tables:
+            prompt_tables = [tbl for tbl in tables if tbl in hint_tables or tbl in prompt_tables]
+        table_info = "\n\n".join(cached["table_infos"][tbl] for tbl in prompt_tables)
+        samples = {tbl: cached["sample_data"][tbl] for tbl in prompt_tables}
+        return prompt_tables, table_info, samples
+
+    with timed("stage.select_tables.seconds"):
+        # A follow-up ("and last year?") also needs the tables of the earlier turns' SQL
+        prompt_tables, table_info_str, sample_data = prompt_context(" ".join([query] + list(history or [])))
+
+    yield {
         "step": "load_database",
         "message": "Database loaded successfully",
         "tables": tables,
+        "prompt_tables": prompt_tables,
+        "value_hints": value_hints,
         "table_info": table_info_str,
         "sample_data": sample_data
-    })
+    }
 
     # Initialize state
-    state = init_state(query)
+    state = init_state(query, history)
 
     # Retry loop with a limit of 3 retries
     MAX_RETRIES = 3
+    HISTORY_WINDOW_SIZE = 10
+
+    # SQL that already ran for this question on this schema skips the LLM. The rolling history
+    # changes every turn, so only a follow-up is keyed on the turn it continues
+    schema_hash = cached["catalog"]["schema_hash"]
+    cache_history = state['history'][-1] if state['history'] and is_follow_up(query) else ""
+    cached_sql = await run_sql(get_cached_sql, query, db_url, schema_hash, cache_history)
 
     while True:
-        # Step 2: Generate SQL query using the LLM chain.
-        chain = create_sql_query_chain(
-            llm=llm,
-            db=db,
-            prompt=PROMPT,
-            k=5
-        )
-        # Prepare the input; note that we take only the last HISTORY_WINDOW_SIZE lines.
-        HISTORY_WINDOW_SIZE = 10
-        inp = {
-            "question": state["question"],
-            "history": "\n".join(state['history'][-HISTORY_WINDOW_SIZE:]),
-            "table_info": table_info_str,
-            "sample_data": sample_data,
-            "top_k": 5
-        }
-        # Here we wrap the synchronous call in asyncio.to_thread to avoid blocking.
-        sql_query = await asyncio.to_thread(chain.invoke, inp)
-        # Cleanup possible markdown formatting
-        if sql_query.strip().startswith("```"):
-            sql_query = sql_query.strip("```").replace("sql", "").strip()
+        from_cache = bool(cached_sql)
+        validation = None
+        candidates = 1
+        prompt_tokens = 0
+        if from_cache:
+            sql_query, cached_sql = cached_sql, None
+        else:
+            # Step 2: Generate SQL query using the LLM chain.
+            # Prepare the input; note that we take only the last HISTORY_WINDOW_SIZE lines.
+            # Schema, samples and history are fitted to the prompt token budget.
+            fixed = {"input": state["question"] + "\nSQLQuery: ", "value_hints": value_hints_str}
+            with timed("stage.build_prompt.seconds"):
+                # Budgeted and counted on the complete prompt: template, examples and question included
+                context = build_sql_prompt_context(
+                    cached, prompt_tables, state['history'][-HISTORY_WINDOW_SIZE:], value_hints_str,
+                    render=lambda parts: SQL_PROMPT.format(**fixed, **parts)
+                )
+            prompt_tokens = context["tokens"]
+            inp = dict(
+                fixed,
+                history=context["history"],
+                table_info=context["table_info"],
+                sample_data=context["sample_data"]
+            )
+            with timed("stage.generate_query.seconds"):
+                if SQL_CANDIDATES > 1:
+                    # Candidates are validated as they arrive; the first valid one wins
+                    sql_query, validation, candidates = await generate_candidates(inp, db_url, cached["catalog"])
+                else:
+                    sql_query = _clean_sql(await generate_sql(inp))
         state["sql_query"] = sql_query
-        steps.append({
+        yield {
             "step": "generate_query",
-            "sql_query": sql_query
-        })
+            "sql_query": sql_query,
+            "cached": from_cache,
+            "candidates": candidates,
+            "prompt_tokens": prompt_tokens
+        }
+
+        # Compile the query and check its plan before paying for execution
+        if validation is None:
+            with timed("stage.validate_query.seconds"):
+                validation = await run_sql(validate_sql, db_url, cached["catalog"], sql_query)
+        yield {
+            "step": "validate_query",
+            "ok": validation["ok"],
+            "error": validation["error"],
+            "warnings": validation["warnings"],
+            "plan": validation["plan"]
+        }
 
         # Step 3: Execute the SQL query.
-        try:
-            cursor = db.run(text(sql_query), fetch="cursor")
-            raw_rows = list(cursor.mappings())
-            rows = [dict(r) for r in raw_rows]
-            columns = list(rows[0].keys()) if rows else []
-            state["result"] = {"columns": columns, "data": rows}
-            steps.append({
-                "step": "execute_query",
-                "result": state["result"]
-            })
-        except Exception as e:
-            error_msg = str(e)
-            state["result"] = {"error": error_msg}
-            steps.append({
-                "step": "execute_query",
-                "error": error_msg
-            })
+        if not validation["ok"]:
+            state["result"] = {"error": validation["error"]}
+        else:
+            try:
+                # SQLite runs on the bounded SQL pool, off the event loop
+                with timed("stage.execute_query.seconds"):
+                    state["result"] = await run_sql(_run_query, db, sql_query)
+                yield {
+                    "step": "execute_query",
+                    "result": state["result"]
+                }
+            except Exception as e:
+                error_msg = str(e)
+                state["result"] = {"error": error_msg}
+                yield {
+                    "step": "execute_query",
+                    "error": error_msg
+                }
+
+        if "error" not in state["result"] and not from_cache:
+            await run_sql(put_cached_sql, query, db_url, schema_hash, sql_query, cache_history)
+        elif "error" in state["result"] and from_cache:
+            # The cached SQL no longer runs; forget it and generate a fresh query without using a retry
+            await run_sql(drop_cached_sql, query, db_url, schema_hash, cache_history)
+            continue
 
         # Check if there was an SQL error and whether we should retry
         if "error" in state["result"] and state["retries"] < MAX_RETRIES:
             state["retries"] += 1
             retry_message = f"Retry {state['retries']}: SQL error encountered: {state['result']['error']}"
             state["history"].append(retry_message)
-            steps.append({
+            # Names in the error (e.g. "no such column") can pull further tables into the prompt
+            prompt_tables, table_info_str, sample_data = prompt_context(f"{query} {sql_query} {state['result']['error']}")
+            yield {
                 "step": "retry",
                 "message": retry_message,
                 "history": state["history"],
                 "retries": state["retries"]
-            })
+            }
             # Optionally, yield control to let the caller process the step
             await asyncio.sleep(0)
         else:
             # No error or reached maximum retries.
             break
-
-    return steps
\ No newline at end of file
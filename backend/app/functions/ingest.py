@@ -0,0 +1,917 @@
+import csv
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime
+from itertools import islice
+from app.functions.sql_dump import iter_sql_statements, translate_statement
+
+# Rows per executemany() batch. Only one batch is held in memory at a time,
+# so peak memory is bounded by this value rather than by the file size.
+CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+# Statements per transaction when replaying a SQL dump. A mysqldump INSERT usually
+# carries hundreds of rows, so this is much smaller than CHUNK_SIZE.
+SQL_BATCH_STATEMENTS = int(os.getenv("INGEST_SQL_BATCH", "200"))
+
+# Pragmas for loading into a brand new database file. Durability does not
+# matter while the file is being built: if the load fails the file is thrown away.
+LOAD_PRAGMAS = [
+    "PRAGMA journal_mode=OFF",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA locking_mode=EXCLUSIVE",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+]
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def open_fresh_db(sqlite_path: str) -> sqlite3.Connection:
+    """
+    Open a connection to a new SQLite file configured for bulk loading.
+
+    Transactions are managed explicitly by the caller (isolation_level=None).
+    """
+    conn = sqlite3.connect(sqlite_path, isolation_level=None)
+    for pragma in LOAD_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+# Number of leading rows used to infer column types.
+INFER_SAMPLE_ROWS = int(os.getenv("INGEST_INFER_ROWS", "10000"))
+# At most this many coercion failures are reported back in detail.
+MAX_REPORTED_REJECTS = 50
+# Values treated as missing in every column, matching pandas' defaults.
+NULL_TOKENS = {"", "NA", "N/A", "n/a", "NULL", "null", "NaN", "nan", "None", "#N/A"}
+DATE_FORMATS = ["%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y"]
+# STRICT tables need SQLite 3.37+
+STRICT_SUFFIX = " STRICT" if sqlite3.sqlite_version_info >= (3, 37, 0) else ""
+
+
+def _to_int(value):
+    if len(value) > 1 and value[0] == "0":
+        # Leading zeros (ZIP codes, account numbers) are identifiers, not numbers
+        raise ValueError(value)
+    number = int(value)
+    if not -2**63 <= number < 2**63:
+        raise ValueError(value)
+    return number
+
+
+def _to_float(value):
+    if len(value) > 1 and value[0] == "0" and value[1] not in ".eE":
+        raise ValueError(value)
+    return float(value)
+
+
+def _date_parser(fmt):
+    def parse(value):
+        return datetime.strptime(value, fmt).date().isoformat()
+    return parse
+
+
+def _to_datetime(value):
+    return datetime.fromisoformat(value).isoformat(sep=" ")
+
+
+def _parses_all(parse, values):
+    try:
+        for value in values:
+            parse(value)
+    except (ValueError, OverflowError):
+        return False
+    return True
+
+
+def infer_column_types(rows, column_count):
+    """
+    Infer a storage type for each CSV column from a sample of rows.
+
+    Returns:
+        list: (sql_type, converter, label) per column. Dates and datetimes are stored
+        as ISO-8601 TEXT; converter is None for plain TEXT columns.
+    """
+    samples = [[] for _ in range(column_count)]
+    for row in rows:
+        for i, value in enumerate(row[:column_count]):
+            if value not in NULL_TOKENS:
+                samples[i].append(value.strip())
+
+    types = []
+    for values in samples:
+        if not values:
+            types.append(("TEXT", None, "TEXT"))
+        elif _parses_all(_to_int, values):
+            types.append(("INTEGER", _to_int, "INTEGER"))
+        elif _parses_all(_to_float, values):
+            types.append(("REAL", _to_float, "REAL"))
+        else:
+            date_format = next((fmt for fmt in DATE_FORMATS if _parses_all(_date_parser(fmt), values)), None)
+            if date_format:
+                types.append(("TEXT", _date_parser(date_format), "DATE"))
+            elif _parses_all(_to_datetime, values):
+                types.append(("TEXT", _to_datetime, "DATETIME"))
+            else:
+                types.append(("TEXT", None, "TEXT"))
+    return types
+
+
+def _column_def(name, col_type):
+    sql_type, _, label = col_type
+    definition = f"{quote_identifier(name)} {sql_type}"
+    if label != sql_type:
+        # STRICT has no date type; keep the logical type visible in the table's SQL
+        definition += f" /* ISO-8601 {label.lower()} */"
+    return definition
+
+
+def _unique_headers(header):
+    # SQLite column names are case-insensitive, so "Name" and "name" collide too
+    taken = set()
+    names = []
+    for i, name in enumerate(header):
+        name = name.strip() or f"column_{i + 1}"
+        candidate, n = name, 0
+        while candidate.casefold() in taken:
+            n += 1
+            candidate = f"{name}_{n}"
+        taken.add(candidate.casefold())
+        names.append(candidate)
+    return names
+
+
+def load_csv_to_sqlite(csv_file, sqlite_path: str, table_name: str, chunk_size: int = CHUNK_SIZE, progress=None) -> dict:
+    """
+    Stream a CSV file into a new, typed SQLite table in bounded chunks.
+
+    Column types (INTEGER/REAL/ISO date/ISO datetime/TEXT) are inferred from a sampled
+    prefix of the file and the table is created STRICT. Values that cannot be coerced to
+    their column's type are stored as NULL and reported. All chunks are inserted inside a
+    single transaction on a connection opened with load-time pragmas.
+
+    Args:
+        csv_file (str | file-like): Path to the CSV file or an open text stream.
+        sqlite_path (str): Path of the SQLite file to create.
+        table_name (str): Name of the table to create.
+        chunk_size (int): Number of rows inserted per batch.
+        progress (callable): Optional; called with the number of rows loaded so far after each batch.
+
+    Returns:
+        dict: Load statistics (table, rows, seconds, rows_per_sec, columns, rejected, rejects).
+    """
+    start = time.perf_counter()
+    own_file = isinstance(csv_file, str)
+    f = open(csv_file, "r", encoding="utf-8-sig", newline="") if own_file else csv_file
+    conn = open_fresh_db(sqlite_path)
+    rows_loaded = 0
+    rejected = 0
+    rejects = []
+    try:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            raise ValueError("CSV file is empty.")
+        columns = _unique_headers(header)
+        width = len(columns)
+
+        # The inference sample is the first rows of the file; it is inserted like any other chunk
+        chunk = list(islice(reader, max(chunk_size, INFER_SAMPLE_ROWS)))
+        types = infer_column_types(chunk, width)
+        converters = [converter for _, converter, _ in types]
+
+        column_defs = ", ".join(_column_def(c, t) for c, t in zip(columns, types))
+        placeholders = ", ".join(["?"] * width)
+        insert_stmt = f"INSERT INTO {quote_identifier(table_name)} VALUES ({placeholders})"
+
+        conn.execute("BEGIN")
+        conn.execute(f"CREATE TABLE {quote_identifier(table_name)} ({column_defs}){STRICT_SUFFIX}")
+        while chunk:
+            batch = []
+            for row in chunk:
+                rows_loaded += 1
+                if len(row) < width:
+                    row = row + [""] * (width - len(row))
+                values = []
+                for i in range(width):
+                    value = row[i]
+                    if value in NULL_TOKENS:
+                        values.append(None)
+                    elif converters[i] is None:
+                        values.append(value)
+                    else:
+                        try:
+                            values.append(converters[i](value.strip()))
+                        except (ValueError, OverflowError):
+                            values.append(None)
+                            rejected += 1
+                            if len(rejects) < MAX_REPORTED_REJECTS:
+                                rejects.append({"row": rows_loaded, "column": columns[i], "value": value, "expected": types[i][2]})
+                batch.append(values)
+            conn.executemany(insert_stmt, batch)
+            if progress:
+                progress(rows_loaded)
+            chunk = list(islice(reader, chunk_size))
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+        if own_file:
+            f.close()
+
+    seconds = time.perf_counter() - start
+    stats = {
+        "table": table_name,
+        "rows": rows_loaded,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows_loaded / seconds) if seconds > 0 else rows_loaded,
+        "columns": {c: t[2] for c, t in zip(columns, types)},
+        "rejected": rejected,
+        "rejects": rejects,
+    }
+    print(f"Loaded {rows_loaded} rows into '{table_name}' in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec)")
+    if rejected:
+        print(f"{rejected} values in '{table_name}' could not be coerced to their column type and were stored as NULL")
+    return stats
+
+
+class _JsonStream:
+    """
+    Minimal pull reader over a JSON text stream.
+
+    Values are decoded one at a time with JSONDecoder.raw_decode, so only the value
+    being read (e.g. a single row object) is held in memory, never the whole document.
+    """
+
+    def __init__(self, f, read_size=1024 * 1024):
+        self.f = f
+        self.read_size = read_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        if self.eof:
+            return False
+        data = self.f.read(self.read_size)
+        if not data:
+            self.eof = True
+            return False
+        if self.pos > self.read_size:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += data
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON file.")
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            raise ValueError(f"Invalid JSON upload: expected '{ch}' at offset {self.pos}.")
+        self.pos += 1
+
+    def read_value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number that ends at the buffer end, or before a '.'/'e' whose digits are
+                # not read yet ("1." of "1.5"), may be truncated
+                truncated = end == len(self.buf) or (
+                    isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and self.buf[end] in ".eE+-0123456789"
+                )
+                if not truncated or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def items(self):
+        """Iterate over the keys of the object at the cursor; the caller must consume each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(":")
+            yield key
+            sep = self.peek()
+            self.pos += 1
+            if sep == "}":
+                return
+            if sep != ",":
+                raise ValueError(f"Invalid JSON upload: expected ',' or '}}' at offset {self.pos - 1}.")
+
+    def elements(self):
+        """Iterate over the values of the array starting at the cursor."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.read_value()
+            sep = self.peek()
+            self.pos += 1
+            if sep == "]":
+                return
+            if sep != ",":
+                raise ValueError(f"Invalid JSON upload: expected ',' or ']' at offset {self.pos - 1}.")
+
+
+def _json_cell(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _create_json_table(conn, table_name, columns):
+    column_defs = []
+    for col in columns:
+        nullable = "" if col.get("nullable", True) else " NOT NULL"
+        column_defs.append(f"{quote_identifier(col['name'])} {col.get('type', '')}{nullable}".rstrip())
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {quote_identifier(table_name)} ({', '.join(column_defs)})")
+
+
+def _retype_json_table(conn, table_name, columns, existing):
+    # The table was created untyped from its rows before its schema was read: rebuild it
+    # with the declared columns (plus any undeclared ones the rows added) and copy the rows
+    declared = [col["name"] for col in columns]
+    extra = [c for c in existing if c not in declared]
+    typed_name = f"{table_name}__typed"
+    _create_json_table(conn, typed_name, list(columns) + [{"name": c} for c in extra])
+    names = ", ".join(quote_identifier(c) for c in existing)
+    conn.execute(
+        f"INSERT INTO {quote_identifier(typed_name)} ({names}) SELECT {names} FROM {quote_identifier(table_name)}"
+    )
+    conn.execute(f"DROP TABLE {quote_identifier(table_name)}")
+    conn.execute(f"ALTER TABLE {quote_identifier(typed_name)} RENAME TO {quote_identifier(table_name)}")
+    return declared + extra
+
+
+def _stream_json_rows(conn, table_name, rows, table_columns, batch_size, progress=None, rows_before=0):
+    if table_name not in table_columns:
+        table_columns[table_name] = None
+    col_names = table_columns[table_name]
+    insert_stmt = None
+    batch = []
+    count = 0
+
+    def flush():
+        if batch:
+            conn.executemany(insert_stmt, batch)
+            batch.clear()
+            if progress:
+                progress(rows_before + count)
+
+    for row in rows:
+        if not isinstance(row, dict):
+            raise ValueError(f"Rows of table '{table_name}' must be JSON objects.")
+        if col_names is None:
+            # No schema entry for this table: derive the columns from the first row
+            _create_json_table(conn, table_name, [{"name": k} for k in row])
+            col_names = list(row)
+        new_cols = [k for k in row if k not in col_names]
+        if new_cols or insert_stmt is None:
+            flush()
+            for k in new_cols:
+                conn.execute(f"ALTER TABLE {quote_identifier(table_name)} ADD COLUMN {quote_identifier(k)}")
+                col_names.append(k)
+            placeholders = ", ".join(["?"] * len(col_names))
+            insert_stmt = (
+                f"INSERT INTO {quote_identifier(table_name)} "
+                f"({', '.join(quote_identifier(c) for c in col_names)}) VALUES ({placeholders})"
+            )
+        # Look values up by name so rows may differ in key order or omit keys
+        batch.append(tuple(_json_cell(row.get(c)) for c in col_names))
+        count += 1
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    table_columns[table_name] = col_names
+    return count
+
+
+def load_json_to_sqlite(json_file, sqlite_path: str, batch_size: int = CHUNK_SIZE, progress=None) -> dict:
+    """
+    Incrementally load a {"schema": {...}, "data": {...}} JSON upload into a new SQLite file.
+
+    Tables are created from "schema" and each table's "data" array is streamed row by
+    row into SQLite in batches, so memory stays bounded regardless of the file size.
+    Rows are matched to columns by key; missing keys become NULL and unseen keys add columns.
+    The two keys may come in either order: a table whose rows were read before its schema
+    is rebuilt with the declared column types.
+
+    Args:
+        json_file (str | file-like): Path to the JSON file or an open text stream.
+        sqlite_path (str): Path of the SQLite file to create.
+        batch_size (int): Number of rows inserted per batch.
+        progress (callable): Optional; called with the number of rows loaded so far after each batch.
+
+    Returns:
+        dict: Load statistics (tables, rows, seconds, rows_per_sec).
+    """
+    start = time.perf_counter()
+    own_file = isinstance(json_file, str)
+    f = open(json_file, "r", encoding="utf-8-sig") if own_file else json_file
+    conn = open_fresh_db(sqlite_path)
+    table_columns = {}
+    table_rows = {}
+    try:
+        reader = _JsonStream(f)
+        conn.execute("BEGIN")
+        for key in reader.items():
+            if key == "schema":
+                schema = reader.read_value()
+                for table_name, columns in schema.items():
+                    existing = table_columns.get(table_name)
+                    if existing is None:
+                        _create_json_table(conn, table_name, columns)
+                        table_columns[table_name] = [col["name"] for col in columns]
+                    else:
+                        table_columns[table_name] = _retype_json_table(conn, table_name, columns, existing)
+            elif key == "data":
+                for table_name in reader.items():
+                    count = _stream_json_rows(conn, table_name, reader.elements(), table_columns, batch_size,
+                                              progress, sum(table_rows.values()))
+                    table_rows[table_name] = table_rows.get(table_name, 0) + count
+            else:
+                reader.read_value()
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+        if own_file:
+            f.close()
+
+    rows_loaded = sum(table_rows.values())
+    seconds = time.perf_counter() - start
+    stats = {
+        "tables": table_rows,
+        "rows": rows_loaded,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows_loaded / seconds) if seconds > 0 else rows_loaded,
+    }
+    print(f"Loaded {rows_loaded} rows into {len(table_columns)} tables in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec)")
+    return stats
+
+
+_INSERT_TARGET_RE = re.compile(r'^INSERT(?:\s+OR\s+\w+)?\s+INTO\s+("(?:[^"]|"")*"|[^\s(]+)', re.I)
+
+
+def _insert_target(sql):
+    m = _INSERT_TARGET_RE.match(sql)
+    return m.group(1).strip('"').replace('""', '"') if m else None
+
+
+def load_sql_dump_to_sqlite(dump_file, sqlite_path: str, batch_size: int = SQL_BATCH_STATEMENTS, progress=None) -> dict:
+    """
+    Replay a SQL dump (mysqldump, MariaDB or sqlite3 .dump output) into a new SQLite file.
+
+    The dump is tokenized as a stream and each statement is translated to SQLite and
+    executed, committing every `batch_size` statements. Secondary indexes declared in
+    CREATE TABLE are built after the data. Session settings, locks, triggers, routines,
+    MySQL views and ALTER statements are skipped.
+
+    Args:
+        dump_file (str | file-like): Path to the .sql file or an open text stream.
+        sqlite_path (str): Path of the SQLite file to create.
+        batch_size (int): Number of statements executed per transaction.
+        progress (callable): Optional; called with the number of rows loaded so far after each batch.
+
+    Returns:
+        dict: Load statistics (tables, rows, skipped, seconds, rows_per_sec).
+    """
+    start = time.perf_counter()
+    own_file = isinstance(dump_file, str)
+    f = open(dump_file, "r", encoding="utf-8-sig", errors="replace") if own_file else dump_file
+    conn = open_fresh_db(sqlite_path)
+    table_rows = {}
+    indexes = []
+    skipped = 0
+    pending = 0
+    try:
+        conn.execute("BEGIN")
+        for statement in iter_sql_statements(f):
+            kind, sql, table_indexes = translate_statement(statement)
+            if kind == "skip":
+                skipped += 1
+                continue
+            try:
+                cursor = conn.execute(sql)
+            except sqlite3.Error as e:
+                if kind in ("create", "insert"):
+                    raise ValueError(f"Could not import statement '{statement[:200]}': {e}") from e
+                print(f"Skipping statement '{statement[:100]}': {e}")
+                skipped += 1
+                continue
+            indexes.extend(table_indexes)
+            if kind == "insert":
+                table = _insert_target(sql)
+                table_rows[table] = table_rows.get(table, 0) + max(cursor.rowcount, 0)
+            pending += 1
+            if pending >= batch_size:
+                conn.execute("COMMIT")
+                if progress:
+                    progress(sum(table_rows.values()))
+                conn.execute("BEGIN")
+                pending = 0
+        for create_sql in indexes:
+            try:
+                conn.execute(create_sql)
+            except sqlite3.Error as e:
+                print(f"Skipping index '{create_sql}': {e}")
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+        if own_file:
+            f.close()
+
+    rows_loaded = sum(table_rows.values())
+    seconds = time.perf_counter() - start
+    stats = {
+        "tables": table_rows,
+        "rows": rows_loaded,
+        "skipped": skipped,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows_loaded / seconds) if seconds > 0 else rows_loaded,
+    }
+    print(f"Loaded {rows_loaded} rows into {len(table_rows)} tables from SQL dump in {stats['seconds']}s "
+          f"({stats['rows_per_sec']} rows/sec, {skipped} statements skipped)")
+    return stats
+
+
+def _iso_date(value):
+    return value.isoformat()
+
+
+def _iso_datetime(value):
+    return value.isoformat(sep=" ")
+
+
+def _arrow_column_type(pa, arrow_type):
+    """Map an Arrow type to (sql_type, converter, label), like infer_column_types()."""
+    types = pa.types
+    if types.is_dictionary(arrow_type):
+        return _arrow_column_type(pa, arrow_type.value_type)
+    if types.is_boolean(arrow_type) or types.is_integer(arrow_type):
+        return ("INTEGER", None, "INTEGER")
+    if types.is_floating(arrow_type):
+        return ("REAL", None, "REAL")
+    if types.is_decimal(arrow_type):
+        return ("REAL", float, "REAL")
+    if types.is_date(arrow_type):
+        return ("TEXT", _iso_date, "DATE")
+    if types.is_timestamp(arrow_type):
+        return ("TEXT", _iso_datetime, "DATETIME")
+    if types.is_string(arrow_type) or types.is_large_string(arrow_type):
+        return ("TEXT", None, "TEXT")
+    if types.is_binary(arrow_type) or types.is_large_binary(arrow_type) or types.is_fixed_size_binary(arrow_type):
+        return ("BLOB", None, "BLOB")
+    # Times, durations, lists, structs and maps are stored as text
+    return ("TEXT", lambda value: json.dumps(value, default=str) if isinstance(value, (dict, list)) else str(value), "TEXT")
+
+
+def load_parquet_to_sqlite(parquet_file, sqlite_path: str, table_name: str, batch_size: int = CHUNK_SIZE, progress=None) -> dict:
+    """
+    Load a Parquet file into a new, typed SQLite table one record batch at a time.
+
+    Column types come from the Parquet schema instead of being inferred, and each batch
+    is converted column by column and bulk-inserted, so only one batch is in memory.
+
+    Args:
+        parquet_file (str | file-like): Path to the Parquet file or a seekable binary stream.
+        sqlite_path (str): Path of the SQLite file to create.
+        table_name (str): Name of the table to create.
+        batch_size (int): Number of rows read and inserted per batch.
+        progress (callable): Optional; called with the number of rows loaded so far after each batch.
+
+    Returns:
+        dict: Load statistics (table, rows, seconds, rows_per_sec, columns).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet uploads need the pyarrow package to be installed.")
+
+    start = time.perf_counter()
+    parquet = pq.ParquetFile(parquet_file)
+    columns = _unique_headers(parquet.schema_arrow.names)
+    types = [_arrow_column_type(pa, field.type) for field in parquet.schema_arrow]
+    converters = [converter for _, converter, _ in types]
+
+    column_defs = ", ".join(_column_def(c, t) for c, t in zip(columns, types))
+    insert_stmt = f"INSERT INTO {quote_identifier(table_name)} VALUES ({', '.join(['?'] * len(columns))})"
+    conn = open_fresh_db(sqlite_path)
+    rows_loaded = 0
+    try:
+        conn.execute("BEGIN")
+        conn.execute(f"CREATE TABLE {quote_identifier(table_name)} ({column_defs}){STRICT_SUFFIX}")
+        for batch in parquet.iter_batches(batch_size=batch_size):
+            values = []
+            for column, converter in zip(batch.columns, converters):
+                column_values = column.to_pylist()
+                if converter is not None:
+                    column_values = [None if v is None else converter(v) for v in column_values]
+                values.append(column_values)
+            conn.executemany(insert_stmt, zip(*values))
+            rows_loaded += batch.num_rows
+            if progress:
+                progress(rows_loaded)
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    seconds = time.perf_counter() - start
+    stats = {
+        "table": table_name,
+        "rows": rows_loaded,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows_loaded / seconds) if seconds > 0 else rows_loaded,
+        "columns": {c: t[2] for c, t in zip(columns, types)},
+    }
+    print(f"Loaded {rows_loaded} rows into '{table_name}' in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec)")
+    return stats
+
+
+def _excel_int(value):
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    if isinstance(value, (str, datetime)):
+        raise ValueError(value)
+    return int(value)
+
+
+def _excel_float(value):
+    if isinstance(value, (str, datetime)):
+        raise ValueError(value)
+    return float(value)
+
+
+def _excel_date(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    raise ValueError(value)
+
+
+def _excel_datetime(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    raise ValueError(value)
+
+
+def _excel_text(value):
+    return _iso_datetime(value) if isinstance(value, datetime) else str(value)
+
+
+def infer_excel_column_types(rows, column_count):
+    """
+    Infer a storage type for each sheet column from the native cell values of a sample.
+
+    Returns:
+        list: (sql_type, converter, label) per column, as infer_column_types().
+    """
+    samples = [[] for _ in range(column_count)]
+    for row in rows:
+        for i, value in enumerate(row[:column_count]):
+            if value is not None and value != "":
+                samples[i].append(value)
+
+    types = []
+    for values in samples:
+        if values and all(isinstance(v, int) or (isinstance(v, float) and v.is_integer()) for v in values):
+            types.append(("INTEGER", _excel_int, "INTEGER"))
+        elif values and all(isinstance(v, (int, float)) for v in values):
+            types.append(("REAL", _excel_float, "REAL"))
+        elif values and all(isinstance(v, date) for v in values):
+            # Excel has no date-only cells; midnight everywhere means the column holds dates
+            if all(not isinstance(v, datetime) or v.time() == datetime.min.time() for v in values):
+                types.append(("TEXT", _excel_date, "DATE"))
+            else:
+                types.append(("TEXT", _excel_datetime, "DATETIME"))
+        else:
+            types.append(("TEXT", _excel_text, "TEXT"))
+    return types
+
+
+def load_excel_to_sqlite(excel_file, sqlite_path: str, chunk_size: int = CHUNK_SIZE, progress=None) -> dict:
+    """
+    Load every sheet of an XLSX workbook into its own typed SQLite table.
+
+    The workbook is opened read-only, so rows are streamed from the file rather than
+    loaded as a whole. The first row of a sheet is its header; column types are inferred
+    from the native cell values of a sampled prefix, and values that do not fit are stored
+    as NULL and reported, as in load_csv_to_sqlite(). Empty sheets are skipped.
+
+    Args:
+        excel_file (str | file-like): Path to the .xlsx file or a seekable binary stream.
+        sqlite_path (str): Path of the SQLite file to create.
+        chunk_size (int): Number of rows inserted per batch.
+        progress (callable): Optional; called with the number of rows loaded so far after each batch.
+
+    Returns:
+        dict: Load statistics (tables, rows, seconds, rows_per_sec, columns, rejected, rejects).
+    """
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError("Excel uploads need the openpyxl package to be installed.")
+
+    start = time.perf_counter()
+    workbook = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+    conn = open_fresh_db(sqlite_path)
+    table_rows = {}
+    table_columns = {}
+    rejected = 0
+    rejects = []
+    try:
+        conn.execute("BEGIN")
+        for sheet in workbook.worksheets:
+            reader = sheet.iter_rows(values_only=True)
+            header = next(reader, None)
+            if not header or all(cell is None for cell in header):
+                continue
+            columns = _unique_headers(["" if cell is None else str(cell) for cell in header])
+            width = len(columns)
+            table_name = sheet.title
+            insert_stmt = f"INSERT INTO {quote_identifier(table_name)} VALUES ({', '.join(['?'] * width)})"
+
+            chunk = list(islice(reader, max(chunk_size, INFER_SAMPLE_ROWS)))
+            types = infer_excel_column_types(chunk, width)
+            converters = [converter for _, converter, _ in types]
+            conn.execute(f"CREATE TABLE {quote_identifier(table_name)} "
+                         f"({', '.join(_column_def(c, t) for c, t in zip(columns, types))}){STRICT_SUFFIX}")
+            rows_loaded = 0
+            while chunk:
+                batch = []
+                for row in chunk:
+                    if all(cell is None for cell in row):
+                        continue
+                    rows_loaded += 1
+                    values = []
+                    for i in range(width):
+                        value = row[i] if i < len(row) else None
+                        if value is None or value == "":
+                            values.append(None)
+                            continue
+                        try:
+                            values.append(converters[i](value))
+                        except (ValueError, OverflowError, TypeError):
+                            values.append(None)
+                            rejected += 1
+                            if len(rejects) < MAX_REPORTED_REJECTS:
+                                rejects.append({"table": table_name, "row": rows_loaded, "column": columns[i],
+                                                "value": str(value), "expected": types[i][2]})
+                    batch.append(values)
+                conn.executemany(insert_stmt, batch)
+                table_rows[table_name] = rows_loaded
+                if progress:
+                    progress(sum(table_rows.values()))
+                chunk = list(islice(reader, chunk_size))
+            table_rows[table_name] = rows_loaded
+            table_columns[table_name] = {c: t[2] for c, t in zip(columns, types)}
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+        workbook.close()
+
+    if not table_rows:
+        raise ValueError("Excel workbook has no sheets with data.")
+    rows_loaded = sum(table_rows.values())
+    seconds = time.perf_counter() - start
+    stats = {
+        "tables": table_rows,
+        "rows": rows_loaded,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows_loaded / seconds) if seconds > 0 else rows_loaded,
+        "columns": table_columns,
+        "rejected": rejected,
+        "rejects": rejects,
+    }
+    print(f"Loaded {rows_loaded} rows into {len(table_rows)} tables in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec)")
+    if rejected:
+        print(f"{rejected} values could not be coerced to their column type and were stored as NULL")
+    return stats
+
+
+def convert_file_to_sqlite(source_path: str, original_filename: str, sqlite_path: str) -> dict:
+    """
+    Build a standalone SQLite file from one CSV, JSON, SQL dump, Parquet or XLSX source.
+
+    Module-level so it can run on the ingestion process pool.
+    """
+    filename_lower = original_filename.lower()
+    if filename_lower.endswith(".csv"):
+        table_name = os.path.splitext(os.path.basename(original_filename))[0]
+        return load_csv_to_sqlite(source_path, sqlite_path, table_name)
+    if filename_lower.endswith(".json"):
+        return load_json_to_sqlite(source_path, sqlite_path)
+    if filename_lower.endswith(".sql"):
+        return load_sql_dump_to_sqlite(source_path, sqlite_path)
+    if filename_lower.endswith(".parquet"):
+        table_name = os.path.splitext(os.path.basename(original_filename))[0]
+        return load_parquet_to_sqlite(source_path, sqlite_path, table_name)
+    if filename_lower.endswith(".xlsx"):
+        return load_excel_to_sqlite(source_path, sqlite_path)
+    raise ValueError(f"Unsupported file format: {original_filename}")
+
+
+def _free_table_name(conn, name):
+    merged = {row[0].lower() for row in conn.execute("SELECT name FROM main.sqlite_master")}
+    if name.lower() not in merged:
+        return name
+    # The table is renamed inside the attached part first, so the new name must be free there too
+    taken = merged | {row[0].lower() for row in conn.execute("SELECT name FROM src.sqlite_master")}
+    n = 2
+    while f"{name}_{n}".lower() in taken:
+        n += 1
+    return f"{name}_{n}"
+
+
+def merge_databases(part_paths, sqlite_path: str) -> dict:
+    """
+    Copy every table (with its indexes and views) from several SQLite files into a new one.
+
+    Tables keep their declared schema; a table whose name is already taken is renamed
+    with a numeric suffix. The part files may be modified by the renames.
+
+    Returns:
+        dict: Rows copied per target table.
+    """
+    conn = open_fresh_db(sqlite_path)
+    table_rows = {}
+    try:
+        for part_path in part_paths:
+            conn.execute("ATTACH DATABASE ? AS src", (part_path,))
+            try:
+                tables = [row[0] for row in conn.execute(
+                    "SELECT name FROM src.sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+                )]
+                for table in tables:
+                    target = _free_table_name(conn, table)
+                    if target != table:
+                        conn.execute(f"ALTER TABLE src.{quote_identifier(table)} RENAME TO {quote_identifier(target)}")
+                conn.execute("BEGIN")
+                for name, create_sql in conn.execute(
+                    "SELECT name, sql FROM src.sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+                ).fetchall():
+                    conn.execute(create_sql)
+                    cursor = conn.execute(
+                        f"INSERT INTO main.{quote_identifier(name)} SELECT * FROM src.{quote_identifier(name)}"
+                    )
+                    table_rows[name] = cursor.rowcount
+                # Indexes are built after the bulk copy; views last since they reference tables
+                for (create_sql,) in conn.execute(
+                    "SELECT sql FROM src.sqlite_master WHERE type IN ('index', 'view') AND sql IS NOT NULL "
+                    "ORDER BY type = 'view'"
+                ).fetchall():
+                    try:
+                        conn.execute(create_sql)
+                    except sqlite3.OperationalError as e:
+                        print(f"Skipped object while merging {part_path}: {e}")
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.execute("DETACH DATABASE src")
+    finally:
+        conn.close()
+    return table_rows
@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+
+# Background ingestion jobs. Uploads are staged to disk by the request and the
+# conversion/reflection work runs here on a bounded pool of worker threads; clients
+# poll the job for its phase, row count and ETA.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# Uploads beyond this many unfinished jobs are refused instead of queued
+MAX_PENDING_JOBS = int(os.getenv("INGEST_MAX_PENDING", "20"))
+# Finished jobs kept in memory for status polling
+MAX_FINISHED_JOBS = 500
+# Processes used to parse and type-convert the files of a multi-file upload in parallel
+INGEST_PROCESSES = int(os.getenv("INGEST_PROCESSES", str(os.cpu_count() or 2)))
+
+executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+_process_pool = None
+_jobs = {}
+_lock = threading.Lock()
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared conversion process pool, starting it on first use."""
+    global _process_pool
+    with _lock:
+        if _process_pool is None:
+            # spawn rather than fork: the parent has live threads and Mongo clients
+            _process_pool = ProcessPoolExecutor(
+                max_workers=INGEST_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+
+def _pending_count():
+    return sum(1 for job in _jobs.values() if job["status"] in ("queued", "running"))
+
+
+def _evict_finished():
+    finished = [job for job in _jobs.values() if job["status"] in ("done", "failed")]
+    if len(finished) <= MAX_FINISHED_JOBS:
+        return
+    finished.sort(key=lambda job: job["finished_at"])
+    for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+        del _jobs[job["job_id"]]
+
+
+def submit_job(target, bytes_total=0, **info) -> str:
+    """
+    Queue target(job_id) on the ingestion pool.
+
+    Args:
+        target (callable): Does the work; called with the job id. Its return value
+            becomes the job's result.
+        bytes_total (int): Size of the input, used to estimate the ETA.
+        **info: Extra fields stored on the job (e.g. chat_id, filename).
+
+    Returns:
+        str: The job id.
+    """
+    job_id = str(uuid.uuid4())
+    with _lock:
+        if _pending_count() >= MAX_PENDING_JOBS:
+            raise QueueFullError("Too many uploads are being processed. Please try again shortly.")
+        _jobs[job_id] = {
+            **info,
+            "job_id": job_id,
+            "status": "queued",
+            "phase": "queued",
+            "rows_ingested": 0,
+            "bytes_total": bytes_total,
+            "bytes_done": 0,
+            "created_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+    executor.submit(_run, job_id, target)
+    return job_id
+
+
+def _run(job_id, target):
+    update_job(job_id, status="running", phase="starting", started_at=datetime.utcnow(), _t0=time.monotonic())
+    try:
+        result = target(job_id)
+        update_job(job_id, status="done", phase="done", result=result, finished_at=datetime.utcnow())
+    except Exception as e:
+        print(f"Ingestion job {job_id} failed: {e}")
+        update_job(job_id, status="failed", phase="failed", error=str(e), finished_at=datetime.utcnow())
+    with _lock:
+        _evict_finished()
+
+
+def update_job(job_id, **fields) -> None:
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+
+
+def report_progress(job_id, rows_ingested, bytes_done=None) -> None:
+    fields = {"rows_ingested": rows_ingested}
+    if bytes_done is not None:
+        fields["bytes_done"] = bytes_done
+    update_job(job_id, **fields)
+
+
+def get_job(job_id):
+    """Return a JSON-serialisable snapshot of a job, or None if unknown."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+
+    eta = None
+    t0 = job.pop("_t0", None)
+    if job["status"] == "running" and t0 and job["bytes_total"] and job["bytes_done"]:
+        elapsed = time.monotonic() - t0
+        remaining = max(job["bytes_total"] - job["bytes_done"], 0)
+        eta = round(elapsed * remaining / job["bytes_done"], 1)
+    elif job["status"] == "done":
+        eta = 0
+    job["eta_seconds"] = eta
+    for key in ("created_at", "started_at", "finished_at"):
+        if job[key] is not None:
+            job[key] = job[key].isoformat()
+    return job
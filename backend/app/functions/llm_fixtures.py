@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Recorded LLM responses, in a local SQLite file, for running the backend without a provider.
+# With LLM_MODE=record every completion made through the LLM gateway is stored under a key of
+# provider, model, prompt, temperature and stop sequences (and, for structured output, the
+# JSON schema of the response format, and the token limit of requests that set one); with LLM_MODE=replay the gateway answers from this
+# store instead of calling the provider.
+#
+# UUIDs in a prompt (output file names, ids) differ on every run, so they are replaced by
+# numbered placeholders before the prompt is keyed, and the response is stored with the same
+# placeholders; on replay they are filled with the UUIDs of the new prompt. A chart prompt for
+# output/<new uuid>.png thus replays code that saves to the new path.
+LLM_FIXTURES_PATH = os.getenv("LLM_FIXTURES_PATH", os.path.join("output", "llm_fixtures.db"))
+
+_UUID_RE = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+
+_conn = None
+_lock = threading.Lock()
+
+
+class ReplayMiss(LookupError):
+    """Raised in replay mode for a request that has no recorded response."""
+
+
+def _connection():
+    global _conn
+    if _conn is None:
+        folder = os.path.dirname(LLM_FIXTURES_PATH)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(LLM_FIXTURES_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_fixtures ("
+            "key TEXT PRIMARY KEY, provider TEXT NOT NULL, model TEXT NOT NULL, prompt TEXT NOT NULL, "
+            "response TEXT NOT NULL, seconds REAL NOT NULL, recorded_at REAL NOT NULL)"
+        )
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def _mask(text, ids):
+    for i, value in enumerate(ids):
+        text = text.replace(value, f"<uuid{i}>")
+    return text
+
+
+def _unmask(text, ids):
+    for i, value in enumerate(ids):
+        text = text.replace(f"<uuid{i}>", value)
+    return text
+
+
+def fixture_key(provider: str, model: str, prompt, temperature=None, stop=None, response_format=None,
+                max_tokens=None):
+    """
+    Key of a completion request.
+
+    Returns:
+        tuple: (key, masked prompt text, UUIDs of the prompt in order of appearance)
+    """
+    text = prompt if isinstance(prompt, str) else json.dumps(prompt, sort_keys=True)
+    ids = list(dict.fromkeys(_UUID_RE.findall(text)))
+    masked = _mask(text, ids)
+    parts = [provider, model, masked, temperature, stop]
+    if response_format is not None:
+        # Only structured requests carry it, so the keys of plain completions are unchanged
+        parts.append(response_format)
+    if max_tokens is not None:
+        parts.append({"max_tokens": max_tokens})
+    payload = json.dumps(parts)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest(), masked, ids
+
+
+def record_fixture(provider: str, model: str, prompt, temperature, stop, response: str, seconds: float,
+                   response_format: str = None, max_tokens: int = None) -> None:
+    """Store (or overwrite) the response of a completion request."""
+    key, masked, ids = fixture_key(provider, model, prompt, temperature, stop, response_format, max_tokens)
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_fixtures (key, provider, model, prompt, response, seconds, recorded_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, provider, model, masked, _mask(response, ids), seconds, time.time()),
+        )
+        conn.commit()
+
+
+def replay_fixture(provider: str, model: str, prompt, temperature=None, stop=None, response_format=None,
+                   max_tokens=None):
+    """
+    Recorded response of a completion request.
+
+    Returns:
+        tuple: (response, seconds the recorded call took)
+
+    Raises:
+        ReplayMiss: Nothing was recorded for the request.
+    """
+    key, masked, ids = fixture_key(provider, model, prompt, temperature, stop, response_format, max_tokens)
+    with _lock:
+        row = _connection().execute("SELECT response, seconds FROM llm_fixtures WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        raise ReplayMiss(
+            f"No recorded {provider}/{model} response for this prompt in {LLM_FIXTURES_PATH} "
+            f"(run with LLM_MODE=record first): {masked[:200]!r}"
+        )
+    return _unmask(row[0], ids), row[1]
@@ -0,0 +1,412 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+import weakref
+from contextlib import contextmanager, asynccontextmanager
+from dotenv import load_dotenv
+from app.functions.metrics import incr, observe
+from app.functions.llm_fixtures import record_fixture, replay_fixture, ReplayMiss
+
+# Single entry point for LLM calls. The gateway owns one pooled, keep-alive client per
+# provider (OpenAI sync and async, Gemini), limits concurrent calls and requests per minute
+# per provider, and retries rate-limit, server and connection errors with jittered
+# exponential backoff. Call sites use chat()/achat()/astream() for text completions, parse()
+# for structured output and call()/acall() for any other SDK method (audio).
+#
+# Per-provider settings, e.g. for openai: LLM_OPENAI_CONCURRENCY, LLM_OPENAI_RPM (0 = no
+# limit). LLM_MAX_RETRIES and LLM_BACKOFF_* apply to every provider.
+#
+# LLM_MODE selects where completions come from:
+#   live   - the provider (default)
+#   record - the provider, and every completion is stored in the fixture store (llm_fixtures)
+#   replay - the fixture store only; no network. Each replayed completion takes
+#            LLM_REPLAY_LATENCY seconds ("recorded" = as long as the recorded call took),
+#            spent holding a provider slot like a live call.
+# Replay serves chat()/achat()/astream() and parse(); call()/acall() have no fixtures and
+# raise ReplayMiss in replay mode. Callers that fall back on LLM errors re-raise ReplayMiss,
+# so an offline run never silently diverges from the live run it replays.
+load_dotenv()
+
+LLM_MODE = os.getenv("LLM_MODE", "live")
+REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "0")
+
+PROVIDERS = ("openai", "gemini")
+DEFAULT_MODELS = {
+    "openai": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+    "gemini": os.getenv("GEMINI_MODEL", "gemini-2.0-flash"),
+}
+CONCURRENCY = {
+    "openai": int(os.getenv("LLM_OPENAI_CONCURRENCY", "16")),
+    "gemini": int(os.getenv("LLM_GEMINI_CONCURRENCY", "8")),
+}
+REQUESTS_PER_MINUTE = {
+    "openai": int(os.getenv("LLM_OPENAI_RPM", "0")),
+    "gemini": int(os.getenv("LLM_GEMINI_RPM", "0")),
+}
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+# Keep-alive connections kept open per OpenAI client
+MAX_KEEPALIVE = 20
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+_lock = threading.Lock()
+_clients = {}
+_thread_slots = {provider: threading.BoundedSemaphore(CONCURRENCY[provider]) for provider in PROVIDERS}
+# asyncio semaphores belong to an event loop; one set is kept per loop
+_async_slots = weakref.WeakKeyDictionary()
+
+
+class _RateLimiter:
+    """Spaces requests evenly to stay under a requests-per-minute limit."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_at = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Reserve the next request slot; returns the seconds to wait before sending."""
+        if not self.interval:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+            return at - now
+
+
+_rate_limiters = {provider: _RateLimiter(REQUESTS_PER_MINUTE[provider]) for provider in PROVIDERS}
+
+
+def openai_client():
+    """Shared OpenAI client (keep-alive connection pool; the gateway does the retries)."""
+    with _lock:
+        if "openai" not in _clients:
+            import httpx
+            from openai import OpenAI
+            _clients["openai"] = OpenAI(
+                max_retries=0,
+                timeout=REQUEST_TIMEOUT,
+                http_client=httpx.Client(limits=httpx.Limits(
+                    max_connections=CONCURRENCY["openai"], max_keepalive_connections=MAX_KEEPALIVE
+                )),
+            )
+        return _clients["openai"]
+
+
+def async_openai_client():
+    """Shared AsyncOpenAI client, the async counterpart of openai_client()."""
+    with _lock:
+        if "openai_async" not in _clients:
+            import httpx
+            from openai import AsyncOpenAI
+            _clients["openai_async"] = AsyncOpenAI(
+                max_retries=0,
+                timeout=REQUEST_TIMEOUT,
+                http_client=httpx.AsyncClient(limits=httpx.Limits(
+                    max_connections=CONCURRENCY["openai"], max_keepalive_connections=MAX_KEEPALIVE
+                )),
+            )
+        return _clients["openai_async"]
+
+
+def gemini_model(model_name: str = None):
+    """Shared google.generativeai GenerativeModel for a model name."""
+    model_name = model_name or DEFAULT_MODELS["gemini"]
+    key = f"gemini:{model_name}"
+    with _lock:
+        if key not in _clients:
+            import google.generativeai as genai
+            if "gemini_configured" not in _clients:
+                genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                _clients["gemini_configured"] = True
+            _clients[key] = genai.GenerativeModel(model_name)
+        return _clients[key]
+
+
+def _status_of(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        # google.api_core exceptions carry the HTTP status as .code
+        code = getattr(error, "code", None)
+        status = code if isinstance(code, int) else None
+    return status
+
+
+def _is_retryable(error) -> bool:
+    status = _status_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # Connection errors and timeouts have no status
+    name = type(error).__name__
+    return any(word in name for word in ("Connection", "Timeout", "DeadlineExceeded", "ServiceUnavailable"))
+
+
+def _backoff(error, attempt) -> float:
+    response = getattr(error, "response", None)
+    retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    # Full jitter: uniform between 0 and the exponential cap
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+@contextmanager
+def provider_slot(provider: str):
+    """Hold one of the provider's concurrency slots (and a rate-limit slot) for a call."""
+    delay = _rate_limiters[provider].reserve()
+    if delay:
+        time.sleep(delay)
+    with _thread_slots[provider]:
+        yield
+
+
+@asynccontextmanager
+async def async_provider_slot(provider: str):
+    loop = asyncio.get_running_loop()
+    with _lock:
+        slots = _async_slots.get(loop)
+        if slots is None:
+            slots = _async_slots[loop] = {p: asyncio.Semaphore(CONCURRENCY[p]) for p in PROVIDERS}
+    delay = _rate_limiters[provider].reserve()
+    if delay:
+        await asyncio.sleep(delay)
+    async with slots[provider]:
+        yield
+
+
+def _check_live(provider, fn):
+    if LLM_MODE == "replay":
+        raise ReplayMiss(f"LLM_MODE=replay: {getattr(fn, '__qualname__', fn)} ({provider}) has no recorded responses")
+
+
+def call(provider: str, fn, *args, **kwargs):
+    """
+    Run an SDK call through the gateway's limits and retries.
+
+    Example:
+        call("openai", openai_client().chat.completions.create, model=..., messages=...)
+    """
+    _check_live(provider, fn)
+    for attempt in range(MAX_RETRIES + 1):
+        start = time.perf_counter()
+        try:
+            with provider_slot(provider):
+                result = fn(*args, **kwargs)
+            incr(f"llm.{provider}.calls")
+            observe(f"llm.{provider}.seconds", time.perf_counter() - start)
+            return result
+        except Exception as e:
+            incr(f"llm.{provider}.errors")
+            if attempt >= MAX_RETRIES or not _is_retryable(e):
+                raise
+            incr(f"llm.{provider}.retries")
+            delay = _backoff(e, attempt)
+            print(f"LLM call to {provider} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+async def acall(provider: str, fn, *args, **kwargs):
+    """Async call(): fn must return an awaitable."""
+    _check_live(provider, fn)
+    for attempt in range(MAX_RETRIES + 1):
+        start = time.perf_counter()
+        try:
+            async with async_provider_slot(provider):
+                result = await fn(*args, **kwargs)
+            incr(f"llm.{provider}.calls")
+            observe(f"llm.{provider}.seconds", time.perf_counter() - start)
+            return result
+        except Exception as e:
+            incr(f"llm.{provider}.errors")
+            if attempt >= MAX_RETRIES or not _is_retryable(e):
+                raise
+            incr(f"llm.{provider}.retries")
+            delay = _backoff(e, attempt)
+            print(f"LLM call to {provider} failed ({e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def _messages(prompt):
+    return [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+
+
+def _gemini_prompt(prompt):
+    if isinstance(prompt, str):
+        return prompt
+    return "\n\n".join(message["content"] for message in prompt)
+
+
+def _openai_params(prompt, model, temperature, stop, max_tokens=None):
+    params = {"model": model or DEFAULT_MODELS["openai"], "messages": _messages(prompt)}
+    if temperature is not None:
+        params["temperature"] = temperature
+    if stop:
+        params["stop"] = stop
+    if max_tokens is not None:
+        params["max_tokens"] = max_tokens
+    return params
+
+
+def _gemini_config(temperature, stop, max_tokens=None):
+    config = {}
+    if temperature is not None:
+        config["temperature"] = temperature
+    if stop:
+        config["stop_sequences"] = stop
+    if max_tokens is not None:
+        config["max_output_tokens"] = max_tokens
+    return config or None
+
+
+def _replay_delay(recorded_seconds):
+    if REPLAY_LATENCY == "recorded":
+        return recorded_seconds
+    return float(REPLAY_LATENCY)
+
+
+def _replay(provider, model, prompt, temperature, stop, response_format=None, max_tokens=None):
+    response, seconds = replay_fixture(provider, model, prompt, temperature, stop, response_format, max_tokens)
+    incr(f"llm.{provider}.replayed")
+    return response, _replay_delay(seconds)
+
+
+def _live_chat(prompt, provider, model, temperature, stop, max_tokens=None):
+    if provider == "gemini":
+        response = call(provider, gemini_model(model).generate_content, _gemini_prompt(prompt),
+                        generation_config=_gemini_config(temperature, stop, max_tokens))
+        return response.text
+    response = call(provider, openai_client().chat.completions.create,
+                    **_openai_params(prompt, model, temperature, stop, max_tokens))
+    return response.choices[0].message.content or ""
+
+
+async def _live_achat(prompt, provider, model, temperature, stop, max_tokens=None):
+    if provider == "gemini":
+        response = await acall(provider, gemini_model(model).generate_content_async, _gemini_prompt(prompt),
+                               generation_config=_gemini_config(temperature, stop, max_tokens))
+        return response.text
+    response = await acall(provider, async_openai_client().chat.completions.create,
+                           **_openai_params(prompt, model, temperature, stop, max_tokens))
+    return response.choices[0].message.content or ""
+
+
+async def _live_astream(prompt, provider, model, temperature, stop, max_tokens=None):
+    if provider == "gemini":
+        response = await acall(provider, gemini_model(model).generate_content_async, _gemini_prompt(prompt),
+                               generation_config=_gemini_config(temperature, stop, max_tokens), stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+        return
+    stream = await acall(provider, async_openai_client().chat.completions.create,
+                         stream=True, **_openai_params(prompt, model, temperature, stop, max_tokens))
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def chat(prompt, provider: str = "openai", model: str = None, temperature: float = None, stop=None,
+         max_tokens: int = None) -> str:
+    """
+    Complete a prompt (a string or a list of {"role", "content"} messages) and return the text.
+
+    max_tokens caps the length of the completion (None leaves the provider's default).
+    """
+    model = model or DEFAULT_MODELS[provider]
+    if LLM_MODE == "replay":
+        response, delay = _replay(provider, model, prompt, temperature, stop, max_tokens=max_tokens)
+        with provider_slot(provider):
+            time.sleep(delay)
+        observe(f"llm.{provider}.seconds", delay)
+        return response
+    start = time.perf_counter()
+    response = _live_chat(prompt, provider, model, temperature, stop, max_tokens)
+    if LLM_MODE == "record":
+        record_fixture(provider, model, prompt, temperature, stop, response, time.perf_counter() - start,
+                       max_tokens=max_tokens)
+    return response
+
+
+async def achat(prompt, provider: str = "openai", model: str = None, temperature: float = None, stop=None,
+                max_tokens: int = None) -> str:
+    """Async chat()."""
+    model = model or DEFAULT_MODELS[provider]
+    if LLM_MODE == "replay":
+        response, delay = _replay(provider, model, prompt, temperature, stop, max_tokens=max_tokens)
+        async with async_provider_slot(provider):
+            await asyncio.sleep(delay)
+        observe(f"llm.{provider}.seconds", delay)
+        return response
+    start = time.perf_counter()
+    response = await _live_achat(prompt, provider, model, temperature, stop, max_tokens)
+    if LLM_MODE == "record":
+        record_fixture(provider, model, prompt, temperature, stop, response, time.perf_counter() - start,
+                       max_tokens=max_tokens)
+    return response
+
+
+async def astream(prompt, provider: str = "openai", model: str = None, temperature: float = None, stop=None,
+                  max_tokens: int = None):
+    """
+    Yield the completion of a prompt as text deltas.
+
+    Opening the stream is retried like any call; a stream that fails midway is not.
+    A replayed completion arrives after the replay latency, in word-sized deltas.
+    """
+    model = model or DEFAULT_MODELS[provider]
+    if LLM_MODE == "replay":
+        response, delay = _replay(provider, model, prompt, temperature, stop, max_tokens=max_tokens)
+        async with async_provider_slot(provider):
+            await asyncio.sleep(delay)
+        observe(f"llm.{provider}.seconds", delay)
+        for delta in re.findall(r"\s*\S+|\s+", response):
+            yield delta
+        return
+    start = time.perf_counter()
+    parts = []
+    async for delta in _live_astream(prompt, provider, model, temperature, stop, max_tokens):
+        parts.append(delta)
+        yield delta
+    if LLM_MODE == "record":
+        # Only complete streams are recorded
+        record_fixture(provider, model, prompt, temperature, stop, "".join(parts), time.perf_counter() - start,
+                       max_tokens=max_tokens)
+
+
+def parse(prompt, response_format, provider: str = "openai", model: str = None, temperature: float = None):
+    """
+    Complete a prompt into an instance of response_format, a pydantic model (structured output).
+
+    Recorded and replayed like chat(); the fixture is also keyed on the model's JSON schema.
+    """
+    if provider != "openai":
+        raise ValueError(f"Structured output is not supported for {provider}.")
+    model = model or DEFAULT_MODELS[provider]
+    schema = json.dumps(response_format.model_json_schema(), sort_keys=True)
+    if LLM_MODE == "replay":
+        response, delay = _replay(provider, model, prompt, temperature, None, schema)
+        with provider_slot(provider):
+            time.sleep(delay)
+        observe(f"llm.{provider}.seconds", delay)
+        return response_format.model_validate_json(response)
+    start = time.perf_counter()
+    completion = call(provider, openai_client().beta.chat.completions.parse,
+                      response_format=response_format, **_openai_params(prompt, model, temperature, None))
+    message = completion.choices[0].message
+    if message.parsed is None:
+        raise ValueError(f"No structured output from {model}: {message.refusal or 'empty response'}")
+    if LLM_MODE == "record":
+        record_fixture(provider, model, prompt, temperature, None, message.parsed.model_dump_json(),
+                       time.perf_counter() - start, schema)
+    return message.parsed
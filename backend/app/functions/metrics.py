@@ -0,0 +1,61 @@
+import threading
+import time
+
+# In-process counters and observations, served as JSON by GET /metrics on the query API.
+# Counters are plain increments; observations (durations in seconds, prompt token counts)
+# keep count, total and max.
+_counters = {}
+_observations = {}
+_lock = threading.Lock()
+_started_at = time.time()
+
+
+def incr(name: str, value: int = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name: str, value: float) -> None:
+    with _lock:
+        obs = _observations.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        obs["count"] += 1
+        obs["total"] += value
+        obs["max"] = max(obs["max"], value)
+
+
+class timed:
+    """Context manager recording the duration of its block under `name`."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+async def timed_await(name: str, awaitable):
+    """Await `awaitable`, recording how long it took under `name`."""
+    with timed(name):
+        return await awaitable
+
+
+def snapshot() -> dict:
+    """
+    Current values of every metric.
+
+    Returns:
+        dict: {"uptime_seconds", "counters": {name: value},
+        "observations": {name: {"count", "total", "max", "avg"}}}
+    """
+    with _lock:
+        counters = dict(_counters)
+        observations = {
+            name: dict(obs, avg=obs["total"] / obs["count"] if obs["count"] else 0.0)
+            for name, obs in _observations.items()
+        }
+    return {"uptime_seconds": round(time.time() - _started_at, 1), "counters": counters, "observations": observations}
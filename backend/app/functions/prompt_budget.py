@@ -0,0 +1,175 @@
+import os
+from functools import lru_cache
+from app.functions.metrics import incr, observe
+
+# Prompt assembly under a token budget. Sample rows are rendered as compact aligned rows
+# (one header line per table instead of a dict repr per row) with long cells cut short and
+# low-value columns (all NULL, constant, BLOB) left out. When the complete SQL prompt exceeds
+# PROMPT_TOKEN_BUDGET, it is shrunk step by step: fewer sample rows, no column stats, a
+# shorter history, and finally no samples.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+PROMPT_SAMPLE_ROWS = 5
+MAX_CELL_CHARS = int(os.getenv("PROMPT_MAX_CELL_CHARS", "60"))
+# Result rows shown to the explanation prompt
+RESULT_PROMPT_ROWS = int(os.getenv("RESULT_PROMPT_ROWS", "50"))
+RESULT_TOKEN_BUDGET = int(os.getenv("RESULT_TOKEN_BUDGET", "3000"))
+# Result rows shown to the chart prompt; the generated code embeds them, so more are kept
+CHART_PROMPT_ROWS = int(os.getenv("CHART_PROMPT_ROWS", "200"))
+CHART_TOKEN_BUDGET = int(os.getenv("CHART_TOKEN_BUDGET", "6000"))
+TOKEN_ENCODING = "o200k_base"
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception as e:
+            # No tokenizer available: fall back to the usual ~4 characters per token estimate
+            print(f"Token counts are estimated ({e})")
+            _encoding = False
+    return _encoding
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def record_prompt(kind: str, tokens: int) -> None:
+    """Report the size of a prompt to the metrics module."""
+    incr(f"prompt.{kind}.calls")
+    observe(f"prompt.{kind}.tokens", tokens)
+
+
+def format_cell(value, limit: int = MAX_CELL_CHARS) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    text = " ".join(str(value).split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def sample_columns(entry: dict) -> list:
+    """Columns worth showing in samples: not entirely NULL, not constant, not BLOB."""
+    profile = entry.get("profile") or {}
+    row_count = entry.get("row_count", 0)
+    columns = []
+    for col in entry["columns"]:
+        stats = profile.get(col["name"])
+        if stats and row_count > 1 and (
+            stats["null_fraction"] == 1 or stats["distinct"] <= 1 or stats["affinity"] == "BLOB"
+        ):
+            continue
+        columns.append(col["name"])
+    return columns or [col["name"] for col in entry["columns"]]
+
+
+def render_rows(columns, rows, limit: int = MAX_CELL_CHARS) -> str:
+    """Render rows as aligned, pipe-separated text under a header line."""
+    cells = [[format_cell(row.get(col), limit) for col in columns] for row in rows]
+    widths = [max([len(col)] + [len(r[i]) for r in cells]) for i, col in enumerate(columns)]
+    lines = [" | ".join(col.ljust(w) for col, w in zip(columns, widths))]
+    lines += [" | ".join(cell.ljust(w) for cell, w in zip(r, widths)).rstrip() for r in cells]
+    return "\n".join(lines)
+
+
+def render_samples(catalog: dict, tables, rows_per_table: int = PROMPT_SAMPLE_ROWS) -> str:
+    if rows_per_table <= 0:
+        return "(omitted)"
+    parts = []
+    for table in tables:
+        entry = catalog["tables"][table]
+        rows = entry["samples"][:rows_per_table]
+        if rows:
+            parts.append(f"{table}:\n{render_rows(sample_columns(entry), rows)}")
+    return "\n\n".join(parts) or "(no rows)"
+
+
+def build_sql_prompt_context(cached: dict, tables, history_lines, value_hints: str,
+                             render=None, budget: int = PROMPT_TOKEN_BUDGET) -> dict:
+    """
+    Assemble the schema, samples and history of the SQL prompt within a token budget.
+
+    Args:
+        cached (dict): Entry from db_cache.get_database().
+        tables (list): Tables to describe.
+        history_lines (list): History lines, oldest first.
+        value_hints (str): Rendered value hints (always kept).
+        render (callable): Formats the complete prompt from the parts
+            ({"table_info", "sample_data", "history"}); the budget and the reported tokens
+            then cover exactly the text sent. Without it only the parts are counted.
+        budget (int): Token budget of the prompt.
+
+    Returns:
+        dict: {"table_info", "sample_data", "history", "tokens", "reductions"}
+    """
+    catalog = cached["catalog"]
+    with_stats = "\n\n".join(cached["table_infos"][tbl] for tbl in tables)
+    without_stats = "\n\n".join(cached["table_schemas"][tbl] for tbl in tables)
+    samples = {n: render_samples(catalog, tables, n) for n in (PROMPT_SAMPLE_ROWS, 3, 1, 0)}
+
+    # Reductions are applied in this order until the prompt fits
+    plan = [
+        ("sample_rows", 3), ("sample_rows", 1), ("stats", False),
+        ("history_lines", 2), ("sample_rows", 0), ("history_lines", 0),
+    ]
+    settings = {"sample_rows": PROMPT_SAMPLE_ROWS, "stats": True, "history_lines": len(history_lines)}
+    applied = []
+
+    def assemble():
+        history = history_lines[len(history_lines) - settings["history_lines"]:] if settings["history_lines"] else []
+        parts = {
+            "table_info": with_stats if settings["stats"] else without_stats,
+            "sample_data": samples[settings["sample_rows"]],
+            "history": "\n".join(history),
+        }
+        if render is not None:
+            tokens = count_tokens(render(parts))
+        else:
+            tokens = sum(count_tokens(text) for text in parts.values()) + count_tokens(value_hints)
+        return parts, tokens
+
+    parts, tokens = assemble()
+    for key, value in plan:
+        if tokens <= budget:
+            break
+        if key == "history_lines" and settings[key] <= value:
+            continue
+        settings[key] = value
+        applied.append(f"{key}={value}")
+        parts, tokens = assemble()
+
+    if applied:
+        incr("prompt.sql.reduced")
+    if tokens > budget:
+        incr("prompt.sql.over_budget")
+    record_prompt("sql", tokens)
+    return dict(parts, tokens=tokens, reductions=applied)
+
+
+def render_result(result: dict, max_rows: int = RESULT_PROMPT_ROWS, budget: int = RESULT_TOKEN_BUDGET) -> str:
+    """
+    Compact text of a query result for LLM prompts: aligned rows, capped by rows and tokens.
+    """
+    if "error" in result:
+        return f"Error: {result['error']}"
+    columns = [col["key"] if isinstance(col, dict) else col for col in result.get("columns", [])]
+    rows = result.get("data", [])
+    if not rows:
+        return "(no rows)"
+    shown = min(len(rows), max_rows)
+    while True:
+        text = render_rows(columns, rows[:shown])
+        if shown < len(rows):
+            text += f"\n... {len(rows) - shown} more rows ({len(rows)} in total)"
+        if shown <= 1 or count_tokens(text) <= budget:
+            return text
+        shown //= 2
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from app.functions.metrics import incr
+
+# Persistent cache of generated SQL, in a local SQLite file. An entry maps a normalized
+# question, the project database and its schema hash to the SQL that executed successfully
+# for them; a hit skips the LLM entirely. The SQL is cached, not its result, so every hit
+# still runs against the current data.
+#
+# The conversation is not part of the key for a self-contained question, so asking it again
+# in the same chat hits the cache. A follow-up ("and last year?", "only the active ones") can
+# only be answered from the turn it continues, so for those the caller adds that turn to the key.
+#
+# Entries expire after QUERY_CACHE_TTL seconds and the least recently used are evicted beyond
+# QUERY_CACHE_MAX_ENTRIES. A schema change gives a new schema hash, so older entries for the
+# database stop matching and are purged on its next lookup.
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", os.path.join("output", "query_cache.db"))
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", str(7 * 24 * 3600)))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "10000"))
+
+# Questions this short, or containing one of these words, are treated as follow-ups
+FOLLOW_UP_MAX_WORDS = 4
+FOLLOW_UP_WORDS = {
+    "it", "its", "it's", "that", "this", "these", "those", "them", "they", "their", "he", "she",
+    "above", "previous", "same", "instead", "also", "again", "else", "former", "latter",
+}
+FOLLOW_UP_PREFIXES = ("and ", "but ", "or ", "now ", "then ", "what about", "how about", "only ")
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _connection():
+    global _conn
+    if _conn is None:
+        folder = os.path.dirname(QUERY_CACHE_PATH)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(QUERY_CACHE_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_cache ("
+            "key TEXT PRIMARY KEY, db_path TEXT NOT NULL, schema_hash TEXT NOT NULL, "
+            "question TEXT NOT NULL, sql TEXT NOT NULL, created_at REAL NOT NULL, "
+            "last_used REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS query_cache_last_used ON query_cache (last_used)")
+        conn.execute("CREATE INDEX IF NOT EXISTS query_cache_db_path ON query_cache (db_path)")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?.!;").strip().lower()
+
+
+def is_follow_up(question: str) -> bool:
+    """Whether a question likely depends on the previous turn (short, or refers back to it)."""
+    normalized = normalize_question(question)
+    words = re.findall(r"[a-z0-9_']+", normalized)
+    return (
+        len(words) <= FOLLOW_UP_MAX_WORDS
+        or normalized.startswith(FOLLOW_UP_PREFIXES)
+        or any(word in FOLLOW_UP_WORDS for word in words)
+    )
+
+
+def cache_key(question: str, db_path: str, schema_hash: str, history: str = "") -> str:
+    parts = [normalize_question(question), os.path.abspath(db_path), schema_hash, history.strip()]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def get_cached_sql(question: str, db_path: str, schema_hash: str, history: str = ""):
+    """
+    Look up the SQL cached for a question.
+
+    Returns:
+        str: The cached SQL, or None on a miss.
+    """
+    key = cache_key(question, db_path, schema_hash, history)
+    now = time.time()
+    with _lock:
+        conn = _connection()
+        # Entries written against an older schema of this database can never match again
+        purged = conn.execute(
+            "DELETE FROM query_cache WHERE db_path = ? AND schema_hash != ?",
+            (os.path.abspath(db_path), schema_hash),
+        ).rowcount
+        row = conn.execute("SELECT sql, created_at FROM query_cache WHERE key = ?", (key,)).fetchone()
+        expired = row is not None and now - row[1] > QUERY_CACHE_TTL
+        if expired:
+            conn.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+        elif row is not None:
+            conn.execute("UPDATE query_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        conn.commit()
+
+    if purged:
+        incr("query_cache.invalidated", purged)
+    if expired:
+        incr("query_cache.expired")
+    if row is None or expired:
+        incr("query_cache.misses")
+        return None
+    incr("query_cache.hits")
+    return row[0]
+
+
+def put_cached_sql(question: str, db_path: str, schema_hash: str, sql: str, history: str = "") -> None:
+    """Cache SQL that executed successfully for a question, evicting the least recently used entries."""
+    key = cache_key(question, db_path, schema_hash, history)
+    now = time.time()
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO query_cache (key, db_path, schema_hash, question, sql, created_at, last_used, hits) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+            (key, os.path.abspath(db_path), schema_hash, normalize_question(question), sql, now, now),
+        )
+        evicted = conn.execute(
+            "DELETE FROM query_cache WHERE key IN "
+            "(SELECT key FROM query_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (QUERY_CACHE_MAX_ENTRIES,),
+        ).rowcount
+        conn.commit()
+    incr("query_cache.stores")
+    if evicted:
+        incr("query_cache.evictions", evicted)
+
+
+def drop_cached_sql(question: str, db_path: str, schema_hash: str, history: str = "") -> None:
+    """Remove one entry, e.g. when its SQL no longer executes."""
+    key = cache_key(question, db_path, schema_hash, history)
+    with _lock:
+        conn = _connection()
+        conn.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+        conn.commit()
+
+
+def invalidate_query_cache(db_path: str = None) -> int:
+    """Remove every entry for a database (or all entries). Returns the number removed."""
+    with _lock:
+        conn = _connection()
+        if db_path is None:
+            removed = conn.execute("DELETE FROM query_cache").rowcount
+        else:
+            removed = conn.execute(
+                "DELETE FROM query_cache WHERE db_path = ?", (os.path.abspath(db_path),)
+            ).rowcount
+        conn.commit()
+    if removed:
+        incr("query_cache.invalidated", removed)
+    return removed
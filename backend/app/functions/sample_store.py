@@ -0,0 +1,91 @@
+import gzip
+import json
+import os
+import sqlite3
+from functools import lru_cache
+from app.functions.ingest import quote_identifier
+
+# Per-table sample rows live next to the project database in a gzip-compressed,
+# column-oriented JSON file instead of inside the Mongo project document:
+#   {"table": {"columns": ["a", "b"], "values": [[a1, a2, ...], [b1, b2, ...]]}}
+SAMPLE_ROWS = int(os.getenv("SAMPLE_ROWS", "1000"))
+MAX_PAGE_SIZE = 500
+
+
+def sample_path_for(db_path: str) -> str:
+    return os.path.splitext(db_path)[0] + ".samples.json.gz"
+
+
+def read_table_samples(db_path: str, tables, limit: int = SAMPLE_ROWS) -> dict:
+    """
+    Read up to `limit` rows from each table as a list of dicts per table.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        data = {}
+        for table in tables:
+            cursor = conn.execute(f"SELECT * FROM {quote_identifier(table)} LIMIT ?", (limit,))
+            column_names = [desc[0] for desc in cursor.description]
+            data[table] = [dict(zip(column_names, row)) for row in cursor.fetchall()]
+        return data
+    finally:
+        conn.close()
+
+
+def write_samples(db_path: str, tables, limit: int = SAMPLE_ROWS) -> str:
+    """
+    Write the first `limit` rows of each table to the side store for db_path.
+
+    Returns:
+        str: Path of the sample file.
+    """
+    conn = sqlite3.connect(db_path)
+    samples = {}
+    try:
+        for table in tables:
+            cursor = conn.execute(f"SELECT * FROM {quote_identifier(table)} LIMIT ?", (limit,))
+            columns = [desc[0] for desc in cursor.description]
+            rows = cursor.fetchall()
+            samples[table] = {
+                "columns": columns,
+                "values": [list(col) for col in zip(*rows)] if rows else [[] for _ in columns],
+            }
+    finally:
+        conn.close()
+
+    sample_path = sample_path_for(db_path)
+    part_path = sample_path + ".part"
+    with gzip.open(part_path, "wt", encoding="utf-8") as f:
+        json.dump(samples, f, default=str, separators=(",", ":"))
+    os.replace(part_path, sample_path)
+    return sample_path
+
+
+@lru_cache(maxsize=32)
+def _load_samples(sample_path: str, mtime_ns: int) -> dict:
+    with gzip.open(sample_path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_samples(sample_path: str, table: str, offset: int = 0, limit: int = 100):
+    """
+    Return one page of sample rows for a table, or None if the table has no samples.
+
+    Returns:
+        dict: {"columns", "rows", "offset", "limit", "total"}
+    """
+    if not os.path.exists(sample_path):
+        return None
+    samples = _load_samples(sample_path, os.stat(sample_path).st_mtime_ns)
+    table_samples = samples.get(table)
+    if table_samples is None:
+        return None
+
+    columns = table_samples["columns"]
+    values = table_samples["values"]
+    total = len(values[0]) if values else 0
+    offset = max(offset, 0)
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    page = [col[offset:offset + limit] for col in values]
+    rows = [dict(zip(columns, row)) for row in zip(*page)]
+    return {"columns": columns, "rows": rows, "offset": offset, "limit": limit, "total": total}
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from app.functions.ingest import quote_identifier
+from app.functions.table_retrieval import build_table_index
+from app.functions.column_profile import profile_table, describe_profile
+
+# Schema catalog of a project database: tables, column types, keys, indexes, row counts,
+# column statistics and a few sample rows, introspected once (at upload) and persisted next to the
+# database as <db>.catalog.json. Readers go through get_catalog(), which keeps loaded
+# catalogs in memory and rebuilds one whose stamps no longer match its database.
+#
+# Bump CATALOG_VERSION whenever the catalog layout changes; older sidecars are rebuilt.
+CATALOG_VERSION = 6
+CATALOG_SAMPLE_ROWS = 5
+
+_catalogs = {}
+_lock = threading.Lock()
+
+
+def catalog_path_for(db_path: str) -> str:
+    return os.path.splitext(db_path)[0] + ".catalog.json"
+
+
+def _db_stamp(db_path):
+    st = os.stat(db_path)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def _table_entry(conn, name, create_sql):
+    quoted = quote_identifier(name)
+    columns = [
+        {"cid": cid, "name": col_name, "type": col_type, "notnull": notnull,
+         "nullable": not notnull, "default": default, "pk": pk}
+        for cid, col_name, col_type, notnull, default, pk in conn.execute(f"PRAGMA table_info({quoted})")
+    ]
+    foreign_keys = {}
+    for fk_id, _, ref_table, from_col, to_col, *_ in conn.execute(f"PRAGMA foreign_key_list({quoted})"):
+        fk = foreign_keys.setdefault(fk_id, {"columns": [], "ref_table": ref_table, "ref_columns": []})
+        fk["columns"].append(from_col)
+        fk["ref_columns"].append(to_col)
+    indexes = []
+    for _, index_name, unique, *_ in conn.execute(f"PRAGMA index_list({quoted})"):
+        index_columns = [row[2] for row in conn.execute(f"PRAGMA index_info({quote_identifier(index_name)})")]
+        indexes.append({"name": index_name, "columns": index_columns, "unique": bool(unique)})
+
+    cursor = conn.execute(f"SELECT * FROM {quoted} LIMIT {CATALOG_SAMPLE_ROWS}")
+    column_names = [desc[0] for desc in cursor.description]
+    samples = [dict(zip(column_names, row)) for row in cursor.fetchall()]
+    # Row count and every column's statistics
+    row_count, profile = profile_table(conn, name, columns)
+
+    return {
+        "sql": create_sql,
+        "columns": columns,
+        "primary_key": [col["name"] for col in sorted(columns, key=lambda c: c["pk"]) if col["pk"]],
+        "foreign_keys": list(foreign_keys.values()),
+        "indexes": indexes,
+        "row_count": row_count,
+        "profile": profile,
+        "samples": samples,
+    }
+
+
+def build_catalog(db_path: str) -> dict:
+    """
+    Introspect a SQLite database into a catalog dict.
+
+    Returns:
+        dict: {"version", "db_stamp", "schema_hash", "built_at", "tables", "views", "search"}
+    """
+    stamp = _db_stamp(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        objects = conn.execute(
+            "SELECT type, name, sql FROM sqlite_master WHERE type IN ('table', 'view') "
+            "AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+        ).fetchall()
+        tables = {name: _table_entry(conn, name, sql) for obj_type, name, sql in objects if obj_type == "table"}
+        views = {name: sql for obj_type, name, sql in objects if obj_type == "view"}
+    finally:
+        conn.close()
+
+    # Identifies the schema independently of the data; changes when any DDL changes
+    schema_hash = hashlib.sha256(
+        "\n".join(sql or "" for _, _, sql in objects).encode("utf-8")
+    ).hexdigest()
+    return {
+        "version": CATALOG_VERSION,
+        "db_stamp": stamp,
+        "schema_hash": schema_hash,
+        "built_at": datetime.utcnow().isoformat(),
+        "tables": tables,
+        "views": views,
+        # BM25 index used to pick the tables relevant to a question
+        "search": build_table_index(tables),
+    }
+
+
+def write_catalog(db_path: str, catalog: dict) -> str:
+    catalog_path = catalog_path_for(db_path)
+    part_path = f"{catalog_path}.{os.getpid()}.{threading.get_ident()}.part"
+    with open(part_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, default=str, separators=(",", ":"))
+    os.replace(part_path, catalog_path)
+    return catalog_path
+
+
+def _is_current(catalog, stamp):
+    return catalog.get("version") == CATALOG_VERSION and catalog.get("db_stamp") == stamp
+
+
+def _load_sidecar(db_path):
+    catalog_path = catalog_path_for(db_path)
+    if not os.path.exists(catalog_path):
+        return None
+    try:
+        with open(catalog_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable catalog {catalog_path}: {e}")
+        return None
+
+
+def _read_sidecar(db_path, stamp):
+    catalog = _load_sidecar(db_path)
+    return catalog if catalog is not None and _is_current(catalog, stamp) else None
+
+
+def get_catalog(db_path: str) -> dict:
+    """
+    Return the catalog of a SQLite database.
+
+    Served from memory when its stamps still match the database file; otherwise the
+    sidecar is loaded, or the database is introspected and the sidecar rewritten.
+    The returned dict is shared and must not be modified.
+    """
+    path = os.path.abspath(db_path)
+    stamp = _db_stamp(path)
+    with _lock:
+        catalog = _catalogs.get(path)
+    if catalog is not None and _is_current(catalog, stamp):
+        return catalog
+
+    catalog = _read_sidecar(path, stamp)
+    if catalog is None:
+        catalog = build_catalog(path)
+        write_catalog(path, catalog)
+        # Keep the in-memory copy identical to what a later load of the sidecar returns
+        catalog = json.loads(json.dumps(catalog, default=str))
+        print(f"Built schema catalog for {db_path} ({len(catalog['tables'])} tables)")
+    with _lock:
+        _catalogs[path] = catalog
+    return catalog
+
+
+def invalidate_catalog(db_path: str, remove_file: bool = False) -> None:
+    """Forget the in-memory catalog of a database and optionally delete its sidecar."""
+    with _lock:
+        _catalogs.pop(os.path.abspath(db_path), None)
+    catalog_path = catalog_path_for(db_path)
+    if remove_file and os.path.exists(catalog_path):
+        os.remove(catalog_path)
+
+
+def catalog_schema(catalog: dict) -> dict:
+    """Per-table column list ({"name", "type", "nullable"}), the shape stored on projects."""
+    return {
+        table: [{"name": col["name"], "type": col["type"], "nullable": col["nullable"]} for col in entry["columns"]]
+        for table, entry in catalog["tables"].items()
+    }
+
+
+def format_table_info(catalog: dict, tables=None, sample_rows: int = 3, stats: bool = True) -> str:
+    """
+    Render CREATE TABLE statements with sample rows, in the layout of SQLDatabase.get_table_info().
+
+    Args:
+        catalog (dict): Catalog from get_catalog().
+        tables (list): Tables to include; all tables when None.
+        sample_rows (int): Sample rows shown per table.
+        stats (bool): Append one line of column statistics per column.
+    """
+    parts = []
+    for table in (tables if tables is not None else catalog["tables"]):
+        entry = catalog["tables"][table]
+        info = (entry["sql"] or "").strip()
+        if sample_rows:
+            columns = [col["name"] for col in entry["columns"]]
+            rows = [
+                "\t".join(str(row.get(col))[:100] for col in columns)
+                for row in entry["samples"][:sample_rows]
+            ]
+            info += (f"\n\n/*\n{sample_rows} rows from {table} table:\n"
+                     + "\t".join(columns) + "\n" + "\n".join(rows) + "\n*/")
+        if stats and entry.get("profile"):
+            info += (f"\n\n/*\nColumn stats for {table} ({entry['row_count']} rows):\n"
+                     + "\n".join(describe_profile(entry["profile"])) + "\n*/")
+        parts.append(info)
+    return "\n\n".join(parts)
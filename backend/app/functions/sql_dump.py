@@ -0,0 +1,306 @@
+import re
+
+# Streaming reader for SQL dump files (mysqldump, MariaDB and sqlite3 .dump output).
+# iter_sql_statements() splits a dump into statements without loading it into memory,
+# and translate_statement() rewrites MySQL-specific syntax into SQLite.
+
+READ_SIZE = 1024 * 1024
+
+_WHITESPACE = re.compile(r"\s*")
+_STRING_END = {
+    "'": re.compile(r"\\.|''|'", re.S),
+    '"': re.compile(r'\\.|""|"', re.S),
+    "`": re.compile(r"``|`"),
+}
+
+
+def _normal_pattern(delimiter):
+    return re.compile(r"""'|"|`|--(?=[ \t\r\n])|#|/\*|""" + re.escape(delimiter))
+
+
+def iter_sql_statements(f, read_size: int = READ_SIZE):
+    """
+    Yield the statements of a SQL script read from a text stream, one at a time.
+
+    Handles quoted strings and identifiers (including delimiters inside them, backslash
+    escapes and doubled quotes), "--", "#" and "/* */" comments (MySQL conditional
+    comments are dropped) and the client-side DELIMITER command.
+    """
+    buf = ""
+    pos = 0
+    eof = False
+    parts = []
+    started = False
+    delimiter = ";"
+    pattern = _normal_pattern(delimiter)
+
+    def fill():
+        nonlocal buf, pos, eof
+        data = f.read(read_size)
+        if not data:
+            eof = True
+            return
+        buf = buf[pos:] + data
+        pos = 0
+
+    while True:
+        if not started:
+            # Skip leading whitespace and look for a DELIMITER command
+            while True:
+                pos = _WHITESPACE.match(buf, pos).end()
+                if pos < len(buf) or eof:
+                    break
+                fill()
+            if pos >= len(buf) and eof:
+                break
+            while not eof and len(buf) - pos < 10:
+                fill()
+            if buf[pos:pos + 10].upper() == "DELIMITER ":
+                end = buf.find("\n", pos)
+                while end == -1 and not eof:
+                    fill()
+                    end = buf.find("\n", pos)
+                line = buf[pos:end if end != -1 else len(buf)]
+                delimiter = line.split()[1] if len(line.split()) > 1 else ";"
+                pattern = _normal_pattern(delimiter)
+                pos = end + 1 if end != -1 else len(buf)
+                continue
+            started = True
+
+        m = pattern.search(buf, pos)
+        if m is None or (m.end() + 2 > len(buf) and not eof):
+            if eof:
+                parts.append(buf[pos:])
+                pos = len(buf)
+                break
+            # Keep a short tail so tokens split across reads are still recognised
+            keep = max(pos, len(buf) - 2 - len(delimiter))
+            if m is None and keep > pos:
+                parts.append(buf[pos:keep])
+                pos = keep
+            fill()
+            continue
+
+        token = m.group(0)
+        parts.append(buf[pos:m.start()])
+        pos = m.end()
+
+        if token == delimiter:
+            statement = "".join(parts).strip()
+            parts = []
+            started = False
+            if statement:
+                yield statement
+            continue
+
+        if token in _STRING_END:
+            # Quoted string or identifier: copy it verbatim up to its closing quote
+            closing = _STRING_END[token]
+            start = m.start()
+            while True:
+                q = closing.search(buf, pos)
+                if q is None or (q.end() + 1 >= len(buf) and not eof):
+                    if eof:
+                        raise ValueError("Unterminated quoted string in SQL file.")
+                    offset = pos - start
+                    buf, pos = buf[start:], 0
+                    start = 0
+                    fill()
+                    pos = offset
+                    continue
+                pos = q.end()
+                if len(q.group(0)) == 1:
+                    break
+            parts.append(buf[start:pos])
+            continue
+
+        # Comments are dropped; a separator keeps the surrounding tokens apart
+        terminator = "\n" if token in ("--", "#") else "*/"
+        while True:
+            end = buf.find(terminator, pos)
+            if end != -1 or eof:
+                break
+            pos = max(pos, len(buf) - len(terminator))
+            fill()
+        pos = len(buf) if end == -1 else end + len(terminator)
+        if "".join(parts).strip():
+            parts.append(" ")
+        else:
+            # Nothing but comments so far: a DELIMITER command may still follow
+            parts = []
+            started = False
+
+    statement = "".join(parts).strip()
+    if statement:
+        yield statement
+
+
+_LITERAL_RE = re.compile(
+    r"'((?:[^'\\]|\\.|'')*)'"
+    r"|`((?:[^`]|``)*)`"
+    r"|\b0x([0-9A-Fa-f]+)\b"
+    r"|\b_(?:binary|utf8mb4|utf8|latin1)\b\s*",
+    re.S
+)
+_ESCAPE_RE = re.compile(r"\\(.)|''", re.S)
+_ESCAPES = {"0": "", "n": "\n", "r": "\r", "t": "\t", "b": "\b", "Z": "\x1a"}
+
+
+def _unescape(match):
+    if match.group(0) == "''":
+        return "'"
+    char = match.group(1)
+    return _ESCAPES.get(char, char)
+
+
+def _literal(match):
+    string, identifier, hex_digits = match.group(1), match.group(2), match.group(3)
+    if string is not None:
+        value = _ESCAPE_RE.sub(_unescape, string) if ("\\" in string or "''" in string) else string
+        return "'" + value.replace("'", "''") + "'"
+    if identifier is not None:
+        return '"' + identifier.replace("``", "`").replace('"', '""') + '"'
+    if hex_digits is not None:
+        if len(hex_digits) % 2:
+            hex_digits = "0" + hex_digits
+        return f"X'{hex_digits}'"
+    # Character set introducers such as _binary '...'
+    return ""
+
+
+def convert_literals(sql: str) -> str:
+    """Rewrite MySQL string escapes, backtick identifiers and 0x literals for SQLite."""
+    return _LITERAL_RE.sub(_literal, sql)
+
+
+def _split_top_level(body):
+    items, depth, start, i = [], 0, 0, 0
+    quote = None
+    while i < len(body):
+        c = body[i]
+        if quote:
+            if c == quote:
+                if i + 1 < len(body) and body[i + 1] == quote:
+                    i += 1
+                else:
+                    quote = None
+        elif c in "'\"":
+            quote = c
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            items.append(body[start:i].strip())
+            start = i + 1
+        i += 1
+    items.append(body[start:].strip())
+    return [item for item in items if item]
+
+
+def _matching_paren(sql, open_pos):
+    depth, i, quote = 0, open_pos, None
+    while i < len(sql):
+        c = sql[i]
+        if quote:
+            if c == quote:
+                if i + 1 < len(sql) and sql[i + 1] == quote:
+                    i += 1
+                else:
+                    quote = None
+        elif c in "'\"":
+            quote = c
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise ValueError("Unbalanced parentheses in CREATE TABLE statement.")
+
+
+_COLUMN_CLEANUPS = [
+    (re.compile(r"\b(?:enum|set)\s*\((?:[^()']|'(?:[^']|'')*')*\)", re.I), "TEXT"),
+    (re.compile(r"\bCOMMENT\s+'(?:[^']|'')*'", re.I), ""),
+    (re.compile(r"\b(?:CHARACTER\s+SET|CHARSET|COLLATE)\s*=?\s*\w+", re.I), ""),
+    (re.compile(r"\bON\s+UPDATE\s+CURRENT_TIMESTAMP(?:\s*\(\s*\d*\s*\))?", re.I), ""),
+    (re.compile(r"\bCURRENT_TIMESTAMP\s*\(\s*\d*\s*\)", re.I), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\b(?:unsigned|zerofill|AUTO_INCREMENT|INVISIBLE)\b", re.I), ""),
+    (re.compile(r"\bUSING\s+(?:BTREE|HASH)\b", re.I), ""),
+]
+_INDEX_COLUMNS_RE = re.compile(r"\((.*)\)", re.S)
+_PREFIX_LENGTH_RE = re.compile(r'("(?:[^"]|"")*")\s*\(\d+\)')
+
+
+def _clean(definition):
+    for regex, replacement in _COLUMN_CLEANUPS:
+        definition = regex.sub(replacement, definition)
+    return re.sub(r"\s+", " ", definition).strip()
+
+
+def _translate_create_table(sql):
+    open_pos = sql.index("(")
+    close_pos = _matching_paren(sql, open_pos)
+    head = sql[:open_pos].strip()
+    table_name = re.split(r"\s+", head)[-1]
+    indexes = []
+    definitions = []
+    for item in _split_top_level(sql[open_pos + 1:close_pos]):
+        upper = item.upper()
+        if upper.startswith(("KEY ", "KEY(", "INDEX ", "INDEX(")):
+            # Secondary indexes are built after the data is loaded
+            cols = _PREFIX_LENGTH_RE.sub(r"\1", _INDEX_COLUMNS_RE.search(item).group(1))
+            name = re.split(r"[\s(]+", item, maxsplit=2)[1].strip('"')
+            index_name = '"' + f"{table_name.strip(chr(34))}_{name}".replace('"', '""') + '"'
+            indexes.append(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({cols})")
+        elif upper.startswith(("FULLTEXT ", "SPATIAL ")):
+            continue
+        elif upper.startswith("UNIQUE"):
+            cols = _PREFIX_LENGTH_RE.sub(r"\1", _INDEX_COLUMNS_RE.search(item).group(1))
+            definitions.append(f"UNIQUE ({cols})")
+        elif upper.startswith(("PRIMARY KEY", "CONSTRAINT", "FOREIGN KEY", "CHECK")):
+            definitions.append(_PREFIX_LENGTH_RE.sub(r"\1", _clean(item)))
+        else:
+            definitions.append(_clean(item))
+    # Table options after the closing parenthesis (ENGINE=, CHARSET=, ...) are dropped
+    return f"{head} ({', '.join(definitions)})", indexes
+
+
+_SKIPPED_PREFIXES = (
+    "SET ", "LOCK TABLES", "UNLOCK TABLES", "USE ", "CREATE DATABASE", "CREATE SCHEMA",
+    "DROP DATABASE", "DROP SCHEMA", "START TRANSACTION", "BEGIN", "COMMIT", "ROLLBACK", "PRAGMA",
+    "CREATE TRIGGER", "CREATE DEFINER", "CREATE PROCEDURE", "CREATE FUNCTION", "CREATE EVENT",
+    "CREATE ALGORITHM", "CREATE OR REPLACE", "CREATE SQL SECURITY", "ALTER ", "DROP TRIGGER",
+    "DROP PROCEDURE", "DROP FUNCTION", "DROP VIEW", "ANALYZE", "OPTIMIZE", "FLUSH", "GRANT",
+)
+_INSERT_RE = re.compile(r"^(INSERT|REPLACE)\s+(?:(?:LOW_PRIORITY|DELAYED|HIGH_PRIORITY)\s+)?(IGNORE\s+)?(?:INTO\s+)?", re.I)
+_ON_DUPLICATE_RE = re.compile(r"\)\s*ON\s+DUPLICATE\s+KEY\s+UPDATE\s", re.I)
+
+
+def translate_statement(statement: str):
+    """
+    Translate one dump statement into SQLite.
+
+    Returns:
+        tuple: (kind, sql, indexes) where kind is "create", "insert", "other" or "skip";
+        sql is None for skipped statements and indexes lists deferred CREATE INDEX statements.
+    """
+    head = re.sub(r"\s+", " ", statement[:40]).upper()
+    if head.startswith(_SKIPPED_PREFIXES):
+        return "skip", None, []
+
+    sql = convert_literals(statement)
+    if head.startswith(("INSERT", "REPLACE")):
+        m = _INSERT_RE.match(sql)
+        verb = "INSERT OR IGNORE" if m.group(2) else m.group(1).upper()
+        rest = sql[m.end():]
+        duplicates = list(_ON_DUPLICATE_RE.finditer(rest))
+        if duplicates:
+            rest = rest[:duplicates[-1].start() + 1]
+            verb = "INSERT OR REPLACE"
+        return "insert", f"{verb} INTO {rest}", []
+    if head.startswith(("CREATE TABLE", "CREATE TEMPORARY TABLE")):
+        create_sql, indexes = _translate_create_table(sql)
+        return "create", create_sql, indexes
+    return "other", sql, []
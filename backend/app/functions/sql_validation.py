@@ -0,0 +1,180 @@
+import difflib
+import os
+import re
+import sqlite3
+
+# Checks generated SQL before it runs: the statement is compiled with EXPLAIN QUERY PLAN on a
+# read-only connection (syntax errors and unknown tables/columns surface in microseconds,
+# without executing anything), unknown identifiers get "did you mean" suggestions from the
+# schema catalog, and the plan is inspected for full scans and Cartesian joins on big tables.
+#
+# A full scan of a big table is only a warning (aggregates need one); a nested full scan whose
+# row product exceeds VALIDATE_MAX_JOIN_ROWS is an error, fed back to the retry loop.
+#
+# Only read-only statements pass: one dataset file is shared by every project built from the
+# same upload, so a generated DELETE or DROP must never reach it. Queries run on
+# connect_readonly() connections as well, which refuse writes in any case.
+BIG_TABLE_ROWS = int(os.getenv("VALIDATE_BIG_TABLE_ROWS", "1000000"))
+MAX_JOIN_ROWS = int(os.getenv("VALIDATE_MAX_JOIN_ROWS", str(10 ** 9)))
+
+# Authorizer actions a read-only query compiles to; anything else (writes, DDL, PRAGMA,
+# ATTACH, transactions) is denied while the statement is compiled
+_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+READ_ONLY_ERROR = "Only read-only queries are allowed. Return a single SELECT statement."
+
+_MISSING_RE = re.compile(r"no such (table|column): (.+)$")
+_ALIAS_RE = re.compile(
+    r"""(?:\bFROM|\bJOIN|,)\s+("[^"]+"|`[^`]+`|\[[^\]]+\]|[\w.]+)(?:\s+(?:AS\s+)?("[^"]+"|`[^`]+`|\w+))?""",
+    re.IGNORECASE,
+)
+_NOT_ALIASES = {
+    "on", "using", "where", "group", "order", "limit", "join", "inner", "left", "right", "full",
+    "cross", "natural", "outer", "union", "except", "intersect", "having", "window", "as",
+}
+
+
+def connect_readonly(db_path: str) -> sqlite3.Connection:
+    """Open a project database so that no statement run on the connection can modify it."""
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+def _authorize_read(action, *args):
+    return sqlite3.SQLITE_OK if action in _READ_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def _unquote(name):
+    if name and name[0] in "\"`[" and len(name) > 1:
+        return name[1:-1]
+    return name
+
+
+def table_aliases(sql: str, tables) -> dict:
+    """Map the names a query uses for catalog tables (aliases and table names) to the tables."""
+    by_lower = {table.lower(): table for table in tables}
+    aliases = {}
+    for match in _ALIAS_RE.finditer(sql):
+        table = by_lower.get(_unquote(match.group(1)).split(".")[-1].lower())
+        if table is None:
+            continue
+        aliases[table] = table
+        alias = _unquote(match.group(2)) if match.group(2) else None
+        if alias and alias.lower() not in _NOT_ALIASES:
+            aliases[alias] = table
+    return aliases
+
+
+def _suggest(name, candidates):
+    matches = difflib.get_close_matches(name, candidates, n=3, cutoff=0.6)
+    if not matches:
+        lowered = {c.lower(): c for c in candidates}
+        matches = [lowered[m] for m in difflib.get_close_matches(name.lower(), list(lowered), n=3, cutoff=0.6)]
+    return matches
+
+
+def explain_error(message: str, catalog: dict, aliases: dict) -> str:
+    """Add the closest table or column names from the catalog to a "no such table/column" error."""
+    match = _MISSING_RE.search(message)
+    if not match:
+        return message
+    kind, name = match.groups()
+    tables = catalog["tables"]
+    if kind == "table":
+        suggestions = _suggest(name, list(tables))
+        available = ", ".join(tables)
+        hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+        return f"{message}.{hint} Available tables: {available}"
+
+    qualifier, _, column = name.rpartition(".")
+    table = aliases.get(qualifier) if qualifier else None
+    if table:
+        candidates = [col["name"] for col in tables[table]["columns"]]
+        suggestions = _suggest(column, candidates)
+        hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+        return f"{message}.{hint} Columns of {table}: {', '.join(candidates)}"
+    # Columns of the tables the query uses (of every table if none could be resolved)
+    scope = set(aliases.values()) or set(tables)
+    owners = {}
+    for tbl, entry in tables.items():
+        if tbl not in scope:
+            continue
+        for col in entry["columns"]:
+            owners.setdefault(col["name"], []).append(tbl)
+    suggestions = [f"{owners[c][0]}.{c}" for c in _suggest(column, list(owners))]
+    hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+    return f"{message}.{hint}"
+
+
+def _plan_loops(plan, aliases, tables):
+    # (parent, kind, table) for every SCAN/SEARCH loop; table is None for subqueries and CTEs
+    loops = []
+    for _, parent, _, detail in plan:
+        match = re.match(r"(SCAN|SEARCH) (.+?)(?: USING .*)?$", detail)
+        if match:
+            kind, name = match.groups()
+            loops.append((parent, kind, aliases.get(name) or (name if name in tables else None)))
+    return loops
+
+
+def check_plan(plan: list, catalog: dict, aliases: dict):
+    """
+    Inspect EXPLAIN QUERY PLAN rows.
+
+    Returns:
+        tuple: (error or None, [warnings])
+    """
+    tables = catalog["tables"]
+
+    def rows(table):
+        return tables[table]["row_count"] if table else 0
+
+    warnings = []
+    error = None
+    # Loops listed under the same parent are nested, outermost first
+    previous = {}
+    for parent, kind, table in _plan_loops(plan, aliases, tables):
+        outer = previous.get(parent)
+        if kind == "SCAN" and rows(table) >= BIG_TABLE_ROWS:
+            warnings.append(f"Full scan of {table} ({rows(table)} rows)")
+        if kind == "SCAN" and outer is not None and error is None:
+            # A full scan nested inside another loop: every outer row rescans this table
+            product = max(rows(outer), 1) * rows(table)
+            if product > MAX_JOIN_ROWS:
+                error = (
+                    f"Cartesian or unindexed join: {table} ({rows(table)} rows) is scanned once per row of "
+                    f"{outer} ({rows(outer)} rows). Join them on a matching key column."
+                )
+        if table:
+            previous[parent] = table
+    return error, warnings
+
+
+def validate_sql(db_path: str, catalog: dict, sql: str) -> dict:
+    """
+    Validate a generated query without executing it.
+
+    Returns:
+        dict: {"ok", "error", "warnings", "plan"}
+    """
+    sql = sql.strip()
+    if not sql:
+        return {"ok": False, "error": "The SQL query is empty.", "warnings": [], "plan": []}
+
+    aliases = table_aliases(sql, catalog["tables"])
+    conn = connect_readonly(db_path)
+    conn.set_authorizer(_authorize_read)
+    try:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    except sqlite3.ProgrammingError as e:
+        # e.g. more than one statement
+        return {"ok": False, "error": f"{e} Return a single SQL statement.", "warnings": [], "plan": []}
+    except sqlite3.Error as e:
+        # The authorizer refused a write, DDL, PRAGMA or ATTACH
+        error = READ_ONLY_ERROR if str(e) == "not authorized" else explain_error(str(e), catalog, aliases)
+        return {"ok": False, "error": error, "warnings": [], "plan": []}
+    finally:
+        conn.close()
+
+    error, warnings = check_plan(plan, catalog, aliases)
+    return {"ok": error is None, "error": error, "warnings": warnings, "plan": [row[3] for row in plan]}
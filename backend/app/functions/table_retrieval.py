@@ -0,0 +1,144 @@
+import math
+import os
+import re
+from collections import Counter
+
+# Lexical (BM25) retrieval of the tables relevant to a question, so prompts for wide
+# databases only carry a bounded number of table definitions. The index is built with
+# the schema catalog (build_table_index) and stored in it under "search".
+TOP_K_TABLES = int(os.getenv("PROMPT_TOP_K_TABLES", "8"))
+# Upper bound on tables in a prompt, foreign-key neighbours included
+MAX_PROMPT_TABLES = int(os.getenv("PROMPT_MAX_TABLES", "16"))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Term weights per source: a hit on a table name counts more than one on a sample value
+TABLE_NAME_WEIGHT = 3
+COLUMN_NAME_WEIGHT = 2
+VALUE_WEIGHT = 1
+
+_CAMEL_RE = re.compile(r"([a-z0-9])([A-Z])")
+_WORD_RE = re.compile(r"[a-z]+|\d+")
+_STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "count", "do", "does", "each", "for", "from",
+    "give", "how", "in", "is", "it", "list", "many", "me", "much", "of", "on", "or", "per",
+    "show", "than", "that", "the", "their", "there", "to", "top", "what", "which", "who", "with",
+}
+
+
+def _stem(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text) -> list:
+    """Split identifiers and free text into lowercase, lightly stemmed terms."""
+    words = _WORD_RE.findall(_CAMEL_RE.sub(r"\1 \2", str(text)).lower())
+    return [_stem(w) for w in words if w not in _STOP_WORDS and not w.isdigit() and len(w) > 1]
+
+
+def _neighbours(tables):
+    # Declared foreign keys in both directions, plus <table>_id naming for undeclared ones
+    links = {table: set() for table in tables}
+    by_stem = {_stem(table.lower()): table for table in tables}
+    for table, entry in tables.items():
+        for fk in entry["foreign_keys"]:
+            if fk["ref_table"] in links and fk["ref_table"] != table:
+                links[table].add(fk["ref_table"])
+                links[fk["ref_table"]].add(table)
+        for col in entry["columns"]:
+            name = col["name"].lower()
+            if name.endswith("_id"):
+                other = by_stem.get(_stem(name[:-3]))
+                if other and other != table:
+                    links[table].add(other)
+                    links[other].add(table)
+    return links
+
+
+def build_table_index(tables: dict) -> dict:
+    """
+    Build the BM25 index over a catalog's tables.
+
+    Args:
+        tables (dict): The catalog's "tables" mapping.
+
+    Returns:
+        dict: {"postings": {term: {table: weighted tf}}, "lengths": {table: length}, "avgdl": float,
+        "links": {table: [neighbouring tables]}}
+    """
+    postings = {}
+    lengths = {}
+    for table, entry in tables.items():
+        terms = Counter()
+        for term in tokenize(table):
+            terms[term] += TABLE_NAME_WEIGHT
+        for col in entry["columns"]:
+            for term in tokenize(col["name"]):
+                terms[term] += COLUMN_NAME_WEIGHT
+        for row in entry["samples"]:
+            for value in row.values():
+                if isinstance(value, str) and len(value) <= 100:
+                    for term in tokenize(value):
+                        terms[term] += VALUE_WEIGHT
+        lengths[table] = sum(terms.values())
+        for term, tf in terms.items():
+            postings.setdefault(term, {})[table] = tf
+    return {
+        "postings": postings,
+        "lengths": lengths,
+        "avgdl": (sum(lengths.values()) / len(lengths)) if lengths else 0.0,
+        "links": {table: sorted(linked) for table, linked in _neighbours(tables).items()},
+    }
+
+
+def score_tables(index: dict, question: str) -> dict:
+    """BM25 score of every table with at least one query term."""
+    postings = index["postings"]
+    lengths = index["lengths"]
+    avgdl = index["avgdl"] or 1.0
+    n_docs = len(lengths)
+    scores = {}
+    for term in set(tokenize(question)):
+        docs = postings.get(term)
+        if not docs:
+            continue
+        idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+        for table, tf in docs.items():
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths[table] / avgdl)
+            scores[table] = scores.get(table, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+    return scores
+
+
+def select_tables(catalog: dict, question: str, k: int = TOP_K_TABLES, max_tables: int = MAX_PROMPT_TABLES) -> list:
+    """
+    Pick the tables to describe in the prompt for a question.
+
+    The top-k tables by BM25 score are taken, then their foreign-key neighbours, up to
+    max_tables in total. Databases with at most k tables are returned whole.
+
+    Returns:
+        list: Table names, in catalog order.
+    """
+    tables = catalog["tables"]
+    if len(tables) <= k:
+        return list(tables)
+
+    index = catalog["search"]
+    scores = score_tables(index, question)
+    picked = sorted(scores, key=lambda t: -scores[t])[:k]
+    if not picked:
+        # Nothing matched lexically; fall back to the largest tables
+        picked = sorted(tables, key=lambda t: -tables[t]["row_count"])[:k]
+
+    selected = set(picked)
+    links = index["links"]
+    for table in picked:
+        for neighbour in sorted(links[table], key=lambda t: -scores.get(t, 0.0)):
+            if len(selected) >= max_tables:
+                break
+            selected.add(neighbour)
+    return [table for table in tables if table in selected]
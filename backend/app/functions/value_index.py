@@ -0,0 +1,256 @@
+import os
+import re
+import sqlite3
+import threading
+from app.functions.ingest import quote_identifier
+from app.functions.schema_catalog import get_catalog
+
+# Full-text index over the distinct values of a database's text columns, stored next to the
+# database as <db>.values.db (an FTS5 table with the trigram tokenizer). Literals in a question
+# ("sales for Acme Corp") are looked up in it before prompting so the model is told the values
+# exactly as stored ('ACME Corporation' in customers.name) instead of guessing and retrying.
+MAX_VALUE_LENGTH = 100
+# Distinct values indexed per column; free-text columns beyond this are only partly indexed
+MAX_VALUES_PER_COLUMN = int(os.getenv("VALUE_INDEX_MAX_PER_COLUMN", "50000"))
+MAX_VALUE_HINTS = int(os.getenv("VALUE_INDEX_MAX_HINTS", "10"))
+# Hits looked at per question literal
+MAX_MATCHES_PER_LITERAL = 5
+# Longest phrase (in words) tried as a literal
+MAX_LITERAL_WORDS = 4
+MAX_LITERALS = 64
+# Matches of one literal considered before keeping the shortest values
+MATCH_SCAN_LIMIT = 200
+INSERT_BATCH = 5000
+
+_QUOTED_RE = re.compile(r"""["'“‘]([^"'”’]{3,%d})["'”’]""" % MAX_VALUE_LENGTH)
+_LITERAL_WORD_RE = re.compile(r"[\w@.&+-]+", re.UNICODE)
+_LITERAL_STOP_WORDS = {
+    "a", "about", "after", "all", "an", "and", "any", "are", "as", "at", "average", "be", "before",
+    "between", "by", "count", "did", "do", "does", "each", "every", "find", "for", "from", "get",
+    "give", "has", "have", "how", "in", "into", "is", "it", "list", "many", "max", "me", "min",
+    "most", "much", "number", "of", "on", "or", "over", "per", "show", "sum", "than", "that", "the",
+    "their", "there", "these", "those", "to", "top", "total", "under", "was", "were", "what",
+    "when", "where", "which", "who", "whose", "with",
+}
+
+_build_locks = {}
+_lock = threading.Lock()
+
+
+def value_index_path_for(db_path: str) -> str:
+    return os.path.splitext(db_path)[0] + ".values.db"
+
+
+def _index_stamp(catalog):
+    # The catalog's stamp identifies the database state the index was built from
+    return f"{catalog['db_stamp']['mtime_ns']}:{catalog['db_stamp']['size']}"
+
+
+def _read_stamp(index_path):
+    if not os.path.exists(index_path):
+        return None
+    try:
+        conn = sqlite3.connect(index_path)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'db_stamp'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Ignoring unreadable value index {index_path}: {e}")
+        return None
+    return row[0] if row else None
+
+
+def _text_columns(catalog):
+    for table, entry in catalog["tables"].items():
+        for col in entry["columns"]:
+            # Untyped and NUMERIC columns can hold text too; only text values are indexed
+            stats = entry.get("profile", {}).get(col["name"])
+            if stats is None or (stats["affinity"] not in ("INTEGER", "REAL") and stats["distinct"]):
+                yield table, col["name"]
+
+
+def build_value_index(db_path: str) -> dict:
+    """
+    Build the FTS5 value index of a SQLite database from scratch.
+
+    Returns:
+        dict: {"path", "columns", "values"}
+    """
+    path = os.path.abspath(db_path)
+    catalog = get_catalog(path)
+    index_path = value_index_path_for(path)
+    part_path = f"{index_path}.{os.getpid()}.{threading.get_ident()}.part"
+    if os.path.exists(part_path):
+        os.remove(part_path)
+
+    source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    index = sqlite3.connect(part_path)
+    columns = values = 0
+    try:
+        index.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        index.execute(
+            "CREATE VIRTUAL TABLE value_fts USING fts5(value, tbl UNINDEXED, col UNINDEXED, tokenize = 'trigram')"
+        )
+        for table, column in _text_columns(catalog):
+            quoted = quote_identifier(column)
+            cursor = source.execute(
+                f"SELECT DISTINCT {quoted} FROM {quote_identifier(table)} "
+                f"WHERE typeof({quoted}) = 'text' AND length({quoted}) BETWEEN 3 AND {MAX_VALUE_LENGTH} "
+                f"LIMIT {MAX_VALUES_PER_COLUMN}"
+            )
+            added = 0
+            while True:
+                rows = cursor.fetchmany(INSERT_BATCH)
+                if not rows:
+                    break
+                index.executemany(
+                    "INSERT INTO value_fts (value, tbl, col) VALUES (?, ?, ?)",
+                    [(value, table, column) for (value,) in rows],
+                )
+                added += len(rows)
+            if added:
+                columns += 1
+                values += added
+        index.execute("INSERT INTO value_fts (value_fts) VALUES ('optimize')")
+        index.execute("INSERT INTO meta (key, value) VALUES ('db_stamp', ?)", (_index_stamp(catalog),))
+        index.commit()
+    except Exception:
+        index.close()
+        os.remove(part_path)
+        raise
+    finally:
+        source.close()
+    index.close()
+    os.replace(part_path, index_path)
+    print(f"Built value index for {db_path} ({values} values in {columns} columns)")
+    return {"path": index_path, "columns": columns, "values": values}
+
+
+def ensure_value_index(db_path: str):
+    """
+    Return the path of a database's value index, building it if it is missing or stale.
+
+    Returns None when the index cannot be built (e.g. SQLite without FTS5).
+    """
+    path = os.path.abspath(db_path)
+    index_path = value_index_path_for(path)
+    stamp = _index_stamp(get_catalog(path))
+    if _read_stamp(index_path) == stamp:
+        return index_path
+    with _lock:
+        build_lock = _build_locks.setdefault(path, threading.Lock())
+    with build_lock:
+        if _read_stamp(index_path) == stamp:
+            return index_path
+        try:
+            build_value_index(path)
+        except sqlite3.Error as e:
+            print(f"Error building value index for {db_path}: {e}")
+            return None
+    return index_path
+
+
+def drop_value_index(db_path: str) -> None:
+    index_path = value_index_path_for(db_path)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+
+def _identifier_words(catalog):
+    words = set()
+    for table, entry in catalog["tables"].items():
+        words.update(re.split(r"[\W_]+", table.lower()))
+        for col in entry["columns"]:
+            words.update(re.split(r"[\W_]+", col["name"].lower()))
+    return words
+
+
+def extract_literals(question: str, skip_words=()) -> list:
+    """
+    Candidate literals in a question: quoted strings, then word n-grams, longest first.
+
+    Single words that are stop words or schema identifiers (skip_words) are left out,
+    as are phrases starting or ending with one.
+    """
+    literals = [m.group(1).strip() for m in _QUOTED_RE.finditer(question)]
+    words = [w.strip(".-") for w in _LITERAL_WORD_RE.findall(question)]
+    words = [w for w in words if w]
+    skip = _LITERAL_STOP_WORDS | set(skip_words)
+    for n in range(min(MAX_LITERAL_WORDS, len(words)), 0, -1):
+        for i in range(len(words) - n + 1):
+            gram = words[i:i + n]
+            if gram[0].lower() in skip or gram[-1].lower() in skip:
+                continue
+            phrase = " ".join(gram)
+            if len(phrase) >= 3 and not phrase.replace(".", "").isdigit():
+                literals.append(phrase)
+    seen = set()
+    return [lit for lit in literals if not (lit.lower() in seen or seen.add(lit.lower()))][:MAX_LITERALS]
+
+
+def _match_rank(literal, value):
+    literal, value = literal.lower(), value.lower()
+    if value == literal:
+        return 0
+    if re.search(r"\b" + re.escape(literal), value):
+        return 1
+    return 2
+
+
+def find_value_hints(db_path: str, question: str, limit: int = MAX_VALUE_HINTS) -> list:
+    """
+    Resolve the literals of a question to values stored in the database.
+
+    Matching is case-insensitive substring matching (FTS5 trigram). Literals are tried
+    longest first, and parts of a literal that already matched are not tried again
+    ("Acme Corp" matching rules out "Corp"). Exact matches rank first.
+
+    Returns:
+        list: [{"table", "column", "value", "literal"}]
+    """
+    index_path = ensure_value_index(db_path)
+    if index_path is None:
+        return []
+    catalog = get_catalog(db_path)
+    literals = extract_literals(question, _identifier_words(catalog))
+    if not literals:
+        return []
+
+    hits = {}
+    matched = []
+    conn = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    try:
+        for order, literal in enumerate(literals):
+            if any(literal.lower() in longer for longer in matched):
+                continue
+            phrase = '"' + literal.replace('"', '""') + '"'
+            rows = conn.execute(
+                "SELECT tbl, col, value FROM (SELECT tbl, col, value FROM value_fts WHERE value_fts MATCH ? LIMIT ?) "
+                "ORDER BY length(value) LIMIT ?",
+                (phrase, MATCH_SCAN_LIMIT, MAX_MATCHES_PER_LITERAL),
+            ).fetchall()
+            if rows:
+                matched.append(literal.lower())
+            for table, column, value in rows:
+                key = (table, column, value)
+                if key not in hits:
+                    hits[key] = (_match_rank(literal, value), order, literal)
+    finally:
+        conn.close()
+
+    ranked = sorted(hits.items(), key=lambda item: item[1][:2])[:limit]
+    return [
+        {"table": table, "column": column, "value": value, "literal": literal}
+        for (table, column, value), (_, _, literal) in ranked
+    ]
+
+
+def format_value_hints(hints: list) -> str:
+    """Render value hints for the SQL prompt, one per line."""
+    if not hints:
+        return "None"
+    return "\n".join(
+        f"{hint['literal']!r} -> {quote_identifier(hint['table'])}.{quote_identifier(hint['column'])} = {hint['value']!r}"
+        for hint in hints
+    )
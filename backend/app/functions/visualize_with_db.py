@@ -1,56 +1,38 @@
-import google.generativeai as genai
+import asyncio
 import pandas as pd
 import os
 import re
 from dotenv import load_dotenv
-import sqlite3
+from app.functions.schema_catalog import get_catalog
+from app.functions.executors import run_render
+from app.functions.llm_gateway import achat
+from app.functions.llm_fixtures import ReplayMiss
+from app.functions.prompt_budget import render_result, count_tokens, record_prompt, CHART_PROMPT_ROWS, CHART_TOKEN_BUDGET
 
 def get_sqlite_schema(db_path: str):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Get table names
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
-
-    schema = {}
-    for table_name_tuple in tables:
-        table_name = table_name_tuple[0]
-        cursor.execute(f"PRAGMA table_info('{table_name}');")
-        columns = cursor.fetchall()
-        schema[table_name] = [
-            {"cid": col[0], "name": col[1], "type": col[2], "notnull": col[3], "default": col[4], "pk": col[5]}
-            for col in columns
+    catalog = get_catalog(db_path)
+    return {
+        table_name: [
+            {key: col[key] for key in ("cid", "name", "type", "notnull", "default", "pk")}
+            for col in entry["columns"]
         ]
-
-    conn.close()
-    return schema
+        for table_name, entry in catalog["tables"].items()
+    }
 
 # Load environment variables
 load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-def visualise(results, output_path, model_name="gemini-2.0-flash", max_retries=5) -> None:
-    """
-    Generate a high-quality, interactive data visualization using Google Gemini and Python libraries.
 
-    Args:
-        df (pd.DataFrame): The input dataframe containing the data.
-        output_path (str): File path to save the generated visualization.
-        model_name (str): Gemini model to use (default: gemini-2.0-flash)
-        max_retries (int): Max attempts to retry visualization generation upon error.
-
-    Returns:
-        None
-    """
-    try:
-        data_description = str(results)
-
-    except Exception as e:
-        print("Error while describing data:", e)
-        return
-
-    base_prompt = f"""
+# Generated chart code runs on a render worker thread. Only a non-interactive backend works
+# there (GUI backends such as macosx or TkAgg raise or abort off the main thread), so Agg is
+# selected before the generated code can import pyplot.
+try:
+    import matplotlib
+    matplotlib.use("Agg")
+except ImportError:
+    pass
+
+def _visualisation_prompt(data_description, output_path):
+    return f"""
     You are a professional data visualization expert skilled in **creating advanced, high-quality, and visually appealing charts**.
 
     ### **Task:**
@@ -64,6 +46,10 @@ def visualise(results, output_path, model_name="gemini-2.0-flash", max_retries=5
     ### **Dataset Description:**
     {data_description}
 
+    ### **Data Access:**
+    - The complete result is already loaded in a pandas DataFrame named `df`; the rows above are only a preview.
+    - Plot from `df`. Do not re-create, retype or hard-code the data.
+
     ### **Output Format:**
     - **Strictly return only executable Python code** inside triple backticks (```python) and nothing else.
     - The code should:
@@ -80,13 +66,63 @@ def visualise(results, output_path, model_name="gemini-2.0-flash", max_retries=5
 
     """
 
-    model_instance = genai.GenerativeModel(model_name)
+
+def _result_frame(results):
+    columns = [col["key"] if isinstance(col, dict) else col for col in results.get("columns", [])]
+    return pd.DataFrame(results.get("data", []), columns=columns or None)
+
+
+def _describe_data(results, df):
+    # Shape and column types of the full result, then a budgeted preview of its rows
+    column_types = ", ".join(f"{name} ({dtype})" for name, dtype in df.dtypes.items())
+    preview = render_result(results, CHART_PROMPT_ROWS, CHART_TOKEN_BUDGET)
+    return f"`df` holds {len(df)} rows. Columns: {column_types}\n\nPreview:\n{preview}"
+
+
+def _run_chart_code(code, df):
+    # Each attempt gets its own copy, so a failed attempt cannot leave the data half-modified
+    exec(code, {"__name__": "__chart__", "df": df.copy(), "pd": pd})
+
+
+def visualise(results, output_path, model_name="gemini-2.0-flash", max_retries=5):
+    """
+    Blocking avisualise(), for callers outside an event loop.
+
+    Returns:
+        str: output_path on success, None otherwise.
+    """
+    return asyncio.run(avisualise(results, output_path, model_name, max_retries))
+
+
+async def avisualise(results, output_path, model_name="gemini-2.0-flash", max_retries=5):
+    """
+    Generate a chart of query results with Gemini-written Python code.
+
+    The code runs with the whole result in a DataFrame named `df`, while the prompt only
+    describes it and previews its first rows. The Gemini call is awaited and the generated
+    code runs on the bounded render pool, so the event loop is never blocked. Failed code is
+    sent back to the model with its error, up to max_retries attempts.
+
+    Returns:
+        str: output_path on success, None otherwise.
+    """
+    try:
+        # The generated code plots the full result from `df`; the prompt only carries the
+        # column types and a preview capped by CHART_PROMPT_ROWS and CHART_TOKEN_BUDGET
+        df = _result_frame(results)
+        data_description = _describe_data(results, df)
+    except Exception as e:
+        print("Error while describing data:", e)
+        return None
+
+    base_prompt = _visualisation_prompt(data_description, output_path)
 
     for attempt in range(1, max_retries + 1):
         try:
             print(f"\n🌀 Attempt {attempt}: Generating visualization prompt...")
-            response = model_instance.generate_content(base_prompt)
-            code_match = re.search(r"```python\n(.*?)```", response.text, re.DOTALL)
+            record_prompt("chart", count_tokens(base_prompt))
+            response = await achat(base_prompt, provider="gemini", model=model_name)
+            code_match = re.search(r"```python\n(.*?)```", response, re.DOTALL)
 
             if not code_match:
                 print("❌ No valid Python code block found in model response.")
@@ -94,14 +130,15 @@ def visualise(results, output_path, model_name="gemini-2.0-flash", max_retries=5
 
             extracted_code = code_match.group(1).strip()
             print("⚙️ Running generated code...\n")
-            exec(extracted_code)
+            await run_render(_run_chart_code, extracted_code, df)
             print("✅ Visualization generated successfully.")
-            return output_path # Exit loop if execution succeeds
+            return output_path
 
+        except ReplayMiss:
+            raise
         except Exception as e:
             print(f"🚨 Error during execution: {e}")
             error_feedback = f"\n\n⚠️ The previous code caused the following error:\n{e}\n\nFix it and regenerate the full corrected code.Saving graph to image is important with {output_path}"
             base_prompt += error_feedback
-            if attempt == max_retries:
-                print("❌ Max retries reached. Unable to generate a working visualization.")
-                return None
+    print("❌ Max retries reached. Unable to generate a working visualization.")
+    return None
@@ -1,6 +1,5 @@
 from flask import request, jsonify, send_from_directory, Blueprint
 import os
-import sqlite3
 import pandas as pd
 from uuid import uuid4
 from app.functions.gen_ai_doc import generate_report
@@ -9,6 +8,8 @@ from app.functions.gen_ai_ppt import generate_presentation
 from app.functions.gen_ai import generate_relevant_prompts
 from app.functions.gen_ai_visualise import visualise
 from app.functions.gen_sql_query import generate_sql_query as get_sql_query
+from app.functions.schema_catalog import get_catalog
+from app.functions.sql_validation import connect_readonly
 from pymongo import MongoClient
 from datetime import datetime
 import time
@@ -16,12 +17,11 @@ import requests
 # Import functions from the uploaded modules
 from app.functions.gen_ai_doc import generate_report as generate_pdf_report  
 from app.functions.gen_ai_ppt import generate_presentation as generate_ppt_report
-from openai import OpenAI
+from app.functions.llm_gateway import chat
 from dotenv import load_dotenv
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 agent_bp = Blueprint('agent', __name__)
 
@@ -59,20 +59,13 @@ def generate_report():
     print("done 2")
     # Retrieve the schema of the database
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        print("Tables: ", tables)
-        sql_query = "SELECT name FROM sqlite_master WHERE type='table';"
-        df = pd.read_sql_query(sql_query, conn)
-        schema = {}
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"PRAGMA table_info({table_name});")
-            columns = cursor.fetchall()
-            schema[table_name] = [{"name": col[1], "type": col[2]} for col in columns]
-        conn.close()
+        catalog = get_catalog(db_path)
+        print("Tables: ", list(catalog["tables"]))
+        df = pd.DataFrame({"name": list(catalog["tables"])})
+        schema = {
+            table_name: [{"name": col["name"], "type": col["type"]} for col in entry["columns"]]
+            for table_name, entry in catalog["tables"].items()
+        }
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve database schema: {str(e)}"}), 500
     print("done 3")
@@ -109,7 +102,7 @@ def generate_report():
     
     print("Generated SQL Query 1: ", sql_query)
     try:
-        conn = sqlite3.connect(db_path)
+        conn = connect_readonly(db_path)
         print("done 4")
         try:
             df = pd.read_sql_query(sql_query, conn)
@@ -174,7 +167,7 @@ def generate_report():
         g_name = f"{uuid4().hex}.png"
         output_path = os.path.join(GRAPH_DIR, g_name)
         try:
-            conn = sqlite3.connect(db_path)
+            conn = connect_readonly(db_path)
             df = pd.read_sql_query(qu, conn)
             conn.close()
         except Exception as e:
@@ -260,7 +253,7 @@ def exec_query():
         return jsonify({'error': 'Missing db_path or query'}), 400
 
     try:
-        conn = sqlite3.connect(db_path)
+        conn = connect_readonly(db_path)
         df = pd.read_sql_query(query, conn)
         conn.close()
         return df.to_json(orient='records')
@@ -279,7 +272,7 @@ def generate(choice):
         return jsonify({'error': 'Missing db_path or query'}), 400
 
     try:
-        conn = sqlite3.connect(db_path)
+        conn = connect_readonly(db_path)
         df = pd.read_sql_query(query, conn)
         conn.close()
     except Exception as e:
@@ -343,13 +336,13 @@ def download_file(choice, filename):
     
 
 def get_llm_response(prompt):
-    completion = client.chat.completions.create(
+    return chat(
+        prompt,
+        provider="openai",
         model="gpt-4o-mini",  # Adjust model as needed
-        messages=[{"role": "user", "content": prompt}],
         max_tokens=2000,
         temperature=0.5
     )
-    return completion.choices[0].message.content
     
 
 def format_for_llm(schema, sample_data):
@@ -374,26 +367,16 @@ def format_for_llm(schema, sample_data):
     
 
 def extract_schema_and_data(db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Extract table names
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = [row[0] for row in cursor.fetchall()]
+    catalog = get_catalog(db_path)
     
     schema = {}
     sample_data = {}
     
-    for table in tables:
-        # Extract schema
-        cursor.execute(f"SELECT sql FROM sqlite_master WHERE type='table' AND name='{table}';")
-        schema[table] = cursor.fetchone()[0]
-        
-        # Extract sample data (first 5 rows)
-        cursor.execute(f"SELECT * FROM {table} LIMIT 5;")
-        sample_data[table] = cursor.fetchall()
+    for table, entry in catalog["tables"].items():
+        # CREATE TABLE statement and the first 5 rows, as tuples
+        schema[table] = entry["sql"]
+        sample_data[table] = [tuple(row.values()) for row in entry["samples"][:5]]
     
-    conn.close()
     return schema, sample_data
     
 
@@ -442,7 +425,7 @@ def generate_smart_prompt():
         if not chat_id:
             return jsonify({"error": "Missing chat ID"}), 400
 
-        project = db.projects.find_one({"chat_id": chat_id})
+        project = db.projects.find_one({"chat_id": chat_id}, {"file_path": 1})
         if not project:
             return jsonify({"error": "Project not found"}), 404
 
@@ -450,19 +433,12 @@ def generate_smart_prompt():
         if not db_path or not os.path.exists(db_path):
             return jsonify({"error": "Database file not found"}), 404
 
-        # Step 1: Extract schema from SQLite
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-
-        schema = {}
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"PRAGMA table_info({table_name});")
-            columns = cursor.fetchall()
-            schema[table_name] = [{"name": col[1], "type": col[2]} for col in columns]
-        conn.close()
+        # Step 1: Read the schema from the project's catalog
+        catalog = get_catalog(db_path)
+        schema = {
+            table_name: [{"name": col["name"], "type": col["type"]} for col in entry["columns"]]
+            for table_name, entry in catalog["tables"].items()
+        }
 
         # Format schema for LLM
         formatted_schema = "\n".join([
@@ -483,16 +459,13 @@ Generate ONE useful and simple report prompt for this data, for a user who wants
 Output the prompt as a single sentence only. No explanations.
 """
 
-        completion = client.chat.completions.create(
+        generated_prompt = chat(
+            prompt,
+            provider="openai",
             model="gpt-4o",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
             max_tokens=100,
             temperature=0.7,
-        )
-
-        generated_prompt = completion.choices[0].message.content.strip()
+        ).strip()
         return jsonify({"prompt": generated_prompt}), 200
 
     except Exception as e:
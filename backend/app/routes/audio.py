@@ -1,4 +1,3 @@
-from openai import OpenAI
 from flask import Blueprint, request, send_file, jsonify
 import os
 from dotenv import load_dotenv
@@ -6,11 +5,10 @@ from pymongo import MongoClient
 import io
 import tempfile
 from pathlib import Path
+from app.functions.llm_gateway import call, openai_client, provider_slot
 
 load_dotenv()
 
-client = OpenAI()
-
 
 MONGO_URI = os.getenv("MONGO_URI")
 mongo_client = MongoClient(MONGO_URI)
@@ -31,8 +29,8 @@ def transcribe_audio():
 
     print(audio_file.name)
     try:
-        transcript = client.audio.translations.create(model="whisper-1", file=audio_file, response_format="text"
-)
+        transcript = call("openai", openai_client().audio.translations.create,
+                          model="whisper-1", file=audio_file, response_format="text")
         return jsonify({"transcript": transcript})
     except Exception as e:
         print(f"Error during transcription: {e}")
@@ -52,8 +50,8 @@ def text_to_speech():
         with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmpfile:
             audio_path = Path(tmpfile.name)
 
-        # Stream TTS response to file
-        with client.audio.speech.with_streaming_response.create(
+        # Stream TTS response to file (holding an OpenAI slot for the whole stream)
+        with provider_slot("openai"), openai_client().audio.speech.with_streaming_response.create(
             model="gpt-4o-mini-tts",
             voice="coral",
             input=text,
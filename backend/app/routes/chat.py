@@ -3,6 +3,7 @@ import sqlite3
 import uuid
 from datetime import datetime
 from pymongo import MongoClient
+from app.functions.schema_catalog import get_catalog
 
 chat_bp = Blueprint('chat', __name__)
 
@@ -18,28 +19,15 @@ mongo_client = MongoClient(MONGO_URI)
 db = mongo_client["try1"] 
 
 def get_database_schema():
-    conn = sqlite3.connect(f"input\\{file}")
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = cursor.fetchall()
-    if not tables:
+    db_path = os.path.join("input", file)
+    if not os.path.exists(db_path):
         return []
 
-    schema = []
-    for table in tables:
-        table_name = table[0]
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns_info = cursor.fetchall()
-        column_names = [col[1] for col in columns_info]  # col[1] is the column name
-
-        schema.append({
-            "table_name": table_name,
-            "columns": column_names
-        })
-
-    conn.close()
-    return schema
+    catalog = get_catalog(db_path)
+    return [
+        {"table_name": table_name, "columns": [col["name"] for col in entry["columns"]]}
+        for table_name, entry in catalog["tables"].items()
+    ]
 
 def get_sample_data(table_name, limit=5):
     conn = sqlite3.connect("database.db")
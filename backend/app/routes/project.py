@@ -4,6 +4,12 @@ from bson import ObjectId
 from datetime import datetime
 from dotenv import load_dotenv
 import os
+from app.functions.dataset_store import release_dataset
+from app.functions.db_cache import invalidate_database
+from app.functions.query_cache import invalidate_query_cache
+from app.functions.schema_catalog import invalidate_catalog
+from app.functions.value_index import drop_value_index
+from app.functions.sample_store import read_samples, sample_path_for, MAX_PAGE_SIZE
 load_dotenv()
 
 project_bp = Blueprint("project", __name__)
@@ -14,11 +20,14 @@ db = mongo_client["try1"]
 
 projects_collection = db["projects"]
 
+# Sample rows used to be embedded under database_details.data; never load them with the project
+PROJECT_PROJECTION = {"database_details.data": 0}
+
 
 @project_bp.route("/<chat_id>", methods=["GET"])
 def get_project_by_chat_id(chat_id):
     # Fetch project info
-    project = db.projects.find_one({"chat_id": chat_id})
+    project = db.projects.find_one({"chat_id": chat_id}, PROJECT_PROJECTION)
     if not project:
         return jsonify({"error": "Project not found"}), 404
 
@@ -45,6 +54,64 @@ def get_project_by_chat_id(chat_id):
     })
 
 
+@project_bp.route("/<chat_id>", methods=["DELETE"])
+def delete_project(chat_id):
+    project = db.projects.find_one({"chat_id": chat_id}, {"content_hash": 1, "file_path": 1})
+    if not project:
+        return jsonify({"error": "Project not found"}), 404
+
+    db.projects.delete_one({"_id": project["_id"]})
+    db.chat_memory.delete_one({"chat_id": chat_id})
+    # The database file may be shared with other projects built from the same upload
+    content_hash = project.get("content_hash")
+    if content_hash:
+        released = release_dataset(content_hash)
+    else:
+        file_path = project.get("file_path")
+        released = bool(file_path) and os.path.exists(file_path)
+        if released:
+            os.remove(file_path)
+            invalidate_catalog(file_path, remove_file=True)
+            drop_value_index(file_path)
+            if os.path.exists(sample_path_for(file_path)):
+                os.remove(sample_path_for(file_path))
+    if released and project.get("file_path"):
+        invalidate_database(project["file_path"])
+        invalidate_query_cache(project["file_path"])
+
+    return jsonify({"message": "Project deleted", "database_deleted": released})
+
+
+@project_bp.route("/<chat_id>/sample/<table>", methods=["GET"])
+def get_table_sample(chat_id, table):
+    project = db.projects.find_one({"chat_id": chat_id}, {"database_details.sample_path": 1})
+    if not project:
+        return jsonify({"error": "Project not found"}), 404
+
+    offset = request.args.get("offset", 0, type=int)
+    limit = request.args.get("limit", 100, type=int)
+
+    sample_path = project.get("database_details", {}).get("sample_path")
+    if sample_path:
+        page = read_samples(sample_path, table, offset, limit)
+    else:
+        # Projects created before the sample side store still embed their rows
+        legacy = db.projects.find_one({"_id": project["_id"]}, {f"database_details.data.{table}": 1})
+        rows = legacy.get("database_details", {}).get("data", {}).get(table)
+        page = None
+        if rows is not None:
+            offset, limit = max(offset, 0), min(max(limit, 1), MAX_PAGE_SIZE)
+            page = {
+                "columns": list(rows[0].keys()) if rows else [],
+                "rows": rows[offset:offset + limit],
+                "offset": offset,
+                "limit": limit,
+                "total": len(rows)
+            }
+    if page is None:
+        return jsonify({"error": "Table not found"}), 404
+
+    return jsonify({"chat_id": chat_id, "table": table, **page})
 
 
 def serialize_project(project):
@@ -73,7 +140,7 @@ def get_user_projects():
             return jsonify({"error": "Missing user_id in query params"}), 400
 
         # Query projects that belong to this user
-        projects = list(projects_collection.find({"user_id": int(user_id)}))
+        projects = list(projects_collection.find({"user_id": int(user_id)}, PROJECT_PROJECTION))
         serialized = [serialize_project(p) for p in projects]
         return jsonify(serialized), 200
 
@@ -1,22 +1,17 @@
 from datetime import datetime
 from flask import Blueprint, request, jsonify
-import sqlite3
-import csv
-import json
 import io
-import os 
-from pymongo import MongoClient
-import uuid
-from sqlalchemy import create_engine, MetaData, text
-from sqlalchemy.exc import SQLAlchemyError
-import uuid
-import pandas as pd
-import sqlite3
-import os
-import pymysql
-import json
-from sqlalchemy import create_engine, MetaData, inspect
 import os
+import uuid
+import zipfile
+from concurrent.futures import as_completed, wait
+from pymongo import MongoClient
+from app.functions.ingest import load_csv_to_sqlite, load_json_to_sqlite, load_sql_dump_to_sqlite, load_parquet_to_sqlite, load_excel_to_sqlite, convert_file_to_sqlite, merge_databases
+from app.functions.dataset_store import stage_upload, upload_hash, combined_hash, dataset_path, find_dataset, save_dataset, publish_file, release_dataset
+from app.functions.sample_store import read_table_samples, write_samples, sample_path_for
+from app.functions.schema_catalog import build_catalog, get_catalog, catalog_schema, invalidate_catalog
+from app.functions.value_index import ensure_value_index, drop_value_index
+from app.functions.ingest_jobs import submit_job, update_job, report_progress, get_job, get_process_pool, QueueFullError
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -28,7 +23,11 @@ chat_collection = db.chats
 
 upload_bp = Blueprint('upload', __name__)
 INPUT_FOLDER = "input"
+# File types of an upload; a multi-file upload combines any of them (and zips of them) into one database
+UPLOAD_EXTENSIONS = (".csv", ".json", ".parquet", ".xlsx", ".db", ".sqlite", ".sql")
+STAGING_FOLDER = os.path.join(INPUT_FOLDER, "staging")
 os.makedirs(INPUT_FOLDER, exist_ok=True)
+os.makedirs(STAGING_FOLDER, exist_ok=True)
 
 def get_next_project_id():
     counter = db.counters.find_one_and_update(
@@ -45,8 +44,10 @@ def get_file_type(filename):
     filename = filename.lower()
     if filename.endswith(".csv"): return "csv"
     if filename.endswith(".json"): return "json"
+    if filename.endswith(".parquet"): return "parquet"
+    if filename.endswith(".xlsx"): return "xlsx"
     if filename.endswith(".sql") or filename.endswith(".db"): return "sql"
-    raise ValueError("Unsupported file format. Please upload a CSV, JSON, or SQL file.")
+    raise ValueError("Unsupported file format. Please upload a CSV, JSON, Parquet, Excel or SQL file.")
 
 def save_file(file, default_extension=".db"):
     # Try to get the filename attribute; if not present, fall back to a default name.
@@ -72,182 +73,230 @@ def save_file(file, default_extension=".db"):
 
     return file_path, original_filename
 
-def parse_csv_and_data_to_db(file, chat_id, user_id):
-    csv_path, original_filename  = save_file(file)
-    with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        rows = list(reader)
-
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f"CSV file not found at: {csv_path}")
-
-    # Read the CSV into a DataFrame
-    df = pd.read_csv(csv_path)
-    sqlite_path = os.path.join(INPUT_FOLDER, f"{str(uuid.uuid4())}.db")
-    # Connect to SQLite (creates the DB file if it doesn't exist)
-    conn = sqlite3.connect(sqlite_path)
-    table_name = original_filename.replace(".csv", "")
-    try:
-        # Write the DataFrame to SQLite
-        df.to_sql(table_name, conn, if_exists='replace', index=False)
-        print(f"Table '{table_name}' created in SQLite database at: {sqlite_path}")
-    finally:
-        conn.close()
+def publish_database(build, content_hash=None):
+    """
+    Build a SQLite database under a temporary name and atomically rename it into place.
 
-    return update_schema_and_data_to_db(open(sqlite_path, 'rb'), chat_id, user_id)
+    Args:
+        build (callable): Called with the temporary path; must create the database there.
+        content_hash (str): Hash of the upload; names the database in the content-addressed store.
+
+    Returns:
+        tuple: (final database path, value returned by build)
+    """
+    if content_hash:
+        sqlite_path = dataset_path(content_hash)
+    else:
+        sqlite_path = os.path.join(INPUT_FOLDER, f"{str(uuid.uuid4())}.db")
+    part_path = f"{sqlite_path}.{uuid.uuid4().hex}.part"
+    try:
+        result = build(part_path)
+        if content_hash:
+            # An identical upload may have published the same database meanwhile; keep the first
+            if not publish_file(part_path, sqlite_path):
+                print(f"Dataset {content_hash} was built concurrently; using the published copy")
+        else:
+            os.replace(part_path, sqlite_path)
+    except Exception:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return sqlite_path, result
+
+def discard_database(file_path, content_hash=None):
+    """Remove a database built for an upload whose registration failed, with its side files."""
+    if content_hash:
+        # Kept if a project already uses the dataset
+        release_dataset(content_hash)
+        return
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    invalidate_catalog(file_path, remove_file=True)
+    drop_value_index(file_path)
+    if os.path.exists(sample_path_for(file_path)):
+        os.remove(sample_path_for(file_path))
+
+def register_new_database(file_path, original_filename, chat_id, user_id, content_hash=None):
+    """register_database() for a database this upload built; the database is discarded if it fails."""
+    try:
+        return register_database(file_path, original_filename, chat_id, user_id, content_hash)
+    except Exception:
+        discard_database(file_path, content_hash)
+        raise
+
+def upload_filename(file):
+    return os.path.basename(file) if isinstance(file, str) else file.filename
+
+def open_upload_text(file, errors="strict"):
+    # CSV/JSON/SQL sources are read as a stream (a path, a binary file or the request
+    # upload); the only file written is the SQLite database built from them.
+    # utf-8-sig drops the byte order mark Excel writes, which would otherwise end up in the
+    # first column name.
+    if isinstance(file, str):
+        return open(file, "r", encoding="utf-8-sig", errors=errors, newline="")
+    stream = getattr(file, "stream", file)
+    stream.seek(0)
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", errors=errors, newline="")
+
+def job_progress(job_id, source):
+    # Rows loaded so far plus the byte offset in the source, for the job's ETA
+    if job_id is None:
+        return None
+    return lambda rows: report_progress(job_id, rows, source.tell())
+
+def csv_to_sqlite(file, original_filename, content_hash=None, progress=None):
+    table_name = os.path.splitext(os.path.basename(original_filename))[0]
+    with open_upload_text(file) as f:
+        # Stream the CSV in bounded chunks instead of loading it into a DataFrame
+        sqlite_path, stats = publish_database(lambda path: load_csv_to_sqlite(f, path, table_name, progress=progress), content_hash)
+    print(f"Table '{table_name}' created in SQLite database at: {sqlite_path}")
+    return sqlite_path, stats
+
+def parse_csv_and_data_to_db(source, original_filename, chat_id, user_id, content_hash=None, job_id=None):
+    update_job(job_id, phase="ingesting")
+    sqlite_path, stats = csv_to_sqlite(source, original_filename, content_hash, job_progress(job_id, source))
+    update_job(job_id, phase="reflecting")
+    result = register_new_database(sqlite_path, original_filename, chat_id, user_id, content_hash)
+    result["ingest"] = stats
+    return result
 
 def parse_csv(file):
-    csv_path, original_filename  = save_file(file)
-    with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        rows = list(reader)
-
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f"CSV file not found at: {csv_path}")
-
-    # Read the CSV into a DataFrame
-    df = pd.read_csv(csv_path)
-    sqlite_path = os.path.join(INPUT_FOLDER, f"{str(uuid.uuid4())}.db")
-    # Connect to SQLite (creates the DB file if it doesn't exist)
-    conn = sqlite3.connect(sqlite_path)
-    table_name = original_filename.replace(".csv", "")
+    sqlite_path, stats = csv_to_sqlite(file, upload_filename(file))
     try:
-        # Write the DataFrame to SQLite
-        df.to_sql(table_name, conn, if_exists='replace', index=False)
-        print(f"Table '{table_name}' created in SQLite database at: {sqlite_path}")
+        result = describe_database(sqlite_path)
     finally:
-        conn.close()
+        os.remove(sqlite_path)
+    result["ingest"] = stats
+    return result
 
-    return parse_database_file(open(sqlite_path, 'rb'))
+def json_to_sqlite(file, content_hash=None, progress=None):
+    with open_upload_text(file) as f:
+        sqlite_path, stats = publish_database(lambda path: load_json_to_sqlite(f, path, progress=progress), content_hash)
+    return sqlite_path, stats
 
 def parse_json(file):
-    file_path, original_filename = save_file(file)
-
-    with open(file_path, "r", encoding="utf-8") as f:
-        json_data = json.load(f)
-
-    schema = json_data.get("schema", {})
-    data = json_data.get("data", {})
-
-    sqlite_path = os.path.join(INPUT_FOLDER, f"{str(uuid.uuid4())}.db")
-    conn = sqlite3.connect(sqlite_path)
-    cursor = conn.cursor()
-
-    # Create tables and insert data
-    for table_name, columns in schema.items():
-        column_defs = []
-        for col in columns:
-            col_type = col["type"]
-            nullable = "" if col["nullable"] else "NOT NULL"
-            column_defs.append(f"{col['name']} {col_type} {nullable}")
-        create_stmt = f"CREATE TABLE IF NOT EXISTS {table_name} ({', '.join(column_defs)});"
-        cursor.execute(create_stmt)
-
-        # Insert data if available
-        table_data = data.get(table_name, [])
-        if table_data:
-            col_names = table_data[0].keys()
-            placeholders = ", ".join(["?"] * len(col_names))
-            insert_stmt = f"INSERT INTO {table_name} ({', '.join(col_names)}) VALUES ({placeholders})"
-            values = [tuple(row[col] for col in col_names) for row in table_data]
-            cursor.executemany(insert_stmt, values)
-
-    conn.commit()
-    conn.close()
-
+    sqlite_path, stats = json_to_sqlite(file)
     # Return parsed result from the created SQLite DB
-    return parse_database_file(open(sqlite_path, 'rb'))
-
-def parse_json_and_data_to_db(file, chat_id, user_id):
-    file_path, original_filename = save_file(file)
-
-    with open(file_path, "r", encoding="utf-8") as f:
-        json_data = json.load(f)
-
-    schema = json_data.get("schema", {})
-    data = json_data.get("data", {})
-
-    sqlite_path = os.path.join(INPUT_FOLDER, f"{str(uuid.uuid4())}.db")
-    conn = sqlite3.connect(sqlite_path)
-    cursor = conn.cursor()
-
-    # Create tables and insert data
-    for table_name, columns in schema.items():
-        column_defs = []
-        for col in columns:
-            col_type = col["type"]
-            nullable = "" if col["nullable"] else "NOT NULL"
-            column_defs.append(f"{col['name']} {col_type} {nullable}")
-        create_stmt = f"CREATE TABLE IF NOT EXISTS {table_name} ({', '.join(column_defs)});"
-        cursor.execute(create_stmt)
-
-        # Insert data if available
-        table_data = data.get(table_name, [])
-        if table_data:
-            col_names = table_data[0].keys()
-            placeholders = ", ".join(["?"] * len(col_names))
-            insert_stmt = f"INSERT INTO {table_name} ({', '.join(col_names)}) VALUES ({placeholders})"
-            values = [tuple(row[col] for col in col_names) for row in table_data]
-            cursor.executemany(insert_stmt, values)
-
-    conn.commit()
-    conn.close()
-    return update_schema_and_data_to_db(open(sqlite_path, 'rb'), chat_id, user_id)
-
-def update_schema_and_data_to_db(file, chat_id, user_id):
-    file_path, original_filename = save_file(file)
-    filename_lower = original_filename.lower()
-
-    db_name = original_filename.replace(".db", "").replace(".sqlite", "").replace(".sql", "")
-
-    if filename_lower.endswith((".db", ".sqlite")):
-        connection_string = f"sqlite:///{file_path}"
-    elif filename_lower.endswith(".sql"):
-        return mysql_to_json_and_data_to_db(file, chat_id, user_id)
-    else:
-        raise ValueError("Unsupported SQL file format. Please upload a SQLite database file or a SQL dump file.")
-
-    engine = create_engine(connection_string)
+    try:
+        result = describe_database(sqlite_path)
+    finally:
+        os.remove(sqlite_path)
+    result["ingest"] = stats
+    return result
+
+def parse_json_and_data_to_db(source, original_filename, chat_id, user_id, content_hash=None, job_id=None):
+    update_job(job_id, phase="ingesting")
+    sqlite_path, stats = json_to_sqlite(source, content_hash, job_progress(job_id, source))
+    update_job(job_id, phase="reflecting")
+    result = register_new_database(sqlite_path, original_filename, chat_id, user_id, content_hash)
+    result["ingest"] = stats
+    return result
+
+def sql_dump_to_sqlite(file, content_hash=None, progress=None):
+    # Dumps may carry binary column data; undecodable bytes are replaced rather than fatal
+    with open_upload_text(file, errors="replace") as f:
+        sqlite_path, stats = publish_database(lambda path: load_sql_dump_to_sqlite(f, path, progress=progress), content_hash)
+    return sqlite_path, stats
+
+def parse_sql_dump(file):
+    sqlite_path, stats = sql_dump_to_sqlite(file)
+    try:
+        result = describe_database(sqlite_path)
+    finally:
+        os.remove(sqlite_path)
+    result["ingest"] = stats
+    return result
+
+def parse_sql_dump_and_data_to_db(source, original_filename, chat_id, user_id, content_hash=None, job_id=None):
+    update_job(job_id, phase="ingesting")
+    sqlite_path, stats = sql_dump_to_sqlite(source, content_hash, job_progress(job_id, source))
+    update_job(job_id, phase="reflecting")
+    result = register_new_database(sqlite_path, original_filename, chat_id, user_id, content_hash)
+    result["ingest"] = stats
+    return result
+
+def open_upload_binary(file):
+    # Parquet and XLSX readers need a seekable binary file
+    if isinstance(file, str):
+        return open(file, "rb")
+    stream = getattr(file, "stream", file)
+    stream.seek(0)
+    return stream
+
+def columnar_to_sqlite(file, original_filename, content_hash=None, progress=None):
+    # Parquet keeps its own column types; each XLSX sheet becomes a table
+    source = open_upload_binary(file)
+    try:
+        if original_filename.lower().endswith(".parquet"):
+            table_name = os.path.splitext(os.path.basename(original_filename))[0]
+            build = lambda path: load_parquet_to_sqlite(source, path, table_name, progress=progress)
+        else:
+            build = lambda path: load_excel_to_sqlite(source, path, progress=progress)
+        return publish_database(build, content_hash)
+    finally:
+        if isinstance(file, str):
+            source.close()
 
-    if filename_lower.endswith(".sql"):
-        with open(file_path, "r", encoding="utf-8") as f:
-            sql_script = f.read()
-
-        statements = [stmt.strip() for stmt in sql_script.split(";") if stmt.strip()]
-        with engine.begin() as conn:
-            for stmt in statements:
-                try:
-                    conn.execute(text(stmt))
-                except SQLAlchemyError as e:
-                    raise ValueError(f"Error executing SQL statement: {e}")
-
-    metadata = MetaData()
+def parse_columnar(file):
+    sqlite_path, stats = columnar_to_sqlite(file, upload_filename(file))
     try:
-        metadata.reflect(bind=engine)
-        if not metadata.tables:
-            raise ValueError("No tables found in the database.")
+        result = describe_database(sqlite_path)
+    finally:
+        os.remove(sqlite_path)
+    result["ingest"] = stats
+    return result
+
+def parse_columnar_and_data_to_db(source, original_filename, chat_id, user_id, content_hash=None, job_id=None):
+    update_job(job_id, phase="ingesting")
+    sqlite_path, stats = columnar_to_sqlite(source, original_filename, content_hash, job_progress(job_id, source))
+    update_job(job_id, phase="reflecting")
+    result = register_new_database(sqlite_path, original_filename, chat_id, user_id, content_hash)
+    result["ingest"] = stats
+    return result
+
+def reflect_database(file_path, persist=True):
+    # The schema catalog is built (and, for stored databases, persisted) here at upload
+    # time; later readers get it from get_catalog() without introspecting the database.
+    try:
+        catalog = get_catalog(file_path) if persist else build_catalog(file_path)
     except Exception as e:
         raise ValueError(f"Error reflecting database schema: {e}")
+    if not catalog["tables"]:
+        raise ValueError("Error reflecting database schema: No tables found in the database.")
+    return catalog_schema(catalog)
+
+def describe_database(file_path):
+    # Previews are deleted afterwards, so no catalog sidecar is written for them
+    schema = reflect_database(file_path, persist=False)
+    data = read_table_samples(file_path, schema)
+    return { "schema": schema, "data": data}
 
-    schema = {
-        table_name: [
-            {
-                "name": col.name,
-                "type": str(col.type),
-                "nullable": col.nullable
-            } for col in table_obj.columns
-        ]
-        for table_name, table_obj in metadata.tables.items()
-    }
-
-    data = {}
-    with engine.connect() as conn:
-        for table_name, table_obj in metadata.tables.items():
-            query = table_obj.select().limit(1000)
-            result_proxy = conn.execute(query)
-            rows = result_proxy.fetchall()
-            column_names = result_proxy.keys()
-            data[table_name] = [dict(zip(column_names, row)) for row in rows]
+def register_database(file_path, original_filename, chat_id, user_id, content_hash=None):
+    """
+    Create the project document for a SQLite database that is already in INPUT_FOLDER.
+
+    The database is referenced by path; it is not copied. When the upload's content
+    hash is known, the reflected schema and sample rows are reused from (or saved to)
+    the dataset store so identical uploads share one database and one reflection.
+
+    Sample rows are written to the sample side store and served by
+    /api/project/<chat_id>/sample/<table>; they are not embedded in the project document.
+    """
+    db_name = os.path.splitext(original_filename)[0]
+    dataset = find_dataset(content_hash) if content_hash else None
+    if dataset:
+        schema = dataset["schema"]
+        # Builds the catalog sidecar if it is missing (datasets stored before catalogs existed)
+        get_catalog(file_path)
+    else:
+        schema = reflect_database(file_path)
+    # Value index used to resolve question literals to stored values
+    ensure_value_index(file_path)
+    sample_path = sample_path_for(file_path)
+    if not os.path.exists(sample_path):
+        write_samples(file_path, schema)
+    if content_hash and not dataset:
+        save_dataset(content_hash, file_path, schema)
 
     project_id = get_next_project_id()
 
@@ -259,7 +308,7 @@ def update_schema_and_data_to_db(file, chat_id, user_id):
             {"table_name": table_name, "columns": [col["name"] for col in schema[table_name]]}
             for table_name in schema
         ],
-        "data": data
+        "sample_path": sample_path
     }
 
     project_document = {
@@ -269,6 +318,7 @@ def update_schema_and_data_to_db(file, chat_id, user_id):
         "chat_id": chat_id,
         "original_filename": original_filename,
         "file_path": file_path,
+        "content_hash": content_hash,
         "description": f"Database project for {db_name}",
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
@@ -280,222 +330,264 @@ def update_schema_and_data_to_db(file, chat_id, user_id):
     }
     db.projects.insert_one(project_document)
 
-    return {"project_id": project_id, "schema": schema, "data": data}
-
-def parse_database_file(file):
-    file_path, orignal_filename = save_file(file)
-    filename_lower = orignal_filename.lower()
+    return {"project_id": project_id, "schema": schema}
 
-    if filename_lower.endswith((".db", ".sqlite")):
-        connection_string = f"sqlite:///{file_path}"
-    elif filename_lower.endswith(".sql"):
-        return mysql_to_json("localhost", "root", "mnbvcx12", orignal_filename.lower())
-    else:
-        raise ValueError("Unsupported SQL file format. Please upload a SQLite database file or a SQL dump file.")
-
-    engine = create_engine(connection_string)
+def update_schema_and_data_to_db(staged_path, original_filename, chat_id, user_id, content_hash=None, job_id=None):
+    filename_lower = original_filename.lower()
 
     if filename_lower.endswith(".sql"):
-        with open(file_path, "r", encoding="utf-8") as f:
-            sql_script = f.read()
-
-        statements = [stmt.strip() for stmt in sql_script.split(";") if stmt.strip()]
-        with engine.begin() as conn:
-            for stmt in statements:
-                try:
-                    conn.execute(text(stmt))
-                except SQLAlchemyError as e:
-                    raise ValueError(f"Error executing SQL statement: {e}")
-
-    metadata = MetaData()
-    try:
-        metadata.reflect(bind=engine)
-        if not metadata.tables:
-            raise ValueError("No tables found in the database.")
-    except Exception as e:
-        raise ValueError(f"Error reflecting database schema: {e}")
-
-    schema = {
-        table_name: [
-            {
-                "name": col.name,
-                "type": str(col.type),
-                "nullable": col.nullable
-            } for col in table_obj.columns
-        ]
-        for table_name, table_obj in metadata.tables.items()
-    }
+        with open(staged_path, "rb") as source:
+            return parse_sql_dump_and_data_to_db(source, original_filename, chat_id, user_id, content_hash, job_id)
+    elif not filename_lower.endswith((".db", ".sqlite")):
+        raise ValueError("Unsupported SQL file format. Please upload a SQLite database file or a SQL dump file.")
 
-    data = {}
-    with engine.connect() as conn:
-        for table_name, table_obj in metadata.tables.items():
-            query = table_obj.select().limit(1000)
-            result_proxy = conn.execute(query)
-            rows = result_proxy.fetchall()
-            column_names = result_proxy.keys()
-            data[table_name] = [dict(zip(column_names, row)) for row in rows]
+    # The staged SQLite upload is moved into INPUT_FOLDER and registered in place
+    if content_hash:
+        file_path = dataset_path(content_hash)
+        publish_file(staged_path, file_path)
+    else:
+        file_path = os.path.join(INPUT_FOLDER, f"{str(uuid.uuid4())}.db")
+        os.replace(staged_path, file_path)
+    update_job(job_id, phase="reflecting")
+    return register_new_database(file_path, original_filename, chat_id, user_id, content_hash)
 
-    return { "schema": schema, "data": data}
+def parse_database_file(file):
+    filename_lower = file.filename.lower()
 
-def mysql_to_json(host, user, password, database, port=3306, output_path=f"input/{str(uuid.uuid4())}.json"):
-    # Create SQLAlchemy engine
-    connection_url = f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}"
-    engine = create_engine(connection_url)
+    if filename_lower.endswith(".sql"):
+        return parse_sql_dump(file)
+    elif not filename_lower.endswith((".db", ".sqlite")):
+        raise ValueError("Unsupported SQL file format. Please upload a SQLite database file or a SQL dump file.")
 
-    inspector = inspect(engine)
-    metadata = MetaData()
-    metadata.reflect(bind=engine)
+    file_path, _ = save_file(file)
+    try:
+        return describe_database(file_path)
+    finally:
+        os.remove(file_path)
 
-    schema = {}
-    data = {}
+def post_upload_message(chat_id, schema):
+    table_count = len(schema)
 
-    for table_name in inspector.get_table_names():
-        # Schema
-        columns = inspector.get_columns(table_name)
-        schema[table_name] = [
+    agent_steps = [
+        {
+            "id": str(uuid.uuid4()),
+            "description": "Database file processed successfully",
+            "status": "done"
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "description": f"Detected {table_count} tables",
+            "status": "done"
+        },
+        *[
             {
-                "name": col["name"],
-                "type": str(col["type"]),
-                "nullable": col["nullable"]
+                "id": str(uuid.uuid4()),
+                "description": f'Table "{table}" with {len(columns)} columns',
+                "status": "done"
             }
-            for col in columns
-        ]
-
-        # Data
-        with engine.connect() as conn:
-            result = conn.execute(f"SELECT * FROM `{table_name}`")
-            rows = result.fetchall()
-            col_names = result.keys()
-            data[table_name] = [dict(zip(col_names, row)) for row in rows]
-
-    result_json = {
-        "schema": schema,
-        "data": data
-    }
-
-    if output_path:
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(result_json, f, indent=2, ensure_ascii=False)
-
-    return parse_json(output_path)
-
-def mysql_to_json_and_data_to_db(host, user, password, database, chat_id, user_id, port=3306, output_path=f"input/{str(uuid.uuid4())}.json"):
-    # Create SQLAlchemy engine
-    connection_url = f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}"
-    engine = create_engine(connection_url)
-
-    inspector = inspect(engine)
-    metadata = MetaData()
-    metadata.reflect(bind=engine)
-
-    schema = {}
-    data = {}
+            for table, columns in schema.items()
+        ],
+        {
+            "id": str(uuid.uuid4()),
+            "description": "Ready to answer questions about your data",
+            "status": "done"
+        }
+    ]
 
-    for table_name in inspector.get_table_names():
-        # Schema
-        columns = inspector.get_columns(table_name)
-        schema[table_name] = [
-            {
-                "name": col["name"],
-                "type": str(col["type"]),
-                "nullable": col["nullable"]
-            }
-            for col in columns
+    assistant_message = {
+        "id": str(uuid.uuid4()),
+        "chat_id": chat_id,
+        "role": "assistant",
+        "content": "Database uploaded successfully! You can now ask questions about your data.",
+        "timestamp": datetime.utcnow(),
+        "agentSteps": agent_steps,
+        "currentStep": len(agent_steps),
+        "explanation": "I've analyzed your database and I'm ready to help you query it.",
+        "followUpSuggestions": [
+            "Show me the schema",
+            "List all tables",
+            "How many rows are in each table?"
         ]
-
-        # Data
-        with engine.connect() as conn:
-            result = conn.execute(f"SELECT * FROM `{table_name}`")
-            rows = result.fetchall()
-            col_names = result.keys()
-            data[table_name] = [dict(zip(col_names, row)) for row in rows]
-
-    result_json = {
-        "schema": schema,
-        "data": data
     }
+    chat_collection.insert_one(assistant_message)
 
-    if output_path:
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(result_json, f, indent=2, ensure_ascii=False)
+def ingest_upload(job_id, staged_path, original_filename, chat_id, user_id, content_hash):
+    """
+    Background job body for /api/upload/start: build, reflect and register a staged upload.
 
-    return parse_json(output_path, chat_id, user_id)
+    The staged file is always removed; the chat message is written only on success.
+    """
+    filename_lower = original_filename.lower()
+    try:
+        dataset = find_dataset(content_hash)
+        if dataset:
+            # Identical upload seen before: reuse the built database and its reflection
+            print(f"Reusing dataset {content_hash} for '{original_filename}'")
+            update_job(job_id, phase="registering")
+            result = register_database(dataset["file_path"], original_filename, chat_id, user_id, content_hash)
+        elif filename_lower.endswith((".db", ".sqlite", ".sql")):
+            result = update_schema_and_data_to_db(staged_path, original_filename, chat_id, user_id, content_hash, job_id)
+        else:
+            with open(staged_path, "rb") as source:
+                if filename_lower.endswith(".csv"):
+                    result = parse_csv_and_data_to_db(source, original_filename, chat_id, user_id, content_hash, job_id)
+                elif filename_lower.endswith((".parquet", ".xlsx")):
+                    result = parse_columnar_and_data_to_db(source, original_filename, chat_id, user_id, content_hash, job_id)
+                else:
+                    result = parse_json_and_data_to_db(source, original_filename, chat_id, user_id, content_hash, job_id)
+    finally:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+
+    post_upload_message(chat_id, result.get("schema", {}))
+    return result
+
+def extract_zip(staged_zip):
+    # Stage every supported member of a zip upload as its own file
+    files = []
+    with zipfile.ZipFile(staged_zip) as zf:
+        for info in zf.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or name.startswith(".") or not name.lower().endswith(UPLOAD_EXTENSIONS):
+                continue
+            with zf.open(info) as member:
+                path, content_hash, size = stage_upload(member, STAGING_FOLDER, filename=name)
+            files.append({"path": path, "filename": name, "content_hash": content_hash, "size": size})
+    return files
+
+def ingest_files(job_id, staged, project_filename, chat_id, user_id):
+    """
+    Background job body for a multi-file (or zip) upload: every file becomes a table
+    in one shared project database.
+
+    CSV/JSON/SQL/Parquet/XLSX files are converted in parallel on the ingestion process
+    pool, the parts are merged into a single SQLite file and the schema is reflected
+    once at the end.
+    """
+    files = []
+    parts = []
+    try:
+        update_job(job_id, phase="extracting")
+        for item in staged:
+            if item["filename"].lower().endswith(".zip"):
+                files.extend(extract_zip(item["path"]))
+            else:
+                files.append(item)
+        if not files:
+            raise ValueError("No CSV, JSON, Parquet, Excel, SQL or SQLite files found in the upload.")
+
+        content_hash = combined_hash(files)
+        dataset = find_dataset(content_hash)
+        if dataset:
+            print(f"Reusing dataset {content_hash} for '{project_filename}'")
+            update_job(job_id, phase="registering")
+            result = register_database(dataset["file_path"], project_filename, chat_id, user_id, content_hash)
+        else:
+            update_job(job_id, phase="converting", files_total=len(files), files_done=0,
+                       bytes_total=sum(item["size"] for item in files))
+            pool = get_process_pool()
+            futures = {}
+            rows, bytes_done, files_done = 0, 0, 0
+            for item in files:
+                if item["filename"].lower().endswith((".db", ".sqlite")):
+                    # SQLite uploads are merged as they are
+                    parts.append(item["path"])
+                    bytes_done += item["size"]
+                    files_done += 1
+                    continue
+                part_path = os.path.join(STAGING_FOLDER, f"{uuid.uuid4()}.part.db")
+                parts.append(part_path)
+                futures[pool.submit(convert_file_to_sqlite, item["path"], item["filename"], part_path)] = item
+
+            ingest = {}
+            try:
+                for future in as_completed(futures):
+                    item = futures[future]
+                    stats = future.result()
+                    ingest[item["filename"]] = stats
+                    rows += stats["rows"]
+                    bytes_done += item["size"]
+                    files_done += 1
+                    update_job(job_id, files_done=files_done)
+                    report_progress(job_id, rows, bytes_done)
+            except BaseException:
+                # Conversions still running would write their parts after the cleanup below
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                raise
+
+            update_job(job_id, phase="merging")
+            sqlite_path, table_rows = publish_database(lambda path: merge_databases(parts, path), content_hash)
+            update_job(job_id, phase="reflecting")
+            result = register_new_database(sqlite_path, project_filename, chat_id, user_id, content_hash)
+            result["ingest"] = {"files": ingest, "tables": table_rows}
+    finally:
+        for path in [item["path"] for item in staged] + [item["path"] for item in files] + parts:
+            if os.path.exists(path):
+                os.remove(path)
 
+    post_upload_message(chat_id, result.get("schema", {}))
+    return result
 
 @upload_bp.route('/start', methods=['GET', 'POST'])
 def store_schema():
     if "file" not in request.files:
         return jsonify({"error": "No file provided"}), 400
 
-    file = request.files["file"]
+    uploads = [f for f in request.files.getlist("file") if f.filename != ""]
     
-    if file.filename == "":
+    if not uploads:
         return jsonify({"error": "No file selected"}), 400
     
     user_id = int(request.form.get("user_id"))
     chat_id = request.form.get("chat_id")
 
-    filename_lower = file.filename.lower()
+    multi_file = len(uploads) > 1 or uploads[0].filename.lower().endswith(".zip")
+    allowed = UPLOAD_EXTENSIONS + (".zip",) if multi_file else UPLOAD_EXTENSIONS
+    if any(not f.filename.lower().endswith(allowed) for f in uploads):
+        return jsonify({"error": "Unsupported file format"}), 400
     try:
-        if filename_lower.endswith(".csv"):
-            result = parse_csv_and_data_to_db(file, chat_id, user_id)
-        elif filename_lower.endswith(".json"):
-            result = parse_json_and_data_to_db(file, chat_id, user_id)
-        elif filename_lower.endswith((".db", ".sqlite", ".sql")):
-            result = update_schema_and_data_to_db(file, chat_id, user_id)
+        # Uploads are staged (and hashed) within the request; the rest runs as a job
+        staged = []
+        for f in uploads:
+            path, content_hash, size = stage_upload(f, STAGING_FOLDER)
+            staged.append({"path": path, "filename": f.filename, "content_hash": content_hash, "size": size})
+
+        if multi_file:
+            project_filename = request.form.get("name") or uploads[0].filename
+            target = lambda job_id: ingest_files(job_id, staged, project_filename, chat_id, user_id)
         else:
-            return jsonify({"error": "Unsupported file format"}), 400
-        schema = result.get("schema", {})
-        table_count = len(schema)
-
-        agent_steps = [
-            {
-                "id": str(uuid.uuid4()),
-                "description": "Database file processed successfully",
-                "status": "done"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "description": f"Detected {table_count} tables",
-                "status": "done"
-            },
-            *[
-                {
-                    "id": str(uuid.uuid4()),
-                    "description": f'Table "{table}" with {len(columns)} columns',
-                    "status": "done"
-                }
-                for table, columns in schema.items()
-            ],
-            {
-                "id": str(uuid.uuid4()),
-                "description": "Ready to answer questions about your data",
-                "status": "done"
-            }
-        ]
-
-        assistant_message = {
-            "id": str(uuid.uuid4()),
-            "chat_id": chat_id,
-            "role": "assistant",
-            "content": "Database uploaded successfully! You can now ask questions about your data.",
-            "timestamp": datetime.utcnow(),
-            "agentSteps": agent_steps,
-            "currentStep": len(agent_steps),
-            "explanation": "I've analyzed your database and I'm ready to help you query it.",
-            "followUpSuggestions": [
-                "Show me the schema",
-                "List all tables",
-                "How many rows are in each table?"
-            ]
-        }
-        chat_collection.insert_one(assistant_message)
-
-        return jsonify(result)
+            item = staged[0]
+            project_filename = item["filename"]
+            # The table of a CSV/Parquet upload is named after the file, so the name is part of the key
+            dataset_hash = upload_hash(item["filename"], item["content_hash"])
+            target = lambda job_id: ingest_upload(job_id, item["path"], item["filename"], chat_id, user_id, dataset_hash)
+
+        try:
+            job_id = submit_job(
+                target,
+                bytes_total=sum(item["size"] for item in staged),
+                chat_id=chat_id,
+                filename=project_filename
+            )
+        except QueueFullError as e:
+            for item in staged:
+                os.remove(item["path"])
+            return jsonify({"error": str(e)}), 503
+
+        return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/api/upload/status/{job_id}"}), 202
     except Exception as e:
         print(f"Error: {str(e)}")  
         return jsonify({"error": str(e)}), 400
 
+@upload_bp.route('/status/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
 @upload_bp.route('/', methods=['GET', 'POST'])
 def upload_file():
     if "file" not in request.files:
@@ -511,6 +603,8 @@ def upload_file():
             result = parse_csv(file)
         elif filename_lower.endswith(".json"):
             result = parse_json(file)
+        elif filename_lower.endswith((".parquet", ".xlsx")):
+            result = parse_columnar(file)
         elif filename_lower.endswith((".db", ".sqlite", ".sql")):
             result = parse_database_file(file)
         else:
@@ -0,0 +1,95 @@
+"""
+Load test for the FastAPI /query endpoint.
+
+Sends the same question at increasing concurrency and reports throughput and latency per
+level. On a non-blocking worker, throughput grows with concurrency until the LLM provider,
+the SQL pool (QUERY_SQL_WORKERS) or the CPU becomes the limit; on a blocking one it stays
+flat at about 1 / latency.
+
+    python load_test.py --chat-id <chat_id> --query "how many orders per month" --concurrency 1 4 16
+
+Pass graph=true (the default) so test requests are not written to the chat history.
+
+To measure the backend's own overhead without provider noise, record once against the live
+providers and benchmark in replay mode (see llm_gateway), then print the per-stage timings:
+
+    LLM_MODE=record uvicorn main:app          # run the questions once
+    LLM_MODE=replay LLM_REPLAY_LATENCY=0 uvicorn main:app
+    python load_test.py --chat-id <chat_id> --query "..." --stages
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def send(url, payload, timeout):
+    body = json.dumps(payload).encode("utf-8")
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            ok = resp.status == 200
+    except Exception as e:
+        print(f"Request failed: {e}")
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def run_level(url, payload, concurrency, requests_per_level, timeout):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda _: send(url, payload, timeout), range(requests_per_level)))
+        elapsed = time.perf_counter() - start
+    latencies = sorted(latency for ok, latency in results if ok)
+    failed = sum(1 for ok, _ in results if not ok)
+    return {
+        "concurrency": concurrency,
+        "requests": requests_per_level,
+        "failed": failed,
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": statistics.median(latencies) if latencies else None,
+        "p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+    }
+
+
+def print_stages(metrics_url, timeout):
+    with urllib.request.urlopen(metrics_url, timeout=timeout) as resp:
+        observations = json.load(resp)["observations"]
+    print(f"\n{'stage':<36} {'count':>6} {'avg ms':>9} {'max ms':>9}")
+    for name, obs in sorted(observations.items()):
+        if name.startswith(("stage.", "llm.")) and name.endswith(".seconds"):
+            print(f"{name:<36} {obs['count']:>6} {obs['avg'] * 1000:>9.1f} {obs['max'] * 1000:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /query endpoint.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/query")
+    parser.add_argument("--chat-id", required=True)
+    parser.add_argument("--query", required=True)
+    parser.add_argument("--graph", default="true", choices=["true", "false"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=0, help="Requests per level (default: 4 x concurrency)")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--stages", action="store_true",
+                        help="Print per-stage and LLM timings from /metrics after the run")
+    args = parser.parse_args()
+
+    payload = {"query": args.query, "chatId": args.chat_id, "graph": args.graph == "true"}
+    print(f"{'conc':>5} {'reqs':>5} {'fail':>5} {'req/s':>8} {'p50 s':>8} {'p95 s':>8}")
+    for concurrency in args.concurrency:
+        stats = run_level(args.url, payload, concurrency, args.requests or 4 * concurrency, args.timeout)
+        p50 = f"{stats['p50']:.2f}" if stats["p50"] is not None else "-"
+        p95 = f"{stats['p95']:.2f}" if stats["p95"] is not None else "-"
+        print(f"{concurrency:>5} {stats['requests']:>5} {stats['failed']:>5} "
+              f"{stats['throughput']:>8.2f} {p50:>8} {p95:>8}")
+    if args.stages:
+        print_stages(args.url.rsplit("/", 1)[0] + "/metrics", args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,20 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any
 import asyncio
+import json
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
-from app.functions.explaination import generate_nl_explanation
-from app.functions.generate_sql import async_query
+from app.functions.explaination import agenerate_nl_explanation, astream_nl_explanation, template_narration
+from app.functions.generate_sql import async_query, iter_query_steps
 import uuid
-from app.functions.explaination import thinking_explanation
+from app.functions.explaination import narrate_steps
 from datetime import datetime
-from app.functions.visualize_with_db import visualise
+from app.functions.visualize_with_db import avisualise
+from app.functions.metrics import snapshot, timed_await
+from app.functions.chat_memory import load_memory, history_lines, make_turn, remember_turn
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 load_dotenv()
@@ -20,7 +24,11 @@ MONGO_URI = os.getenv("MONGO_URI")
 mongo_client = AsyncIOMotorClient(MONGO_URI)
 db = mongo_client["try1"] 
 chat_collection = db.chats
+# Rolling summary and last turns of each chat, for follow-up questions (see chat_memory)
+memory_collection = db.chat_memory
 OUTPUT_FOLDER = "output/visualization"
+# Rows sent in the "rows" event of /query/stream; the full result follows in "done"
+STREAM_FIRST_PAGE_ROWS = int(os.getenv("STREAM_FIRST_PAGE_ROWS", "100"))
 if not os.path.exists(OUTPUT_FOLDER):
     os.makedirs(OUTPUT_FOLDER)
 
@@ -38,6 +46,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/metrics")
+async def metrics():
+    return snapshot()
+
+async def conversation_history(chat_id: str) -> list:
+    """History lines of a chat for the SQL prompt; [] if its memory cannot be read."""
+    try:
+        return history_lines(await load_memory(memory_collection, chat_id))
+    except Exception as e:
+        print(f"Error loading conversation memory: {e}")
+        return []
+
+async def remember(chat_id: str, turn: dict) -> None:
+    try:
+        await remember_turn(memory_collection, chat_id, turn)
+    except Exception as e:
+        print(f"Error updating conversation memory: {e}")
+
 # Request model
 class QueryRequest(BaseModel):
     query: str
@@ -50,7 +76,7 @@ async def execute_query(payload: QueryRequest):
     chat_id = payload.chatId
     graph = payload.graph
     print(graph)
-    project = await db.projects.find_one({"chat_id": chat_id})
+    project = await db.projects.find_one({"chat_id": chat_id}, {"file_path": 1})
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
@@ -79,14 +105,15 @@ async def execute_query(payload: QueryRequest):
             except:
                 raise HTTPException(status_code=500, detail="Error inserting user chat document")
             
-        steps = await async_query(query, db_type, db_file_path)
+        # Follow-up questions see a fixed-size summary of the conversation so far;
+        # graph requests are not part of the conversation
+        history = [] if graph else await conversation_history(chat_id)
+        steps = await async_query(query, db_type, db_file_path, history)
         print(steps)
-        agentThinking = []
         final_sql = None
         result = None
         schema = None
         for step in steps:
-            agentThinking.append({"id": str(uuid.uuid4()), "description": thinking_explanation(str(step)), "status": "done"})
             if step["step"] == "generate_query":
                 
                 final_sql = step["sql_query"]
@@ -101,12 +128,24 @@ async def execute_query(payload: QueryRequest):
         if not result:
             raise HTTPException(status_code=500, detail="No result from query execution")
 
-        # Generate natural language explanation
-        explanation = generate_nl_explanation(query, result)
-
+        # Generate natural language explanation and chart.
+        # Step narration, the explanation and the chart are independent LLM calls; they run
+        # concurrently without blocking the event loop. Steps are narrated together, from
+        # bounded digests (see NARRATION_MODE).
         out_file_name = f"{str(uuid.uuid4())}.png"
         out_file_path = OUTPUT_FOLDER+"/"+out_file_name
-        visualise(result, out_file_path)
+        jobs = [
+            timed_await("stage.narration.seconds", narrate_steps(steps)),
+            timed_await("stage.explanation.seconds", agenerate_nl_explanation(query, result)),
+            timed_await("stage.visualization.seconds", avisualise(result, out_file_path))
+        ]
+        if not graph:
+            jobs.append(timed_await("stage.memory.seconds", remember(chat_id, make_turn(query, final_sql, result))))
+        narration, explanation, _ = (await asyncio.gather(*jobs))[:3]
+        agentThinking = [
+            {"id": str(uuid.uuid4()), "description": description, "status": "done"}
+            for description in narration
+        ]
 
         columns = []
         for col in result["columns"]:
@@ -144,3 +183,135 @@ async def execute_query(payload: QueryRequest):
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/query/stream")
+async def execute_query_stream(payload: QueryRequest):
+    """
+    Streaming variant of /query, as Server-Sent Events.
+
+    Events, in order: "step" for each agent step as it completes, "sql" once a query is
+    generated, "rows" with the first page of the result as soon as it executes,
+    "explanation" with each explanation token, "steps" with the narrated steps,
+    "visualization" with the chart URL, then "done" with the full response of /query.
+    A failure sends "error" and ends the stream.
+    """
+    query = payload.query
+    chat_id = payload.chatId
+    graph = payload.graph
+    project = await db.projects.find_one({"chat_id": chat_id}, {"file_path": 1})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if not query:
+        raise HTTPException(status_code=400, detail="Query is required")
+
+    db_file_path = project.get("file_path")
+    db_type = "sqlite" if db_file_path.endswith(".db") else "mysql"
+
+    if db_type != "sqlite":
+        raise HTTPException(status_code=400, detail="Only SQLite is currently supported.")
+
+    async def events():
+        tasks = []
+        try:
+            if not graph:
+                await chat_collection.insert_one({
+                    "id": str(uuid.uuid4()),
+                    "role": "user",
+                    "content": query,
+                    "timestamp": datetime.utcnow(),
+                    "chat_id": chat_id
+                })
+
+            history = [] if graph else await conversation_history(chat_id)
+            steps = []
+            final_sql = None
+            result = None
+            async for step in iter_query_steps(query, db_type, db_file_path, history):
+                steps.append(step)
+                yield sse_event("step", {"id": str(uuid.uuid4()), "step": step["step"],
+                                         "description": template_narration(step), "status": "done"})
+                if step["step"] == "generate_query":
+                    final_sql = step["sql_query"]
+                    yield sse_event("sql", {"sql": final_sql, "cached": step.get("cached", False)})
+                elif step["step"] == "execute_query" and "result" in step:
+                    result = step["result"]
+                    yield sse_event("rows", {
+                        "columns": [{"key": col, "label": col} for col in result["columns"]],
+                        "data": result["data"][:STREAM_FIRST_PAGE_ROWS],
+                        "total_rows": len(result["data"])
+                    })
+            if not result:
+                yield sse_event("error", {"detail": "No result from query execution"})
+                return
+
+            # The chart and the step narration are produced while the explanation streams
+            out_file_name = f"{str(uuid.uuid4())}.png"
+            out_file_path = OUTPUT_FOLDER+"/"+out_file_name
+            visualization_task = asyncio.create_task(
+                timed_await("stage.visualization.seconds", avisualise(result, out_file_path))
+            )
+            narration_task = asyncio.create_task(timed_await("stage.narration.seconds", narrate_steps(steps)))
+            tasks = [visualization_task, narration_task]
+            if not graph:
+                tasks.append(asyncio.create_task(
+                    timed_await("stage.memory.seconds", remember(chat_id, make_turn(query, final_sql, result)))
+                ))
+
+            explanation_parts = []
+            async for token in astream_nl_explanation(query, result):
+                explanation_parts.append(token)
+                yield sse_event("explanation", {"delta": token})
+            explanation = "".join(explanation_parts)
+
+            agentThinking = [
+                {"id": str(uuid.uuid4()), "description": description, "status": "done"}
+                for description in await narration_task
+            ]
+            yield sse_event("steps", {"steps": agentThinking})
+
+            await visualization_task
+            visualization = "http://127.0.0.1:8000/visualization/"+out_file_name
+            yield sse_event("visualization", {"visualization": visualization})
+
+            columns = [{"key": col, "label": col} for col in result["columns"]]
+            result["columns"] = columns
+            if not graph:
+                await tasks[-1]
+                await chat_collection.insert_one({
+                    "id": str(uuid.uuid4()),
+                    "chat_id": chat_id,
+                    "role": "assistant",
+                    "content": explanation,
+                    "timestamp": datetime.utcnow(),
+                    "agentSteps": agentThinking,
+                    "currentStep": len(agentThinking),
+                    "sqlQuery": final_sql,
+                    "explanation": explanation,
+                    "tableData": result["data"],
+                    "tableColumns": columns,
+                    "visualization": visualization,
+                })
+
+            yield sse_event("done", {
+                "steps": agentThinking,
+                "sql": final_sql,
+                "result": result,
+                "explanation": explanation,
+                "visualization": visualization
+            })
+        except Exception as e:
+            print(f"Error streaming query: {e}")
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            # The client may disconnect mid-stream
+            for task in tasks:
+                task.cancel()
+
+    # X-Accel-Buffering stops nginx-style proxies from holding events back
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
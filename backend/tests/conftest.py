@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Stores that default to files under output/ are pointed at a scratch directory before any
+# app module reads its settings
+_scratch = tempfile.mkdtemp(prefix="nl2sql-tests-")
+os.environ.setdefault("QUERY_CACHE_PATH", os.path.join(_scratch, "query_cache.db"))
+os.environ.setdefault("LLM_FIXTURES_PATH", os.path.join(_scratch, "llm_fixtures.db"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,113 @@
+import asyncio
+import copy
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from app.functions import chat_memory
+from app.functions.chat_memory import history_lines, load_memory, make_turn, remember_turn
+
+
+class FakeCollection:
+    """In-memory stand-in for the async chat_memory collection; every call yields to the loop."""
+
+    def __init__(self):
+        self.docs = {}
+        self.conflicts = 0
+
+    async def create_index(self, *args, **kwargs):
+        await asyncio.sleep(0)
+
+    async def find_one(self, query, projection=None):
+        await asyncio.sleep(0)
+        doc = self.docs.get(query["chat_id"])
+        return copy.deepcopy(doc)
+
+    async def replace_one(self, query, doc, upsert=False):
+        await asyncio.sleep(0)
+        current = self.docs.get(query["chat_id"])
+        if current is not None and current["version"] == query["version"]:
+            self.docs[query["chat_id"]] = copy.deepcopy(doc)
+            return SimpleNamespace(matched_count=1, upserted_id=None)
+        if current is None and upsert:
+            self.docs[query["chat_id"]] = copy.deepcopy(doc)
+            return SimpleNamespace(matched_count=0, upserted_id=query["chat_id"])
+        self.conflicts += 1
+        if upsert:
+            # The filter did not match and the unique chat_id index rejects a second document
+            raise DuplicateKeyError("duplicate chat_id")
+        return SimpleNamespace(matched_count=0, upserted_id=None)
+
+
+def turn(i):
+    return make_turn(f"question {i}", f"SELECT {i}", {"columns": ["n"], "data": [{"n": i}]})
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    prompts = []
+
+    async def fake_achat(prompt, **kwargs):
+        prompts.append(prompt)
+        return f"summary {len(prompts)}"
+
+    monkeypatch.setattr(chat_memory, "achat", fake_achat)
+    monkeypatch.setattr(chat_memory, "CHAT_MEMORY_TURNS", 2)
+    return prompts
+
+
+def test_turns_leaving_the_window_are_folded_into_the_summary(summaries):
+    collection = FakeCollection()
+
+    async def run():
+        for i in range(4):
+            await remember_turn(collection, "c1", turn(i))
+        return await load_memory(collection, "c1")
+
+    memory = asyncio.run(run())
+
+    assert [t["question"] for t in memory["turns"]] == ["question 2", "question 3"]
+    assert (memory["summary"], memory["summarized_turns"], memory["version"]) == ("summary 2", 2, 4)
+    # The second summary merges the first one with the newly evicted turn
+    assert "summary 1" in summaries[1] and "question 1" in summaries[1]
+    assert history_lines(memory) == [
+        "Earlier in this conversation: summary 2",
+        "User asked: question 2 -> SQL: SELECT 2 (1 rows: n)",
+        "User asked: question 3 -> SQL: SELECT 3 (1 rows: n)",
+    ]
+
+
+def test_a_failed_summary_falls_back_to_the_evicted_questions(monkeypatch):
+    async def failing_achat(prompt, **kwargs):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(chat_memory, "achat", failing_achat)
+    monkeypatch.setattr(chat_memory, "CHAT_MEMORY_TURNS", 1)
+    collection = FakeCollection()
+
+    async def run():
+        for i in range(2):
+            await remember_turn(collection, "c1", turn(i))
+        return await load_memory(collection, "c1")
+
+    memory = asyncio.run(run())
+
+    assert memory["summary"] == "The user asked: question 0"
+    assert [t["question"] for t in memory["turns"]] == ["question 1"]
+
+
+def test_concurrent_turns_on_one_chat_are_all_kept(summaries, monkeypatch):
+    monkeypatch.setattr(chat_memory, "CHAT_MEMORY_TURNS", 10)
+    collection = FakeCollection()
+
+    async def run():
+        await asyncio.gather(*(remember_turn(collection, "c1", turn(i)) for i in range(3)))
+        return await load_memory(collection, "c1")
+
+    memory = asyncio.run(run())
+
+    assert sorted(t["question"] for t in memory["turns"]) == ["question 0", "question 1", "question 2"]
+    assert memory["version"] == 3
+    # The writers did race: stale writes were rejected and retried rather than overwriting
+    assert collection.conflicts > 0
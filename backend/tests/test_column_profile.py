@@ -0,0 +1,72 @@
+import sqlite3
+
+from app.functions import column_profile
+from app.functions.column_profile import describe_profile, profile_table
+
+COLUMNS = [{"name": "id", "type": "INTEGER"}, {"name": "city", "type": "TEXT"}, {"name": "price", "type": "REAL"}]
+
+
+def make_table(rows):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER, city TEXT, price REAL)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?)", rows)
+    return conn
+
+
+def test_small_tables_are_profiled_exactly():
+    conn = make_table([(i, ["Berlin", "Paris", "Paris", None][i % 4], i / 2) for i in range(100)])
+
+    row_count, profile = profile_table(conn, "t", COLUMNS)
+
+    assert row_count == 100
+    city = profile["city"]
+    assert (city["nulls"], city["null_fraction"], city["distinct"], city["distinct_estimated"]) == (25, 0.25, 2, False)
+    assert city["top"] == [["Paris", 50], ["Berlin", 25]]
+    assert (city["min"], city["max"]) == ("Berlin", "Paris")
+    # Unique and continuous columns list no frequent values
+    assert profile["id"]["top"] == [] and profile["id"]["distinct"] == 100
+    assert profile["price"]["top"] == [] and profile["price"]["max"] == 49.5
+    assert describe_profile({"city": city}) == ["city: 25% null, 2 distinct, top 'Paris' (50), 'Berlin' (25)"]
+
+
+def test_large_tables_estimate_distinct_values_from_a_sample(monkeypatch):
+    monkeypatch.setattr(column_profile, "EXACT_DISTINCT_ROWS", 1000)
+    monkeypatch.setattr(column_profile, "PROFILE_SAMPLE_ROWS", 500)
+    # Batch-loaded categories: the first 500 rows only ever hold c0
+    conn = make_table([(i, f"c{i // 500}", None) for i in range(5000)])
+
+    row_count, profile = profile_table(conn, "t", COLUMNS)
+
+    # Counts, nulls and ranges still cover the whole table
+    assert row_count == 5000
+    assert (profile["id"]["min"], profile["id"]["max"]) == (0, 4999)
+    assert profile["price"]["nulls"] == 5000 and profile["price"]["distinct"] == 0
+    city = profile["city"]
+    assert (city["distinct"], city["distinct_estimated"]) == (10, True)
+    assert city["top"][:2] == [["c0", 500], ["c1", 500]]
+    # Every sampled id is unique: the estimate scales up to the table size
+    assert profile["id"]["distinct"] == 5000 and profile["id"]["distinct_estimated"]
+
+
+def test_empty_tables_have_empty_profiles():
+    row_count, profile = profile_table(make_table([]), "t", COLUMNS)
+
+    assert row_count == 0
+    assert profile["city"] == {
+        "affinity": "TEXT", "nulls": 0, "null_fraction": 0.0, "distinct": 0, "distinct_estimated": False,
+        "min": None, "max": None, "top": [],
+    }
+
+
+def test_without_rowid_tables_are_sampled_from_a_prefix(monkeypatch):
+    monkeypatch.setattr(column_profile, "EXACT_DISTINCT_ROWS", 100)
+    monkeypatch.setattr(column_profile, "PROFILE_SAMPLE_ROWS", 50)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, city TEXT, price REAL) WITHOUT ROWID")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?)", [(i, f"c{i % 5}", 1.0) for i in range(1000)])
+
+    row_count, profile = profile_table(conn, "t", COLUMNS)
+
+    assert row_count == 1000
+    assert profile["city"]["distinct"] == 5 and profile["city"]["distinct_estimated"]
+    assert profile["city"]["top"][0] == ["c0", 200]
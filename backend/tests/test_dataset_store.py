@@ -0,0 +1,32 @@
+import os
+
+from app.functions.dataset_store import upload_hash, publish_file
+
+
+def test_upload_hash_keeps_table_naming_file_names_apart():
+    content = "a" * 64
+    assert upload_hash("sales.csv", content) != upload_hash("q3.csv", content)
+    assert upload_hash("sales.parquet", content) != upload_hash("q3.parquet", content)
+    assert upload_hash("sales.csv", content) != upload_hash("sales.parquet", content)
+
+
+def test_upload_hash_ignores_names_that_do_not_name_tables():
+    content = "b" * 64
+    assert upload_hash("export.json", content) == upload_hash("other.JSON", content)
+    assert upload_hash("a.db", content) == upload_hash("dir/b.db", content)
+    assert upload_hash("data.csv", content) == upload_hash("uploads/data.CSV", content)
+    assert upload_hash("data.csv", content) != upload_hash("data.csv", "c" * 64)
+
+
+def test_publish_file_keeps_the_first_copy(tmp_path):
+    target = tmp_path / "dataset.db"
+    first = tmp_path / "first.part"
+    second = tmp_path / "second.part"
+    first.write_bytes(b"first")
+    second.write_bytes(b"second")
+
+    assert publish_file(str(first), str(target)) is True
+    assert publish_file(str(second), str(target)) is False
+    assert target.read_bytes() == b"first"
+    assert not first.exists() and not second.exists()
+    assert sorted(os.listdir(tmp_path)) == ["dataset.db"]
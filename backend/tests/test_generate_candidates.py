@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from app.functions import generate_sql
+from app.functions.generate_sql import generate_candidates
+
+
+def fake_generation(monkeypatch, replies, valid):
+    """Each temperature answers after its delay; only the SQL in `valid` validates."""
+    state = {"started": [], "cancelled": []}
+
+    async def fake_generate_sql(inp, temperature):
+        state["started"].append(temperature)
+        delay, sql = replies[temperature]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            state["cancelled"].append(temperature)
+            raise
+        if isinstance(sql, Exception):
+            raise sql
+        return sql
+
+    def fake_validate_sql(db_url, catalog, sql):
+        ok = sql in valid
+        return {"ok": ok, "error": None if ok else f"bad: {sql}", "warnings": [], "plan": []}
+
+    monkeypatch.setattr(generate_sql, "generate_sql", fake_generate_sql)
+    monkeypatch.setattr(generate_sql, "validate_sql", fake_validate_sql)
+    return state
+
+
+def test_first_valid_candidate_wins_and_the_rest_are_cancelled(monkeypatch):
+    state = fake_generation(monkeypatch, {
+        0.2: (0.05, "SELECT bad"),
+        0.5: (0.1, "```sql\nSELECT 1\n```"),
+        0.8: (5, "SELECT 2"),
+    }, valid={"SELECT 1", "SELECT 2"})
+
+    async def run():
+        result = await generate_candidates({}, "db", {}, n=3)
+        # Let the cancellation reach the slow request before the loop shuts down
+        await asyncio.sleep(0.01)
+        return result, list(state["cancelled"])
+
+    (sql, validation, tried), cancelled = asyncio.run(run())
+
+    assert (sql, validation["ok"], tried) == ("SELECT 1", True, 2)
+    assert sorted(state["started"]) == [0.2, 0.5, 0.8]
+    assert cancelled == [0.8]
+
+
+def test_first_generated_candidate_is_returned_when_none_validates(monkeypatch):
+    fake_generation(monkeypatch, {
+        0.2: (0.1, "SELECT late"),
+        0.5: (0.01, RuntimeError("rate limited")),
+        0.8: (0.05, "SELECT early"),
+    }, valid=set())
+
+    sql, validation, tried = asyncio.run(generate_candidates({}, "db", {}, n=3))
+
+    assert (sql, validation["ok"], validation["error"], tried) == ("SELECT early", False, "bad: SELECT early", 2)
+
+
+def test_every_candidate_failing_is_an_error(monkeypatch):
+    fake_generation(monkeypatch, {0.2: (0, RuntimeError("down"))}, valid=set())
+
+    with pytest.raises(RuntimeError, match="Every SQL candidate request failed"):
+        asyncio.run(generate_candidates({}, "db", {}, n=1))
@@ -0,0 +1,131 @@
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.functions import ingest
+from app.functions.ingest import load_excel_to_sqlite, load_parquet_to_sqlite
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+openpyxl = pytest.importorskip("openpyxl")
+
+
+def column_types(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[1]: row[2] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+    finally:
+        conn.close()
+
+
+def query(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_parquet_types_come_from_the_schema(tmp_path):
+    source = tmp_path / "in.parquet"
+    table = pa.table({
+        "id": pa.array([1, 2, 3], pa.int64()),
+        "price": pa.array([1.5, None, 3.0], pa.float64()),
+        "amount": pa.array([Decimal("1.25"), Decimal("2.50"), None], pa.decimal128(5, 2)),
+        "day": pa.array([date(2024, 1, 31), None, date(2024, 3, 1)], pa.date32()),
+        "at": pa.array([datetime(2024, 1, 31, 10, 0), None, None], pa.timestamp("s")),
+        "flag": pa.array([True, False, None]),
+        "tag": pa.array(["a", "b", "a"]).dictionary_encode(),
+        "items": pa.array([[1, 2], [], None], pa.list_(pa.int64())),
+    })
+    pq.write_table(table, source, row_group_size=2)
+    path = str(tmp_path / "out.db")
+    batches = []
+
+    stats = load_parquet_to_sqlite(str(source), path, "t", batch_size=2, progress=batches.append)
+
+    assert stats["rows"] == 3
+    assert batches == [2, 3]
+    assert stats["columns"] == {
+        "id": "INTEGER", "price": "REAL", "amount": "REAL", "day": "DATE", "at": "DATETIME",
+        "flag": "INTEGER", "tag": "TEXT", "items": "TEXT",
+    }
+    assert column_types(path, "t")["id"] == "INTEGER"
+    assert query(path, "SELECT * FROM t ORDER BY id") == [
+        (1, 1.5, 1.25, "2024-01-31", "2024-01-31 10:00:00", 1, "a", "[1, 2]"),
+        (2, None, 2.5, None, None, 0, "b", "[]"),
+        (3, 3.0, None, "2024-03-01", None, None, "a", None),
+    ]
+
+
+def test_parquet_duplicate_column_names_are_renamed(tmp_path):
+    source = tmp_path / "in.parquet"
+    pq.write_table(pa.Table.from_arrays([pa.array([1]), pa.array([2])], names=["id", "ID"]), source)
+    path = str(tmp_path / "out.db")
+
+    stats = load_parquet_to_sqlite(str(source), path, "t")
+
+    assert list(stats["columns"]) == ["id", "ID_1"]
+    assert query(path, "SELECT * FROM t") == [(1, 2)]
+
+
+def test_excel_loads_each_sheet_as_a_typed_table(tmp_path):
+    source = tmp_path / "in.xlsx"
+    workbook = openpyxl.Workbook()
+    sales = workbook.active
+    sales.title = "sales"
+    sales.append(["id", "price", "day", "at", "note"])
+    sales.append([1, 2.5, datetime(2024, 1, 31), datetime(2024, 1, 31, 10, 30), "a"])
+    sales.append([2.0, 3, datetime(2024, 2, 1), datetime(2024, 2, 1, 11, 0), 7])
+    sales.append([None, None, None, None, None])
+    sales.append([3, None, datetime(2024, 2, 2), None, None])
+    workbook.create_sheet("empty")
+    people = workbook.create_sheet("people")
+    people.append(["name", "name"])
+    people.append(["x", "y"])
+    workbook.save(source)
+    path = str(tmp_path / "out.db")
+
+    stats = load_excel_to_sqlite(str(source), path, chunk_size=2)
+
+    assert stats["tables"] == {"sales": 3, "people": 1}
+    assert stats["columns"]["sales"] == {
+        "id": "INTEGER", "price": "REAL", "day": "DATE", "at": "DATETIME", "note": "TEXT"
+    }
+    assert stats["columns"]["people"] == {"name": "TEXT", "name_1": "TEXT"}
+    assert query(path, "SELECT * FROM sales ORDER BY id") == [
+        (1, 2.5, "2024-01-31", "2024-01-31 10:30:00", "a"),
+        (2, 3.0, "2024-02-01", "2024-02-01 11:00:00", "7"),
+        (3, None, "2024-02-02", None, None),
+    ]
+    assert query(path, "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name") == [
+        ("people",), ("sales",)
+    ]
+
+
+def test_excel_values_that_do_not_fit_the_inferred_type_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "INFER_SAMPLE_ROWS", 2)
+    source = tmp_path / "in.xlsx"
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "t"
+    for row in (["n"], [1], [2], ["abc"], [4]):
+        sheet.append(row)
+    workbook.save(source)
+    path = str(tmp_path / "out.db")
+
+    stats = load_excel_to_sqlite(str(source), path, chunk_size=2)
+
+    assert stats["rejected"] == 1
+    assert stats["rejects"] == [{"table": "t", "row": 3, "column": "n", "value": "abc", "expected": "INTEGER"}]
+    assert query(path, "SELECT n FROM t") == [(1,), (2,), (None,), (4,)]
+
+
+def test_excel_workbook_without_data_is_an_error(tmp_path):
+    source = tmp_path / "in.xlsx"
+    openpyxl.Workbook().save(source)
+
+    with pytest.raises(ValueError):
+        load_excel_to_sqlite(str(source), str(tmp_path / "out.db"))
@@ -0,0 +1,76 @@
+import io
+import sqlite3
+
+from app.functions import ingest
+from app.functions.ingest import load_csv_to_sqlite
+
+
+def load(tmp_path, text, **kwargs):
+    path = str(tmp_path / "out.db")
+    stats = load_csv_to_sqlite(io.StringIO(text), path, "t", **kwargs)
+    conn = sqlite3.connect(path)
+    try:
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 't'").fetchone()[0]
+        rows = conn.execute("SELECT * FROM t").fetchall()
+    finally:
+        conn.close()
+    return stats, sql, rows
+
+
+def test_csv_columns_are_typed_from_their_values(tmp_path):
+    text = (
+        "id,price,zip,day,at,name\n"
+        "1,2.5,02134,2024-01-31,2024-01-31T10:00:00,a\n"
+        "2,3,10001,2024-02-01,2024-02-01 11:30:00,b\n"
+    )
+    stats, sql, rows = load(tmp_path, text)
+
+    assert stats["columns"] == {
+        "id": "INTEGER", "price": "REAL", "zip": "TEXT", "day": "DATE", "at": "DATETIME", "name": "TEXT"
+    }
+    if ingest.STRICT_SUFFIX:
+        assert sql.rstrip().endswith("STRICT")
+    assert rows == [
+        (1, 2.5, "02134", "2024-01-31", "2024-01-31 10:00:00", "a"),
+        (2, 3.0, "10001", "2024-02-01", "2024-02-01 11:30:00", "b"),
+    ]
+
+
+def test_csv_null_tokens_and_short_rows_load_as_null(tmp_path):
+    stats, _, rows = load(tmp_path, "a,b,c\n1,NA,x\nnull,2\n")
+
+    assert stats["columns"] == {"a": "INTEGER", "b": "INTEGER", "c": "TEXT"}
+    assert stats["rejected"] == 0
+    assert rows == [(1, None, "x"), (None, 2, None)]
+
+
+def test_csv_values_that_do_not_fit_the_inferred_type_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "INFER_SAMPLE_ROWS", 2)
+    stats, _, rows = load(tmp_path, "n\n1\n2\n3\nabc\n5\n", chunk_size=2)
+
+    assert stats["columns"] == {"n": "INTEGER"}
+    assert stats["rows"] == 5
+    assert stats["rejected"] == 1
+    assert stats["rejects"] == [{"row": 4, "column": "n", "value": "abc", "expected": "INTEGER"}]
+    assert rows == [(1,), (2,), (3,), (None,), (5,)]
+
+
+def test_csv_duplicate_and_blank_headers_are_renamed(tmp_path):
+    stats, _, _ = load(tmp_path, "id,id,,name,id\n1,2,3,a,4\n")
+
+    assert list(stats["columns"]) == ["id", "id_1", "column_3", "name", "id_2"]
+
+
+def test_csv_header_collisions_are_renamed_case_insensitively(tmp_path):
+    stats, _, _ = load(tmp_path, "id,id,id_1,Name,name\n1,2,3,a,b\n")
+
+    assert list(stats["columns"]) == ["id", "id_1", "id_1_1", "Name", "name_1"]
+
+
+def test_csv_byte_order_mark_is_not_part_of_the_first_column(tmp_path):
+    csv_path = tmp_path / "export.csv"
+    csv_path.write_bytes("\ufeffid,name\n1,a\n".encode("utf-8"))
+
+    stats = load_csv_to_sqlite(str(csv_path), str(tmp_path / "out.db"), "t")
+
+    assert list(stats["columns"]) == ["id", "name"]
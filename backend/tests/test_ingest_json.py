@@ -0,0 +1,73 @@
+import io
+import json
+import sqlite3
+
+import pytest
+
+from app.functions.ingest import _JsonStream, load_json_to_sqlite
+
+
+def column_types(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[1]: row[2] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+    finally:
+        conn.close()
+
+
+def query(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("read_size", [1, 3, 7, 1024])
+def test_json_stream_decodes_values_across_buffer_boundaries(read_size):
+    document = {"a": 1234567, "b": [1.5e10, -0.25, "x\"y\\u00e9", None, True], "c": {"d": [{}, []]}}
+    reader = _JsonStream(io.StringIO(json.dumps(document, indent=1)), read_size=read_size)
+    decoded = {}
+    for key in reader.items():
+        if key == "b":
+            decoded[key] = list(reader.elements())
+        else:
+            decoded[key] = reader.read_value()
+    assert decoded == document
+
+
+def test_json_stream_rejects_malformed_documents():
+    reader = _JsonStream(io.StringIO('{"a": 1 "b": 2}'), read_size=4)
+    with pytest.raises(ValueError):
+        for _ in reader.items():
+            reader.read_value()
+
+
+def test_load_json_streams_rows_into_declared_tables(tmp_path):
+    document = {
+        "schema": {"orders": [{"name": "id", "type": "INTEGER", "nullable": False}, {"name": "total", "type": "REAL"}]},
+        "data": {"orders": [{"id": 1, "total": "2.5"}, {"total": 3, "id": 2}, {"id": 3, "note": {"k": "v"}}]},
+    }
+    path = str(tmp_path / "out.db")
+    stats = load_json_to_sqlite(io.StringIO(json.dumps(document)), path, batch_size=2)
+
+    assert stats["tables"] == {"orders": 3}
+    assert column_types(path, "orders") == {"id": "INTEGER", "total": "REAL", "note": ""}
+    assert query(path, "SELECT id, total, typeof(total), note FROM orders ORDER BY id") == [
+        (1, 2.5, "real", None), (2, 3.0, "real", None), (3, None, "null", '{"k": "v"}')
+    ]
+
+
+def test_load_json_applies_a_schema_that_follows_the_data(tmp_path):
+    document = {
+        "data": {"orders": [{"id": "1", "total": "2.5", "extra": "x"}, {"id": "2", "total": "4"}]},
+        "schema": {"orders": [{"name": "id", "type": "INTEGER"}, {"name": "total", "type": "REAL"}]},
+    }
+    path = str(tmp_path / "out.db")
+    load_json_to_sqlite(io.StringIO(json.dumps(document)), path)
+
+    assert column_types(path, "orders") == {"id": "INTEGER", "total": "REAL", "extra": ""}
+    assert query(path, "SELECT id, typeof(id), total, typeof(total), extra FROM orders ORDER BY id") == [
+        (1, "integer", 2.5, "real", "x"), (2, "integer", 4.0, "real", None)
+    ]
+    assert query(path, "SELECT name FROM sqlite_master WHERE type = 'table'") == [("orders",)]
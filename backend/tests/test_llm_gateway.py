@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+
+from app.functions import llm_gateway
+from app.functions.gen_ai import generate_relevant_prompts
+from app.functions.llm_fixtures import ReplayMiss, fixture_key
+
+
+class Answer(BaseModel):
+    items: List[str]
+
+
+class Other(BaseModel):
+    items: List[int]
+
+
+class FakeOpenAI:
+    """Stands in for the OpenAI client: returns canned completions and counts calls."""
+
+    def __init__(self, text="", parsed=None):
+        self.calls = 0
+        self.params = None
+
+        def create(**params):
+            self.calls += 1
+            self.params = params
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+        def parse(**params):
+            self.calls += 1
+            message = SimpleNamespace(parsed=parsed, refusal=None)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+        self.beta = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(parse=parse)))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def install(fake):
+        monkeypatch.setitem(llm_gateway._clients, "openai", fake)
+        return fake
+    return install
+
+
+def test_chat_replays_recorded_completions_with_new_uuids(client, monkeypatch):
+    fake = client(FakeOpenAI(text="saved to out/11111111-2222-3333-4444-555555555555.png"))
+    prompt = "save to out/11111111-2222-3333-4444-555555555555.png"
+    monkeypatch.setattr(llm_gateway, "LLM_MODE", "record")
+    llm_gateway.chat(prompt)
+
+    monkeypatch.setattr(llm_gateway, "LLM_MODE", "replay")
+    replayed = llm_gateway.chat("save to out/aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee.png")
+
+    assert replayed == "saved to out/aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee.png"
+    assert fake.calls == 1
+    with pytest.raises(ReplayMiss):
+        llm_gateway.chat("a prompt that was never recorded")
+
+
+def test_max_tokens_is_sent_and_keys_the_recording(client, monkeypatch):
+    fake = client(FakeOpenAI(text="A short answer."))
+    monkeypatch.setattr(llm_gateway, "LLM_MODE", "record")
+    llm_gateway.chat("Summarise the data", max_tokens=100, temperature=0.5)
+
+    assert fake.params["max_tokens"] == 100
+    monkeypatch.setattr(llm_gateway, "LLM_MODE", "replay")
+    assert llm_gateway.chat("Summarise the data", max_tokens=100, temperature=0.5) == "A short answer."
+    with pytest.raises(ReplayMiss):
+        llm_gateway.chat("Summarise the data", temperature=0.5)
+    # Requests without a limit keep the keys they were recorded under before
+    assert fixture_key("openai", "m", "p", 0.5, None, None, None) == fixture_key("openai", "m", "p", 0.5, None)
+    assert "max_tokens" not in llm_gateway._openai_params("p", "m", None, None)
+
+
+def test_structured_output_is_recorded_and_replayed(client, monkeypatch):
+    fake = client(FakeOpenAI(parsed=Answer(items=["a", "b"])))
+    monkeypatch.setattr(llm_gateway, "LLM_MODE", "record")
+    assert llm_gateway.parse("list things", Answer, temperature=0.3) == Answer(items=["a", "b"])
+
+    monkeypatch.setattr(llm_gateway, "LLM_MODE", "replay")
+    assert llm_gateway.parse("list things", Answer, temperature=0.3) == Answer(items=["a", "b"])
+    assert fake.calls == 1
+    # The response format is part of the key
+    with pytest.raises(ReplayMiss):
+        llm_gateway.parse("list things", Other, temperature=0.3)
+
+
+def test_replay_misses_are_not_swallowed(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_MODE", "replay")
+
+    with pytest.raises(ReplayMiss):
+        llm_gateway.call("openai", lambda: None)
+    with pytest.raises(ReplayMiss):
+        generate_relevant_prompts("sales by region", {"sales": [{"name": "region", "type": "TEXT"}]})
@@ -0,0 +1,62 @@
+import sqlite3
+
+from app.functions.ingest import merge_databases
+
+
+def make_part(path, statements):
+    conn = sqlite3.connect(path)
+    conn.executescript(";\n".join(statements))
+    conn.close()
+    return str(path)
+
+
+def test_merge_renames_colliding_tables_and_keeps_their_objects(tmp_path):
+    first = make_part(tmp_path / "a.db", [
+        "CREATE TABLE sales (id INTEGER PRIMARY KEY, amount REAL)",
+        "INSERT INTO sales VALUES (1, 2.5), (2, 4.0)",
+        "CREATE INDEX sales_amount ON sales (amount)",
+    ])
+    second = make_part(tmp_path / "b.db", [
+        "CREATE TABLE sales (id INTEGER PRIMARY KEY, region TEXT)",
+        "INSERT INTO sales VALUES (1, 'north')",
+        "CREATE TABLE regions (name TEXT)",
+        "CREATE VIEW north AS SELECT * FROM sales WHERE region = 'north'",
+    ])
+    merged = str(tmp_path / "merged.db")
+
+    table_rows = merge_databases([first, second], merged)
+
+    assert table_rows == {"sales": 2, "sales_2": 1, "regions": 0}
+    conn = sqlite3.connect(merged)
+    try:
+        objects = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'"))
+        assert objects == {
+            "sales": "table", "sales_amount": "index", "sales_2": "table", "regions": "table", "north": "view"
+        }
+        assert conn.execute("SELECT region FROM sales_2").fetchall() == [("north",)]
+        # The view follows its table's rename
+        assert conn.execute("SELECT id, region FROM north").fetchall() == [(1, "north")]
+    finally:
+        conn.close()
+
+
+def test_merge_rename_skips_names_taken_in_the_same_part(tmp_path):
+    first = make_part(tmp_path / "a.db", ["CREATE TABLE sales (id INTEGER)", "INSERT INTO sales VALUES (1)"])
+    second = make_part(tmp_path / "b.db", [
+        "CREATE TABLE sales (id INTEGER)",
+        "CREATE TABLE sales_2 (id INTEGER)",
+        "INSERT INTO sales VALUES (2)",
+        "INSERT INTO sales_2 VALUES (3)",
+    ])
+    merged = str(tmp_path / "merged.db")
+
+    table_rows = merge_databases([first, second], merged)
+
+    assert sorted(table_rows) == ["sales", "sales_2", "sales_3"]
+    conn = sqlite3.connect(merged)
+    try:
+        assert conn.execute("SELECT id FROM sales").fetchall() == [(1,)]
+        assert conn.execute("SELECT id FROM sales_2").fetchall() == [(3,)]
+        assert conn.execute("SELECT id FROM sales_3").fetchall() == [(2,)]
+    finally:
+        conn.close()
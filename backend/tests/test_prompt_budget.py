@@ -0,0 +1,51 @@
+from app.functions.prompt_budget import build_sql_prompt_context, count_tokens, render_result
+
+
+def make_cached(rows=5):
+    columns = [{"name": "id", "type": "INTEGER"}, {"name": "note", "type": "TEXT"}]
+    samples = [{"id": i, "note": f"note number {i} " * 5} for i in range(rows)]
+    return {
+        "catalog": {"tables": {"t": {"columns": columns, "samples": samples, "profile": {}, "row_count": rows}}},
+        "table_infos": {"t": "CREATE TABLE t (id INTEGER, note TEXT)\n/* stats */"},
+        "table_schemas": {"t": "CREATE TABLE t (id INTEGER, note TEXT)"},
+    }
+
+
+def test_sql_prompt_tokens_cover_the_rendered_prompt():
+    template = "Answer in SQL.\n" + "instruction " * 200 + "\n{table_info}\n{sample_data}\n{history}"
+    render = lambda parts: template.format(**parts)
+
+    context = build_sql_prompt_context(make_cached(), ["t"], ["User asked: a"], "", render=render, budget=100000)
+
+    prompt = render({key: context[key] for key in ("table_info", "sample_data", "history")})
+    assert context["tokens"] == count_tokens(prompt)
+    assert context["reductions"] == []
+
+
+def test_sql_prompt_template_counts_against_the_budget():
+    cached = make_cached()
+    parts_only = build_sql_prompt_context(cached, ["t"], [], "", budget=100000)["tokens"]
+    template = "instruction " * 200 + "{table_info}{sample_data}{history}"
+
+    context = build_sql_prompt_context(
+        cached, ["t"], [], "", render=lambda parts: template.format(**parts), budget=parts_only + 100
+    )
+
+    # The context alone would fit; with the template it has to shrink
+    assert context["reductions"]
+
+
+def test_render_result_is_capped_by_rows_and_tokens():
+    result = {"columns": ["id", "name"], "data": [{"id": i, "name": f"name {i}"} for i in range(100)]}
+
+    text = render_result(result, max_rows=10)
+    assert text.splitlines()[0].split(" | ")[0].strip() == "id"
+    assert len(text.splitlines()) == 12
+    assert text.endswith("... 90 more rows (100 in total)")
+
+    text = render_result(result, max_rows=100, budget=60)
+    assert count_tokens(text) <= 60
+    assert "more rows (100 in total)" in text
+
+    assert render_result({"error": "no such table"}) == "Error: no such table"
+    assert render_result({"columns": [], "data": []}) == "(no rows)"
@@ -0,0 +1,77 @@
+import pytest
+
+from app.functions import query_cache
+from app.functions.query_cache import (
+    drop_cached_sql, get_cached_sql, invalidate_query_cache, is_follow_up, put_cached_sql,
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    invalidate_query_cache()
+    yield
+    invalidate_query_cache()
+
+
+def test_hit_after_put_with_normalized_question(tmp_path):
+    db = str(tmp_path / "a.db")
+    assert get_cached_sql("How many orders?", db, "s1") is None
+
+    put_cached_sql("How many orders?", db, "s1", "SELECT COUNT(*) FROM orders")
+
+    assert get_cached_sql("  how many   ORDERS ", db, "s1") == "SELECT COUNT(*) FROM orders"
+    assert get_cached_sql("How many orders?", str(tmp_path / "b.db"), "s1") is None
+
+
+def test_schema_change_purges_older_entries(tmp_path):
+    db = str(tmp_path / "a.db")
+    put_cached_sql("How many orders?", db, "s1", "SELECT 1")
+
+    assert get_cached_sql("How many orders?", db, "s2") is None
+    assert get_cached_sql("How many orders?", db, "s1") is None
+
+
+def test_expired_entries_miss(tmp_path, monkeypatch):
+    db = str(tmp_path / "a.db")
+    put_cached_sql("How many orders?", db, "s1", "SELECT 1")
+    monkeypatch.setattr(query_cache, "QUERY_CACHE_TTL", -1)
+
+    assert get_cached_sql("How many orders?", db, "s1") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    db = str(tmp_path / "a.db")
+    monkeypatch.setattr(query_cache, "QUERY_CACHE_MAX_ENTRIES", 2)
+    put_cached_sql("first question here", db, "s1", "SELECT 1")
+    put_cached_sql("second question here", db, "s1", "SELECT 2")
+    assert get_cached_sql("first question here", db, "s1") == "SELECT 1"
+
+    put_cached_sql("third question here", db, "s1", "SELECT 3")
+
+    assert get_cached_sql("second question here", db, "s1") is None
+    assert get_cached_sql("first question here", db, "s1") == "SELECT 1"
+    assert get_cached_sql("third question here", db, "s1") == "SELECT 3"
+
+
+def test_follow_ups_are_keyed_on_the_turn_they_continue(tmp_path):
+    db = str(tmp_path / "a.db")
+    put_cached_sql("and last year?", db, "s1", "SELECT 2023", history="User asked: sales in 2024")
+
+    assert get_cached_sql("and last year?", db, "s1", history="User asked: sales in 2024") == "SELECT 2023"
+    assert get_cached_sql("and last year?", db, "s1", history="User asked: orders in 2024") is None
+
+    drop_cached_sql("and last year?", db, "s1", history="User asked: sales in 2024")
+    assert get_cached_sql("and last year?", db, "s1", history="User asked: sales in 2024") is None
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("and last year?", True),
+    ("only the active ones", True),
+    ("What about customers in Berlin?", True),
+    ("Show the same breakdown by region", True),
+    ("Sort those by revenue descending", True),
+    ("How many orders were placed in March 2024?", False),
+    ("List the ten customers with the highest total revenue", False),
+])
+def test_is_follow_up(question, expected):
+    assert is_follow_up(question) is expected
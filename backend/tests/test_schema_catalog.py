@@ -0,0 +1,55 @@
+import os
+import sqlite3
+
+from app.functions import schema_catalog
+from app.functions.schema_catalog import catalog_path_for, get_catalog, invalidate_catalog
+
+
+def make_db(path, statements):
+    conn = sqlite3.connect(path)
+    conn.executescript(";\n".join(statements))
+    conn.close()
+    return str(path)
+
+
+def test_catalog_is_built_once_and_reused(tmp_path, monkeypatch):
+    db_path = make_db(tmp_path / "shop.db", [
+        "CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT NOT NULL)",
+        "INSERT INTO customers VALUES (1, 'ada'), (2, 'bob')",
+    ])
+    catalog = get_catalog(db_path)
+
+    assert os.path.exists(catalog_path_for(db_path))
+    assert catalog["tables"]["customers"]["row_count"] == 2
+    assert catalog["tables"]["customers"]["primary_key"] == ["id"]
+    assert [c["nullable"] for c in catalog["tables"]["customers"]["columns"]] == [True, False]
+
+    # Served from memory, then from the sidecar, without introspecting the database again
+    monkeypatch.setattr(schema_catalog, "build_catalog", lambda path: (_ for _ in ()).throw(AssertionError(path)))
+    assert get_catalog(db_path) is catalog
+    invalidate_catalog(db_path)
+    assert get_catalog(db_path) == catalog
+
+
+def test_catalog_is_rebuilt_when_the_database_changes(tmp_path):
+    db_path = make_db(tmp_path / "shop.db", ["CREATE TABLE customers (id INTEGER)"])
+    first = get_catalog(db_path)
+
+    make_db(db_path, ["CREATE TABLE orders (id INTEGER, total REAL)", "INSERT INTO orders VALUES (1, 2.5)"])
+    # Same size and mtime would be indistinguishable; make the change visible to the stamp
+    st = os.stat(db_path)
+    os.utime(db_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    second = get_catalog(db_path)
+
+    assert sorted(second["tables"]) == ["customers", "orders"]
+    assert second["tables"]["orders"]["row_count"] == 1
+    assert second["schema_hash"] != first["schema_hash"]
+
+
+def test_invalidate_catalog_can_remove_the_sidecar(tmp_path):
+    db_path = make_db(tmp_path / "shop.db", ["CREATE TABLE customers (id INTEGER)"])
+    get_catalog(db_path)
+
+    invalidate_catalog(db_path, remove_file=True)
+
+    assert not os.path.exists(catalog_path_for(db_path))
@@ -0,0 +1,105 @@
+import io
+import sqlite3
+
+import pytest
+
+from app.functions.sql_dump import iter_sql_statements, translate_statement
+
+
+def split(text, read_size=1024):
+    return list(iter_sql_statements(io.StringIO(text), read_size=read_size))
+
+
+SCRIPT = (
+    "-- MySQL dump header\n"
+    "/*!40101 SET NAMES utf8mb4 */;\n"
+    "CREATE TABLE `a;b` (`x` int, `it``s` text);\n"
+    "# a hash comment; with a delimiter\n"
+    "INSERT INTO `a;b` VALUES (1,'semi;colon'),(2,'it\\'s'),(3,'it''s'),(4,\"dq;\");\n"
+    "/* block; comment */ INSERT INTO `a;b` VALUES (5,'back\\\\slash');\n"
+    "DELIMITER $$\n"
+    "CREATE TRIGGER t BEFORE INSERT ON x FOR EACH ROW BEGIN SET @a = 1; END$$\n"
+    "DELIMITER ;\n"
+    "SELECT 1;\n"
+    "SELECT 2"
+)
+EXPECTED = [
+    "CREATE TABLE `a;b` (`x` int, `it``s` text)",
+    "INSERT INTO `a;b` VALUES (1,'semi;colon'),(2,'it\\'s'),(3,'it''s'),(4,\"dq;\")",
+    "INSERT INTO `a;b` VALUES (5,'back\\\\slash')",
+    "CREATE TRIGGER t BEFORE INSERT ON x FOR EACH ROW BEGIN SET @a = 1; END",
+    "SELECT 1",
+    "SELECT 2",
+]
+
+
+def test_statements_split_on_delimiters_outside_quotes_and_comments():
+    assert split(SCRIPT) == EXPECTED
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 3, 5, 7])
+def test_tokens_split_across_reads_are_recognised(read_size):
+    assert split(SCRIPT, read_size=read_size) == EXPECTED
+
+
+def test_unterminated_string_is_an_error():
+    with pytest.raises(ValueError):
+        split("INSERT INTO t VALUES ('open);\n")
+
+
+def test_insert_escapes_are_converted_to_sqlite():
+    kind, sql, _ = translate_statement(
+        "INSERT INTO `t` VALUES (1,'it\\'s'),(2,'it''s'),(3,'a\\nb'),(4,0x4142),(5,_binary 'z')"
+    )
+
+    assert kind == "insert"
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER, v)")
+    conn.execute(sql)
+    assert conn.execute("SELECT v FROM t ORDER BY id").fetchall() == [
+        ("it's",), ("it's",), ("a\nb",), (b"AB",), ("z",)
+    ]
+
+
+def test_insert_ignore_and_on_duplicate_key_update():
+    assert translate_statement("INSERT IGNORE INTO t VALUES (1)")[1] == "INSERT OR IGNORE INTO t VALUES (1)"
+    kind, sql, _ = translate_statement(
+        "INSERT INTO t VALUES (1,'a'),(2,'b') ON DUPLICATE KEY UPDATE v = VALUES(v)"
+    )
+    assert kind == "insert"
+    assert sql == "INSERT OR REPLACE INTO t VALUES (1,'a'),(2,'b')"
+
+
+def test_session_and_trigger_statements_are_skipped():
+    assert translate_statement("SET NAMES utf8mb4") == ("skip", None, [])
+    assert translate_statement("LOCK TABLES `t` WRITE")[0] == "skip"
+    assert translate_statement("CREATE TRIGGER t BEFORE INSERT ON x FOR EACH ROW SET @a = 1")[0] == "skip"
+
+
+def test_create_table_is_translated_with_deferred_indexes():
+    kind, sql, indexes = translate_statement(
+        "CREATE TABLE `users` (\n"
+        "  `id` int(11) unsigned NOT NULL AUTO_INCREMENT,\n"
+        "  `email` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL COMMENT 'login, unique',\n"
+        "  `status` enum('active','it''s off','a,b') DEFAULT 'active',\n"
+        "  `updated` timestamp(3) NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),\n"
+        "  PRIMARY KEY (`id`),\n"
+        "  UNIQUE KEY `email` (`email`(191)),\n"
+        "  KEY `status_email` (`status`,`email`(20)) USING BTREE,\n"
+        "  FULLTEXT KEY `ft` (`email`)\n"
+        ") ENGINE=InnoDB AUTO_INCREMENT=5 DEFAULT CHARSET=utf8mb4"
+    )
+
+    assert kind == "create"
+    assert indexes == ['CREATE INDEX IF NOT EXISTS "users_status_email" ON "users" ("status","email")']
+    conn = sqlite3.connect(":memory:")
+    conn.execute(sql)
+    for index in indexes:
+        conn.execute(index)
+    columns = [row[1] for row in conn.execute('PRAGMA table_info("users")')]
+    assert columns == ["id", "email", "status", "updated"]
+    assert "UNIQUE (\"email\")" in sql
+    assert "TEXT DEFAULT 'active'" in sql
+    conn.execute("INSERT INTO users (id, email) VALUES (1, 'a@b')")
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO users (id, email) VALUES (2, 'a@b')")
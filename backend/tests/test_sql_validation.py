@@ -0,0 +1,114 @@
+import sqlite3
+
+import pytest
+
+from app.functions import sql_validation
+from app.functions.db_cache import get_database, invalidate_database
+from app.functions.schema_catalog import get_catalog
+from app.functions.sql_validation import READ_ONLY_ERROR, connect_readonly, table_aliases, validate_sql
+
+
+@pytest.fixture
+def shop(tmp_path):
+    path = str(tmp_path / "shop.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT);"
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER, total REAL);"
+        "INSERT INTO customers VALUES (1, 'ada'), (2, 'bob');"
+        "INSERT INTO orders VALUES (1, 1, 9.5), (2, 2, 3.0);"
+    )
+    conn.close()
+    return path
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM orders",
+    "WITH old AS (SELECT id FROM orders) DELETE FROM orders WHERE id IN (SELECT id FROM old)",
+    "UPDATE customers SET name = 'x'",
+    "DROP TABLE customers",
+    "INSERT INTO customers VALUES (3, 'eve')",
+    "PRAGMA writable_schema = ON",
+    "ATTACH DATABASE 'other.db' AS other",
+])
+def test_statements_that_are_not_read_only_are_rejected(shop, sql):
+    result = validate_sql(shop, get_catalog(shop), sql)
+
+    assert not result["ok"]
+    assert result["error"] == READ_ONLY_ERROR
+
+
+def test_read_only_queries_pass(shop):
+    sql = (
+        "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 3) "
+        "SELECT c.name, SUM(o.total) FROM customers c JOIN orders o ON o.customer_id = c.id GROUP BY c.name"
+    )
+    result = validate_sql(shop, get_catalog(shop), sql)
+
+    assert result["ok"], result["error"]
+
+
+def test_query_connections_cannot_modify_the_database(shop):
+    conn = connect_readonly(shop)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM orders")
+    finally:
+        conn.close()
+
+    db = get_database(shop)["db"]
+    try:
+        assert db.run("SELECT COUNT(*) FROM orders") == "[(2,)]"
+        with pytest.raises(Exception):
+            db.run("DROP TABLE orders")
+    finally:
+        invalidate_database(shop)
+    conn = sqlite3.connect(shop)
+    assert conn.execute("SELECT COUNT(*) FROM orders").fetchone() == (2,)
+    conn.close()
+
+
+def test_unknown_tables_and_columns_get_suggestions(shop):
+    catalog = get_catalog(shop)
+
+    error = validate_sql(shop, catalog, "SELECT * FROM customer")["error"]
+    assert error == "no such table: customer. Did you mean: customers? Available tables: customers, orders"
+
+    error = validate_sql(shop, catalog, "SELECT o.totl FROM orders o")["error"]
+    assert error == "no such column: o.totl. Did you mean: total? Columns of orders: id, customer_id, total"
+
+    error = validate_sql(shop, catalog, "SELECT nme FROM customers")["error"]
+    assert error == "no such column: nme. Did you mean: customers.name?"
+
+
+def test_multiple_statements_are_rejected(shop):
+    result = validate_sql(shop, get_catalog(shop), "SELECT 1; SELECT 2")
+
+    assert not result["ok"]
+    assert result["error"].endswith("Return a single SQL statement.")
+
+
+def test_table_aliases_map_to_catalog_tables():
+    aliases = table_aliases('SELECT * FROM "Orders" AS o JOIN customers c ON c.id = o.customer_id WHERE 1',
+                            ["orders", "customers"])
+
+    assert aliases == {"orders": "orders", "o": "orders", "customers": "customers", "c": "customers"}
+
+
+def test_plan_flags_full_scans_and_cartesian_joins(shop, monkeypatch):
+    monkeypatch.setattr(sql_validation, "BIG_TABLE_ROWS", 2)
+    monkeypatch.setattr(sql_validation, "MAX_JOIN_ROWS", 3)
+    catalog = get_catalog(shop)
+
+    result = validate_sql(shop, catalog, "SELECT SUM(total) FROM orders")
+    assert result["ok"]
+    assert result["warnings"] == ["Full scan of orders (2 rows)"]
+    assert result["plan"] == ["SCAN orders"]
+
+    # Joined on the primary key: the inner table is searched, not rescanned
+    result = validate_sql(shop, catalog, "SELECT * FROM orders o JOIN customers c ON c.id = o.customer_id")
+    assert result["ok"], result["error"]
+
+    result = validate_sql(shop, catalog, "SELECT * FROM orders o, customers c")
+    assert not result["ok"]
+    assert result["error"].startswith("Cartesian or unindexed join:")
@@ -0,0 +1,57 @@
+import sqlite3
+
+from app.functions.schema_catalog import build_catalog
+from app.functions.table_retrieval import select_tables, tokenize
+
+
+def make_catalog(path, statements):
+    conn = sqlite3.connect(path)
+    conn.executescript(";\n".join(statements))
+    conn.close()
+    return build_catalog(str(path))
+
+
+WAREHOUSE = [
+    "CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, city TEXT)",
+    "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id), total REAL)",
+    "CREATE TABLE order_items (id INTEGER PRIMARY KEY, order_id INTEGER, product_id INTEGER, quantity INTEGER)",
+    "CREATE TABLE products (id INTEGER PRIMARY KEY, title TEXT, category TEXT)",
+    "CREATE TABLE employees (id INTEGER PRIMARY KEY, full_name TEXT, salary REAL)",
+    "CREATE TABLE shipments (id INTEGER PRIMARY KEY, carrier TEXT, shipped_at TEXT)",
+    "CREATE TABLE audit_log (id INTEGER PRIMARY KEY, message TEXT)",
+    "INSERT INTO products VALUES (1, 'Blue Widget', 'gadgets')",
+    "INSERT INTO shipments VALUES (1, 'FedEx', '2024-01-01')",
+    "INSERT INTO audit_log VALUES (1, 'x'), (2, 'y'), (3, 'z')",
+]
+
+
+def test_tokenize_splits_identifiers_and_stems():
+    assert tokenize("orderItems customer_id") == ["order", "item", "customer", "id"]
+    assert tokenize("How many categories are there?") == ["category"]
+
+
+def test_small_databases_are_returned_whole(tmp_path):
+    catalog = make_catalog(tmp_path / "db.sqlite", WAREHOUSE)
+
+    assert select_tables(catalog, "anything", k=10) == list(catalog["tables"])
+
+
+def test_top_tables_and_their_foreign_key_neighbours_are_selected(tmp_path):
+    catalog = make_catalog(tmp_path / "db.sqlite", WAREHOUSE)
+
+    # orders links to customers (declared) and order_items (order_id naming)
+    assert select_tables(catalog, "total of orders", k=1, max_tables=4) == ["customers", "orders", "order_items"]
+    # Sample values are searched too
+    assert select_tables(catalog, "what was shipped by fedex", k=1) == ["shipments"]
+
+
+def test_neighbours_are_capped_by_max_tables(tmp_path):
+    catalog = make_catalog(tmp_path / "db.sqlite", WAREHOUSE)
+
+    assert len(select_tables(catalog, "total of orders", k=1, max_tables=2)) == 2
+
+
+def test_unmatched_questions_fall_back_to_the_largest_tables(tmp_path):
+    catalog = make_catalog(tmp_path / "db.sqlite", WAREHOUSE)
+
+    assert select_tables(catalog, "zzz qqq", k=1, max_tables=1) == ["audit_log"]
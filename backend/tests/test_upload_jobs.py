@@ -0,0 +1,39 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.routes import upload
+
+
+def test_failed_conversion_waits_for_the_others_before_cleaning_up(tmp_path, monkeypatch):
+    finished = threading.Event()
+
+    def convert(path, filename, part_path):
+        if filename == "bad.csv":
+            raise ValueError("bad file")
+        time.sleep(0.2)
+        with open(part_path, "w") as f:
+            f.write("part")
+        finished.set()
+        return {"rows": 1}
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(upload, "STAGING_FOLDER", str(tmp_path))
+    monkeypatch.setattr(upload, "find_dataset", lambda content_hash: None)
+    monkeypatch.setattr(upload, "get_process_pool", lambda: pool)
+    monkeypatch.setattr(upload, "convert_file_to_sqlite", convert)
+    staged = []
+    for name in ("slow.csv", "bad.csv"):
+        path = tmp_path / name
+        path.write_text("a\n1\n")
+        staged.append({"path": str(path), "filename": name, "content_hash": name, "size": 4})
+
+    with pytest.raises(ValueError, match="bad file"):
+        upload.ingest_files("job", staged, "two files", "chat", 1)
+
+    assert finished.is_set()
+    assert os.listdir(tmp_path) == []
+    pool.shutdown()
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+
+import pytest
+
+from app.functions.value_index import (
+    ensure_value_index, extract_literals, find_value_hints, format_value_hints, value_index_path_for,
+)
+
+
+def _has_fts5():
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(v, tokenize = 'trigram')")
+        return True
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+
+
+pytestmark = pytest.mark.skipif(not _has_fts5(), reason="SQLite without FTS5 trigram tokenizer")
+
+
+@pytest.fixture
+def shop(tmp_path):
+    path = str(tmp_path / "shop.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, city TEXT);"
+        "INSERT INTO customers VALUES (1, 'ACME Corporation', 'Berlin'), (2, 'Acme Corp Holdings', 'Paris'),"
+        " (3, 'Globex', 'Corpus Christi');"
+        "CREATE TABLE products (id INTEGER PRIMARY KEY, title TEXT, price REAL);"
+        "INSERT INTO products VALUES (1, 'Blue Widget', 2.5), (2, 'Red Widget', 3.0);"
+    )
+    conn.close()
+    return path
+
+
+def test_literals_skip_stop_words_and_schema_identifiers():
+    literals = extract_literals('total sales for "Acme Corp" in Berlin by customers', {"customers"})
+
+    assert literals[0] == "Acme Corp"
+    assert "Berlin" in literals and "sales" in literals
+    assert not {"total", "for", "in", "by", "customers"} & {lit.lower() for lit in literals}
+
+
+def test_question_literals_resolve_to_stored_values(shop):
+    hints = find_value_hints(shop, "orders of acme corp from berlin")
+
+    assert {"table": "customers", "column": "name", "value": "Acme Corp Holdings", "literal": "acme corp"} in hints
+    assert {"table": "customers", "column": "city", "value": "Berlin", "literal": "berlin"} in hints
+    # "acme corp" matched, so the shorter "corp" is not looked up on its own
+    assert all(hint["value"] != "Corpus Christi" for hint in hints)
+    # Only text values are indexed
+    assert all(hint["column"] != "price" for hint in hints)
+
+
+def test_exact_matches_rank_first(shop):
+    hints = find_value_hints(shop, "sales of blue widget")
+
+    assert hints[0]["value"] == "Blue Widget"
+    assert format_value_hints(hints[:1]) == """'blue widget' -> "products"."title" = 'Blue Widget'"""
+    assert format_value_hints([]) == "None"
+
+
+def test_index_is_rebuilt_when_the_database_changes(shop):
+    index_path = ensure_value_index(shop)
+    assert index_path == value_index_path_for(os.path.abspath(shop))
+    assert find_value_hints(shop, "customers from Tokyo") == []
+
+    conn = sqlite3.connect(shop)
+    conn.execute("INSERT INTO customers VALUES (4, 'Initech', 'Tokyo')")
+    conn.commit()
+    conn.close()
+    # Make the change visible to the size/mtime stamp even on coarse clocks
+    st = os.stat(shop)
+    os.utime(shop, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+    assert find_value_hints(shop, "customers from Tokyo") == [
+        {"table": "customers", "column": "city", "value": "Tokyo", "literal": "Tokyo"}
+    ]
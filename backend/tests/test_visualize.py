@@ -0,0 +1,31 @@
+import asyncio
+
+from app.functions import prompt_budget, visualize_with_db
+from app.functions.visualize_with_db import avisualise
+
+
+def test_chart_code_plots_the_full_result_from_df(tmp_path, monkeypatch):
+    monkeypatch.setattr(visualize_with_db, "CHART_PROMPT_ROWS", 5)
+    results = {"columns": ["month", "total"], "data": [{"month": i, "total": i * 2.5} for i in range(1000)]}
+    output_path = str(tmp_path / "chart.txt")
+    prompts = []
+
+    async def fake_achat(prompt, **kwargs):
+        prompts.append(prompt)
+        if len(prompts) == 1:
+            # A failing attempt that also modifies its data
+            return "```python\ndf.drop(df.index, inplace=True)\nraise ValueError('boom')\n```"
+        return f"```python\nwith open({output_path!r}, 'w') as f:\n    f.write(f\"{{len(df)}} {{df['total'].sum()}}\")\n```"
+
+    monkeypatch.setattr(visualize_with_db, "achat", fake_achat)
+
+    assert asyncio.run(avisualise(results, output_path)) == output_path
+
+    # Every row reaches the chart code, even after a failed attempt
+    with open(output_path) as f:
+        assert f.read() == f"1000 {sum(i * 2.5 for i in range(1000))}"
+    # The prompt only previews the rows
+    assert "`df` holds 1000 rows. Columns: month (int64), total (float64)" in prompts[0]
+    assert "... 995 more rows (1000 in total)" in prompts[0]
+    assert prompt_budget.count_tokens(prompts[0]) < 1000
+    assert "boom" in prompts[1]